@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+from token_accounts import b58decode_many, b58encode_many
+
+ID_DTYPE = np.int32
+# Id of missing addresses, like pandas' -1 category code
+MISSING = -1
+# Newly added keys are merged into the main sorted table once they outgrow
+# this share of it, so each key is re-sorted O(log n) times overall
+MERGE_FRACTION = 8
+MERGE_MIN = 1 << 16
+# Addresses rebuilt per step when iterating a registry
+ITER_CHUNK = 1 << 16
+
+
+def _search(sorted_keys, sorted_ids, keys):
+    """Ids of keys found in a sorted key table, MISSING elsewhere"""
+    if not len(sorted_keys):
+        return np.full(len(keys), MISSING, dtype=ID_DTYPE)
+    positions = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[positions] == keys, sorted_ids[positions], MISSING).astype(ID_DTYPE)
+
+
+class AddressRegistry:
+    """Dense int32 ids for Solana addresses, kept as 32-byte keys
+
+    Each address is decoded from base58 once, when first seen, and id i
+    is row i of keys. Lookups binary-search a sorted copy of the keys, so
+    5M wallets cost about 340MB, against roughly 100 bytes per row for
+    the same wallets as strings in object columns plus a dict to find
+    them. Tables then hold int32 ids, and strings are only rebuilt from
+    the keys (decode, or indexing like an array) for output. Text that is
+    not the base58 form of a 32-byte key still gets an id and is kept
+    as text on the side, so fixtures and malformed rows never fail.
+    """
+
+    def __init__(self):
+        self._keys = np.empty(0, dtype='S32')
+        self._count = 0
+        self._sorted = np.empty(0, dtype='S32')
+        self._sorted_ids = np.empty(0, dtype=ID_DTYPE)
+        self._fresh = np.empty(0, dtype='S32')
+        self._fresh_ids = np.empty(0, dtype=ID_DTYPE)
+        self._text = {}
+        self._text_names = {}
+
+    @classmethod
+    def from_addresses(cls, addresses):
+        """A registry holding addresses, numbered in first-seen order"""
+        registry = cls()
+        registry.encode(addresses)
+        return registry
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def keys(self):
+        """(n, 32) uint8 array of the keys by id; rows of text ids are zero"""
+        return self._keys[:self._count].view(np.uint8).reshape(self._count, 32)
+
+    def _append(self, keys):
+        ids = np.arange(self._count, self._count + len(keys), dtype=ID_DTYPE)
+        if self._count + len(keys) > len(self._keys):
+            grown = np.zeros(max(2 * len(self._keys), self._count + len(keys), 1024), dtype='S32')
+            grown[:self._count] = self._keys[:self._count]
+            self._keys = grown
+        self._keys[self._count:self._count + len(keys)] = keys
+        self._count += len(keys)
+        return ids
+
+    def _index(self, keys, ids):
+        """Make keys findable, merging the fresh table into the main one when it has grown"""
+        fresh = np.concatenate([self._fresh, keys])
+        fresh_ids = np.concatenate([self._fresh_ids, ids])
+        if len(fresh) > max(MERGE_MIN, len(self._sorted) // MERGE_FRACTION):
+            fresh = np.concatenate([self._sorted, fresh])
+            fresh_ids = np.concatenate([self._sorted_ids, fresh_ids])
+            order = np.argsort(fresh, kind='stable')
+            self._sorted, self._sorted_ids = fresh[order], fresh_ids[order]
+            self._fresh = np.empty(0, dtype='S32')
+            self._fresh_ids = np.empty(0, dtype=ID_DTYPE)
+        else:
+            order = np.argsort(fresh, kind='stable')
+            self._fresh, self._fresh_ids = fresh[order], fresh_ids[order]
+
+    def _lookup_keys(self, keys):
+        ids = _search(self._sorted, self._sorted_ids, keys)
+        missing = ids == MISSING
+        if missing.any() and len(self._fresh):
+            ids[missing] = _search(self._fresh, self._fresh_ids, keys[missing])
+        return ids
+
+    def encode(self, addresses, add=True):
+        """int32 ids of addresses, registering unseen ones unless add is False
+
+        Missing values, and with add=False unknown addresses, get MISSING.
+        Each distinct address is decoded once, so categorical columns and
+        columns with many repeats are cheap.
+        """
+        if not isinstance(addresses, (pd.Series, pd.Index, pd.Categorical, np.ndarray)):
+            addresses = np.asarray(list(addresses), dtype=object)
+        codes, uniques = pd.factorize(addresses)
+        uniques = np.asarray(uniques, dtype=object)
+        ids = np.full(len(uniques), MISSING, dtype=ID_DTYPE)
+        texts = np.array([str(address) for address in uniques], dtype=object)
+        keys, valid = b58decode_many(texts) if len(texts) else (np.empty((0, 32), np.uint8), np.empty(0, bool))
+        keys = keys.view('S32').ravel()
+
+        ids[valid] = self._lookup_keys(keys[valid])
+        text_rows = np.flatnonzero(~valid)
+        for i in text_rows.tolist():
+            ids[i] = self._text.get(texts[i], MISSING)
+        new = ids == MISSING
+        if add and new.any():
+            # Ids follow first appearance, whether the address is a key or text
+            ids[new] = self._append(keys[new])
+            new_keys = new & valid
+            self._index(keys[new_keys], ids[new_keys])
+            for i in text_rows[new[text_rows]].tolist():
+                self._text[texts[i]] = int(ids[i])
+                self._text_names[int(ids[i])] = texts[i]
+        return np.where(codes >= 0, ids[codes], MISSING).astype(ID_DTYPE)
+
+    def lookup(self, addresses):
+        """Ids of addresses already registered, MISSING for the others"""
+        return self.encode(addresses, add=False)
+
+    def id(self, address):
+        """Id of one address, or None when it is not registered"""
+        found = int(self.lookup([address])[0])
+        return None if found == MISSING else found
+
+    def __contains__(self, address):
+        return isinstance(address, str) and self.id(address) is not None
+
+    def decode(self, ids):
+        """Address strings of ids as an object array, None for MISSING"""
+        ids = np.asarray(ids, dtype=np.int64)
+        distinct, inverse = np.unique(ids, return_inverse=True)
+        names = np.full(len(distinct), None, dtype=object)
+        known = distinct >= 0
+        if self._text_names:
+            texts = np.isin(distinct, np.fromiter(self._text_names, dtype=np.int64))
+            names[texts] = [self._text_names[i] for i in distinct[texts].tolist()]
+            known &= ~texts
+        if known.any():
+            names[known] = b58encode_many(self.keys[distinct[known]])
+        return names[inverse.ravel()].reshape(ids.shape)
+
+    def categorical(self, ids):
+        """ids as a pandas Categorical of address strings, each built once"""
+        distinct, codes = np.unique(np.asarray(ids), return_inverse=True)
+        # MISSING sorts first and becomes the -1 code
+        first = int(np.searchsorted(distinct, 0))
+        codes = np.maximum(codes.ravel() - first, -1)
+        return pd.Categorical.from_codes(codes, categories=self.decode(distinct[first:]))
+
+    def __getitem__(self, ids):
+        if np.isscalar(ids):
+            return self.decode([ids])[0]
+        return self.decode(ids)
+
+    def __iter__(self):
+        for start in range(0, self._count, ITER_CHUNK):
+            yield from self.decode(np.arange(start, min(start + ITER_CHUNK, self._count))).tolist()
+
+    def save(self, path):
+        np.savez(path, keys=self._keys[:self._count],
+                 text_ids=np.fromiter(self._text_names, dtype=np.int64, count=len(self._text_names)),
+                 text_names=np.array(list(self._text_names.values()), dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        registry = cls()
+        with np.load(path) as data:
+            keys = data['keys']
+            registry._keys = keys.copy()
+            registry._count = len(keys)
+            registry._text_names = dict(zip(data['text_ids'].tolist(), data['text_names'].tolist()))
+        registry._text = {name: i for i, name in registry._text_names.items()}
+        text_ids = np.fromiter(registry._text_names, dtype=np.int64, count=len(registry._text_names))
+        keyed = np.setdiff1d(np.arange(registry._count, dtype=ID_DTYPE), text_ids).astype(ID_DTYPE)
+        order = np.argsort(registry._keys[keyed], kind='stable')
+        registry._sorted, registry._sorted_ids = registry._keys[keyed][order], keyed[order]
+        return registry
+
+
+def encode_dictionary(registry, array, add=True):
+    """Ids for a pyarrow dictionary array, decoding each dictionary value once"""
+    ids = registry.encode(array.dictionary.to_numpy(zero_copy_only=False), add=add)
+    if not array.null_count:
+        return ids[array.indices.to_numpy()]
+    valid = array.is_valid().to_numpy(zero_copy_only=False)
+    indices = array.indices.fill_null(0).to_numpy()
+    return np.where(valid, ids[indices], MISSING).astype(ID_DTYPE)
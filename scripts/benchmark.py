@@ -0,0 +1,292 @@
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from synthetic_data import synthetic_wallets, synthetic_holdings, synthetic_tracking_data
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(BASE_DIR, 'data', 'benchmark_baseline.json')
+TODAY = '2024-12-04'
+
+
+def legacy_merge_history(history, millionaires, today):
+    """Row-by-row update that merge_history replaced, kept for comparison"""
+    for _, row in millionaires.iterrows():
+        wallet = row['wallet']
+        if wallet in history['wallet'].values:
+            history.loc[history['wallet'] == wallet, ['total_pnl', 'last_seen']] = [row['total_pnl'], today]
+        else:
+            new_row = pd.DataFrame({
+                'wallet': [wallet],
+                'total_pnl': [row['total_pnl']],
+                'first_seen': [today],
+                'last_seen': [today]
+            })
+            history = pd.concat([history, new_row], ignore_index=True)
+    return history
+
+
+def timed(func, *args, **kwargs):
+    """Run func with stdout silenced and return the elapsed seconds"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        return time.perf_counter() - start
+
+
+def patterns_input(size, seed):
+    wallets = synthetic_wallets(size, seed)
+    return wallets, synthetic_holdings(wallets['wallet'], seed)
+
+
+def bench_merge_history(size, seed, workdir, legacy_limit=5000):
+    from get_millionaires import MillionaireTracker
+
+    history, millionaires = synthetic_tracking_data(size, seed)
+    tracker = MillionaireTracker(dune=object())
+    result = {'seconds': timed(tracker.merge_history, history, millionaires, TODAY), 'rows': len(millionaires)}
+    if size <= legacy_limit:
+        result['legacy_seconds'] = timed(legacy_merge_history, history.copy(), millionaires, TODAY)
+    return result
+
+
+def bench_update_tracking(size, seed, workdir):
+    """The whole daily update against a local Dune stand-in, writing into workdir"""
+    from get_millionaires import MillionaireTracker
+    from mock_dune import LocalDuneClient
+    from snapshot_store import SnapshotStore
+    from pnl_stats import StatsRollup
+
+    history, millionaires = synthetic_tracking_data(size, seed)
+    tracker = MillionaireTracker(dune=LocalDuneClient(millionaires),
+                                 snapshots=SnapshotStore(os.path.join(workdir, 'snapshots')),
+                                 rollup=StatsRollup(os.path.join(workdir, 'stats_rollup.json')))
+    tracker.history_file = os.path.join(workdir, 'millionaire_history.csv')
+    tracker.current_file = os.path.join(workdir, 'current_millionaires.csv')
+    tracker.stats_file = os.path.join(workdir, 'tracker_statistics.json')
+    tracker.ingest_state_file = os.path.join(workdir, 'ingest_state.json')
+    history.to_csv(tracker.history_file, index=False)
+    return {'seconds': timed(tracker.update_tracking), 'rows': len(millionaires)}
+
+
+def bench_generate_statistics(size, seed, workdir):
+    from get_millionaires import MillionaireTracker
+
+    history, millionaires = synthetic_tracking_data(size, seed)
+    tracker = MillionaireTracker(dune=object())
+    return {'seconds': timed(tracker.generate_statistics, millionaires, history), 'rows': len(millionaires)}
+
+
+def bench_patterns(size, seed, workdir):
+    from patterns import WalletPatternAnalyzer
+
+    wallets, holdings = patterns_input(size, seed)
+    analyzer = WalletPatternAnalyzer()
+    return {'seconds': timed(analyzer.analyze_frame, wallets, holdings), 'rows': len(holdings)}
+
+
+def bench_labeler(size, seed, workdir):
+    from wallet_labeler import WalletLabeler
+    from holdings_store import holdings_by_wallet
+
+    wallets, holdings = patterns_input(size, seed)
+    wallet_holdings = holdings_by_wallet(holdings)
+    labeler = WalletLabeler()
+
+    def label_all():
+        for wallet, pnl in zip(wallets['wallet'], wallets['total_pnl']):
+            labeler.get_detailed_labels({
+                'wallet': wallet,
+                'total_pnl': pnl,
+                'token_holdings': wallet_holdings.get(wallet, [])
+            })
+
+    return {'seconds': timed(label_all), 'rows': len(holdings)}
+
+
+def bench_extract_special_wallets(size, seed, workdir):
+    from patterns import WalletPatternAnalyzer
+    from traders import extract_special_wallets
+
+    wallets, holdings = patterns_input(size, seed)
+    profiles = WalletPatternAnalyzer().analyze_frame(wallets, holdings)
+    return {'seconds': timed(extract_special_wallets, profiles, output_dir=workdir), 'rows': len(profiles)}
+
+
+def bench_analyze_token_patterns(size, seed, workdir):
+    from patterns import WalletPatternAnalyzer
+    from traders import extract_special_wallets, analyze_token_patterns
+
+    wallets, holdings = patterns_input(size, seed)
+    profiles = WalletPatternAnalyzer().analyze_frame(wallets, holdings)
+    with contextlib.redirect_stdout(io.StringIO()):
+        special = extract_special_wallets(profiles, output_dir=workdir)
+    return {'seconds': timed(analyze_token_patterns, special, holdings, output_dir=workdir),
+            'rows': len(holdings)}
+
+
+def bench_rpc_fetch(size, seed, workdir, max_in_flight=32, latency=0.0):
+    """Concurrent wallet_details fetch against the local mock RPC server"""
+    from mock_rpc_server import start_server
+    from wallet_details import WalletAnalyzer
+
+    wallets = synthetic_wallets(size, seed)
+    server, url = start_server(latency=latency)
+    try:
+        analyzer = WalletAnalyzer(rpc_url=url, max_in_flight=max_in_flight, rate=0)
+
+        def fetch_all():
+            for _ in analyzer.analyze_wallets_concurrently(zip(wallets['wallet'], wallets['total_pnl'])):
+                pass
+
+        seconds = timed(fetch_all)
+    finally:
+        server.shutdown()
+    return {'seconds': seconds, 'rows': analyzer.client.request_count}
+
+
+def bench_rpc_multiple_accounts(size, seed, workdir, max_in_flight=32, latency=0.0):
+    """Wallet infos through getMultipleAccounts against the local mock RPC server"""
+    from mock_rpc_server import start_server
+    from wallet_details import WalletAnalyzer
+
+    wallets = synthetic_wallets(size, seed)
+    server, url = start_server(latency=latency)
+    try:
+        analyzer = WalletAnalyzer(rpc_url=url, max_in_flight=max_in_flight, rate=0)
+        seconds = timed(analyzer.get_wallet_infos, list(wallets['wallet']))
+    finally:
+        server.shutdown()
+    return {'seconds': seconds, 'rows': analyzer.client.request_count}
+
+
+STAGES = {
+    'merge_history': bench_merge_history,
+    'update_tracking': bench_update_tracking,
+    'generate_statistics': bench_generate_statistics,
+    'patterns': bench_patterns,
+    'labeler': bench_labeler,
+    'extract_special_wallets': bench_extract_special_wallets,
+    'analyze_token_patterns': bench_analyze_token_patterns,
+    'rpc_fetch': bench_rpc_fetch,
+    'rpc_multiple_accounts': bench_rpc_multiple_accounts,
+}
+RPC_STAGES = {'rpc_fetch', 'rpc_multiple_accounts'}
+
+
+def run_case(stage, size, seed, options):
+    """Run one stage in the current process and report time and memory"""
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as workdir:
+        result = STAGES[stage](size, seed, workdir, **options)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result.update({
+        'stage': stage,
+        'wallets': size,
+        'wallets_per_sec': size / result['seconds'] if result['seconds'] else float('inf'),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': peak_rss / 1024,
+        'rss_growth_mb': (peak_rss - rss_before) / 1024
+    })
+    return result
+
+
+def run_isolated(stage, size, seed, options):
+    """Run one stage in a fresh child process so peak RSS is its own"""
+    context = multiprocessing.get_context('fork' if sys.platform != 'win32' else 'spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, stage, size, seed, options).result()
+
+
+def case_key(result):
+    return f"{result['stage']}:{result['wallets']}"
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {case_key(result): result for result in json.load(f)['results']}
+
+
+def save_baseline(results, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'results': results}, f, indent=4)
+
+
+def regression_delta(result, baseline):
+    """Percent change in seconds against the baseline, positive when slower"""
+    previous = baseline.get(case_key(result))
+    if not previous or not previous['seconds']:
+        return None
+    return 100 * (result['seconds'] - previous['seconds']) / previous['seconds']
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark pipeline stages on synthetic data")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Wallet counts to benchmark, up to 1000000")
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rpc-max-wallets', type=int, default=2000,
+                        help="Cap on wallets sent through the mock RPC server")
+    parser.add_argument('--rpc-latency', type=float, default=0.0,
+                        help="Seconds the mock RPC server waits before every response")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline")
+    parser.add_argument('--fail-over', type=float, metavar='PERCENT',
+                        help="Exit non-zero when any stage is this much slower than the baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = load_baseline(args.baseline)
+
+    results = []
+    regressions = []
+    print(f"{'stage':<24}{'wallets':>9}{'rows':>10}{'seconds':>10}{'wallets/s':>12}"
+          f"{'peak MB':>9}{'+MB':>8}{'vs base':>9}")
+    for stage in args.stages:
+        sizes = args.sizes
+        options = {}
+        if stage in RPC_STAGES:
+            sizes = sorted({min(size, args.rpc_max_wallets) for size in args.sizes})
+            options = {'latency': args.rpc_latency}
+        for size in sizes:
+            result = run_isolated(stage, size, args.seed, options)
+            delta = regression_delta(result, baseline)
+            result['delta_pct'] = delta
+            results.append(result)
+            if delta is not None and args.fail_over is not None and delta > args.fail_over:
+                regressions.append(result)
+
+            delta_text = f"{delta:+.1f}%" if delta is not None else '-'
+            print(f"{stage:<24}{size:>9}{result['rows']:>10}{result['seconds']:>10.3f}"
+                  f"{result['wallets_per_sec']:>12,.0f}{result['peak_rss_mb']:>9.0f}"
+                  f"{result['rss_growth_mb']:>8.0f}{delta_text:>9}")
+            if 'legacy_seconds' in result:
+                print(f"{'  (legacy row-by-row)':<24}{size:>9}{'':>10}{result['legacy_seconds']:>10.3f}")
+
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) regressed more than {args.fail_over}%:")
+        for result in regressions:
+            print(f"  {case_key(result)} {result['delta_pct']:+.1f}%")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
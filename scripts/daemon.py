@@ -0,0 +1,313 @@
+import os
+import re
+import json
+import time
+import queue
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+from instrumentation import configure_logging, instrumented
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# The control socket only ever listens on the loopback interface
+CONTROL_HOST = '127.0.0.1'
+CONTROL_PORT = 8765
+JOBS = ('track', 'pipeline')
+DEFAULT_EVERY = {'track': '1d', 'pipeline': '1d'}
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# Seconds a client waits for the daemon to answer; --wait lifts it
+CLIENT_TIMEOUT = 10.0
+
+
+def duration(value):
+    """Seconds of a duration like 90, 90s, 15m, 6h or 1d; 0 turns a schedule off"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*', str(value))
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid duration {value!r}, expected e.g. 90s, 15m, 6h or 1d")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2) or 's']
+
+
+class Daemon:
+    """Resident runner of the tracker and the pipeline
+
+    One Pipeline is kept for the life of the process, so its stage outputs
+    (the wallets, holdings and profiles) stay in memory between runs, and
+    its RPC cache, WalletAnalyzer (HTTP connection pools, mint decimals)
+    and MillionaireTracker (Dune client) are built once. Jobs run one at a
+    time on the calling thread of serve(), when their interval is due or
+    when triggered over the control socket. The pipeline analyzes the
+    wallets of the latest track job rather than --input, and never runs the
+    tracker itself.
+    """
+
+    def __init__(self, options, every=None, start_idle=False):
+        from pipeline import Pipeline, default_stages
+        self.options = options
+        self.pipeline = Pipeline(default_stages(), options=options)
+        self.pipeline.follow_tracker = True
+        self.every = {job: seconds for job, seconds in (every or {}).items() if seconds}
+        now = time.time()
+        self.next_run = {job: now + seconds if start_idle else now for job, seconds in self.every.items()}
+        self.requests = queue.Queue()
+        # Called with the job's name after each successful run
+        self.after_run = []
+        self.started = now
+        self.running = None
+        self.jobs = {job: {'runs': 0, 'failures': 0, 'last_started': None, 'last_seconds': None,
+                           'last_status': None, 'last_error': None, 'last_result': None} for job in JOBS}
+        self._lock = threading.Lock()
+
+    def trigger(self, job):
+        """Queue a run of job; returns an Event set once it has finished"""
+        if job not in JOBS:
+            raise ValueError(f"Unknown job {job!r}, expected one of {JOBS}")
+        done = threading.Event()
+        self.requests.put((job, done))
+        return done
+
+    def stop(self):
+        self.requests.put((None, None))
+
+    def run_track(self):
+        tracker = self.pipeline.tracker()
+        if self.options.trades:
+            # Recomputed every run, so trades added since the last run count
+            from mock_dune import LocalDuneClient
+            from pnl_engine import profitable_wallets
+            tracker.dune = LocalDuneClient(profitable_wallets(self.options.trades))
+        with instrumented('get_millionaires', self.options):
+            millionaires = tracker.update_tracking()
+        if millionaires is not None:
+            self.pipeline.tracked = millionaires
+        return {'new_data': millionaires is not None,
+                'millionaires': None if millionaires is None else len(millionaires)}
+
+    def run_pipeline(self):
+        with instrumented('pipeline', self.options):
+            timings = self.pipeline.run()
+            self.pipeline.export()
+        return {'ran': [t['stage'] for t in timings if t['status'] == 'ran'],
+                'seconds': round(sum(t['seconds'] for t in timings), 3)}
+
+    def run(self, job):
+        """Run one job, recording its outcome for status(); errors are logged, not raised"""
+        state = self.jobs[job]
+        with self._lock:
+            self.running = job
+            state['last_started'] = datetime.now().isoformat(timespec='seconds')
+        logger.info(f"Running {job}")
+        start = time.perf_counter()
+        try:
+            result, status, error = getattr(self, f'run_{job}')(), 'ok', None
+        except Exception as e:
+            logger.exception(f"{job} failed: {str(e)}")
+            result, status, error = None, 'failed', str(e)
+        with self._lock:
+            self.running = None
+            state['runs'] += 1
+            state['failures'] += status == 'failed'
+            state.update(last_seconds=round(time.perf_counter() - start, 3), last_status=status,
+                         last_error=error, last_result=result)
+        if job in self.every:
+            self.next_run[job] = time.time() + self.every[job]
+        logger.info(f"{job} finished ({status}) in {state['last_seconds']:.2f}s")
+        if status == 'ok':
+            for callback in self.after_run:
+                try:
+                    callback(job)
+                except Exception as e:
+                    logger.exception(f"After-run hook for {job} failed: {str(e)}")
+        return state
+
+    def status(self):
+        with self._lock:
+            jobs = {job: {**state, 'every': self.every.get(job),
+                          'next_run': (datetime.fromtimestamp(self.next_run[job]).isoformat(timespec='seconds')
+                                       if job in self.next_run else None)}
+                    for job, state in self.jobs.items()}
+            running = self.running
+        return {
+            'pid': os.getpid(),
+            'started_at': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'running': running,
+            'queued': self.requests.qsize(),
+            'jobs': jobs,
+            # What stays warm between runs
+            'outputs_in_memory': {ref: len(df) for ref, df in list(self.pipeline.values.items())},
+            'mint_decimals_known': len(self.pipeline._analyzer.mint_decimals) if self.pipeline._analyzer else 0,
+        }
+
+    def serve(self):
+        """Run due and triggered jobs until stop() or SIGINT/SIGTERM"""
+        def interrupt(signum, frame):
+            raise KeyboardInterrupt
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, interrupt)
+        try:
+            while True:
+                now = time.time()
+                due = min(self.next_run, key=self.next_run.get) if self.next_run else None
+                try:
+                    timeout = max(0.0, self.next_run[due] - now) if due else None
+                    job, done = self.requests.get(timeout=timeout)
+                except queue.Empty:
+                    job, done = due, None
+                if job is None:
+                    break
+                self.run(job)
+                if done is not None:
+                    done.set()
+        except KeyboardInterrupt:
+            logger.info("Interrupted, shutting down")
+        finally:
+            self.pipeline.close()
+
+
+class ControlServer(socketserver.ThreadingTCPServer):
+    """Newline-delimited JSON requests to a Daemon, one JSON reply per line
+
+    Requests are {"command": "status"}, {"command": "run", "job": ...,
+    "wait": false} and {"command": "stop"}.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, daemon, host=CONTROL_HOST, port=CONTROL_PORT):
+        self.daemon = daemon
+        super().__init__((host, port), ControlHandler)
+
+    def handle_request_line(self, line):
+        try:
+            request = json.loads(line)
+            command = request.get('command')
+            if command == 'status':
+                return {'ok': True, 'status': self.daemon.status()}
+            if command == 'run':
+                done = self.daemon.trigger(request.get('job'))
+                if request.get('wait'):
+                    done.wait()
+                    return {'ok': True, 'job': request['job'], 'result': self.daemon.jobs[request['job']]}
+                return {'ok': True, 'job': request['job'], 'queued': True}
+            if command == 'stop':
+                self.daemon.stop()
+                return {'ok': True, 'stopping': True}
+            return {'ok': False, 'error': f"Unknown command {command!r}"}
+        except (ValueError, AttributeError) as e:
+            return {'ok': False, 'error': str(e)}
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                reply = self.server.handle_request_line(line)
+                self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+def send_command(request, host=CONTROL_HOST, port=CONTROL_PORT, timeout=CLIENT_TIMEOUT):
+    """Send one request to a running daemon and return its reply"""
+    with socket.create_connection((host, port), timeout=timeout) as connection:
+        connection.sendall(json.dumps(request).encode() + b'\n')
+        with connection.makefile('rb') as reply:
+            line = reply.readline()
+    if not line:
+        raise ConnectionError(f"The daemon at {host}:{port} closed the connection without replying")
+    return json.loads(line)
+
+
+def add_control_arguments(parser):
+    parser.add_argument('--host', default=CONTROL_HOST, help="Address of the daemon's control socket")
+    parser.add_argument('--port', type=int, default=CONTROL_PORT, help="Port of the daemon's control socket")
+
+
+def parse_args(argv=None):
+    from pipeline import add_pipeline_arguments
+    parser = argparse.ArgumentParser(description="Keep the tracker and pipeline resident and run them on a schedule")
+    add_control_arguments(parser)
+    for job in JOBS:
+        parser.add_argument(f'--{job}-every', type=duration, default=duration(DEFAULT_EVERY[job]), metavar='DURATION',
+                            help=f"How often to run {job} (e.g. 6h, 1d; 0 only runs it when triggered)")
+    parser.add_argument('--start-idle', action='store_true',
+                        help="Wait one interval before the first scheduled runs instead of starting with them")
+    parser.add_argument('--query-host', default=CONTROL_HOST, help="Address the query API listens on")
+    parser.add_argument('--query-port', type=int,
+                        help="Also serve the query API on this port, reloaded after every job")
+    add_pipeline_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    # Claims the root logger before the pipeline's imports would
+    configure_logging(os.path.join(DATA_DIR, 'daemon.log'))
+    args = parse_args(argv)
+    daemon = Daemon(args, every={job: getattr(args, f'{job}_every') for job in JOBS}, start_idle=args.start_idle)
+    server = ControlServer(daemon, args.host, args.port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    query_server = None
+    if args.query_port:
+        from query_service import QueryService, start_query_server
+        service = QueryService()
+        query_server, url = start_query_server(service, args.query_host, args.query_port)
+        daemon.after_run.append(lambda job: service.reload())
+        logger.info(f"Query API on {url}")
+    logger.info(f"Daemon {os.getpid()} listening on {args.host}:{args.port}, "
+                + ', '.join(f"{job} every {seconds:.0f}s" for job, seconds in daemon.every.items()))
+    try:
+        daemon.serve()
+    finally:
+        server.shutdown()
+        server.server_close()
+        if query_server is not None:
+            query_server.shutdown()
+            query_server.server_close()
+
+
+def _send(args, request, timeout=CLIENT_TIMEOUT):
+    try:
+        return send_command(request, args.host, args.port, timeout)
+    except ConnectionRefusedError:
+        raise SystemExit(f"No daemon is listening on {args.host}:{args.port}; start one with `pumpfun daemon`")
+
+
+def _client_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    add_control_arguments(parser)
+    return parser
+
+
+def status_main(argv=None):
+    args = _client_parser("Show what a running daemon is doing").parse_args(argv)
+    print(json.dumps(_send(args, {'command': 'status'})['status'], indent=4))
+
+
+def trigger_main(argv=None):
+    parser = _client_parser("Ask a running daemon to run a job now")
+    parser.add_argument('job', choices=JOBS)
+    parser.add_argument('--wait', action='store_true', help="Return once the job has finished, with its outcome")
+    args = parser.parse_args(argv)
+    reply = _send(args, {'command': 'run', 'job': args.job, 'wait': args.wait},
+                  timeout=None if args.wait else CLIENT_TIMEOUT)
+    print(json.dumps(reply, indent=4))
+    if args.wait and reply.get('result', {}).get('last_status') != 'ok':
+        raise SystemExit(1)
+
+
+def stop_main(argv=None):
+    args = _client_parser("Stop a running daemon once its current job is done").parse_args(argv)
+    _send(args, {'command': 'stop'})
+    print("Daemon stopping")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,55 +4,134 @@ from dune_client.client import DuneClient
 from datetime import datetime
 import logging
 import time
-import shutil
 import json
+import hashlib
+import argparse
+from snapshot_store import SnapshotStore
+from pnl_stats import summarize, StatsRollup, TIER_EDGES, PERCENTILES
+from instrumentation import configure_logging, metrics, instrumented, add_instrumentation_arguments
 
 # Set up directory structure for organized data storage
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 TRACKING_DIR = os.path.join(BASE_DIR, 'tracking')
-BACKUP_DIR = os.path.join(TRACKING_DIR, 'backups')
 os.makedirs(TRACKING_DIR, exist_ok=True)
-os.makedirs(BACKUP_DIR, exist_ok=True)
 
 # Configure logging to track program execution and errors
-logging.basicConfig(
-   level=logging.INFO,
-   format='%(asctime)s - %(levelname)s - %(message)s',
-   handlers=[
-       logging.FileHandler(os.path.join(TRACKING_DIR, 'millionaire_tracker.log')),
-       logging.StreamHandler()
-   ]
-)
+configure_logging(os.path.join(TRACKING_DIR, 'millionaire_tracker.log'))
 logger = logging.getLogger(__name__)
 
 class MillionaireTracker:
-   def __init__(self):
+   def __init__(self, dune=None, page_size=50000, force=False, snapshots=None, rollup=None,
+                tier_edges=TIER_EDGES, percentiles=PERCENTILES):
        """Initialize tracker with API credentials and file paths"""
-       self.dune = DuneClient("KMnMS9585gw3DuUAGJsKufBk1eC1xQSs")
+       self.dune = dune or DuneClient("KMnMS9585gw3DuUAGJsKufBk1eC1xQSs")
        self.query_id = 4364994
+       self.page_size = page_size
+       self.force = force
        self.history_file = os.path.join(TRACKING_DIR, 'millionaire_history.csv')
        self.current_file = os.path.join(TRACKING_DIR, 'current_millionaires.csv')
        self.stats_file = os.path.join(TRACKING_DIR, 'tracker_statistics.json')
+       self.ingest_state_file = os.path.join(TRACKING_DIR, 'ingest_state.json')
+       self.pending_ingest_state = None
+       self.snapshots = snapshots or SnapshotStore(os.path.join(TRACKING_DIR, 'snapshots'))
+       self.tier_edges = sorted(tier_edges)
+       self.percentiles = percentiles
+       self.rollup = rollup or StatsRollup(os.path.join(TRACKING_DIR, 'stats_rollup.json'), percentiles)
 
-   def fetch_current_data(self):
-       """Fetch and validate current data from Dune Analytics with retry logic"""
+   def _with_retries(self, description, func, *args, **kwargs):
+       """Call func, retrying a few times with a delay before giving up"""
        max_retries = 3
        retry_delay = 5
        
        for attempt in range(max_retries):
            try:
-               query_result = self.dune.get_latest_result(self.query_id)
-               df = pd.DataFrame(query_result.result.rows)
-               if df.empty:
-                   raise ValueError("Received empty dataset from Dune")
-               return df.sort_values('total_pnl', ascending=False)
+               return func(*args, **kwargs)
            except Exception as e:
                if attempt == max_retries - 1:
-                   logger.error(f"Failed to fetch data after {max_retries} attempts: {str(e)}")
-                   return None
-               logger.warning(f"Attempt {attempt + 1} failed, retrying in {retry_delay} seconds...")
+                   logger.error(f"Failed to {description} after {max_retries} attempts: {str(e)}")
+                   raise
+               logger.warning(f"Attempt {attempt + 1} to {description} failed, retrying in {retry_delay} seconds...")
                time.sleep(retry_delay)
 
+   def load_ingest_state(self):
+       """Execution id and row hash of the last Dune result that was processed"""
+       if os.path.exists(self.ingest_state_file):
+           with open(self.ingest_state_file) as f:
+               return json.load(f)
+       return {}
+
+   def commit_ingest_state(self):
+       """Record the fetched execution as processed, once its outputs are saved"""
+       if self.pending_ingest_state is not None:
+           with open(self.ingest_state_file, 'w') as f:
+               json.dump(self.pending_ingest_state, f, indent=4)
+           self.pending_ingest_state = None
+
+   def iter_result_pages(self, execution_id):
+       """Yield the rows of an execution one page at a time, retrying per page"""
+       offset = 0
+       while offset is not None:
+           page = self._with_retries(
+               f"fetch rows {offset}-{offset + self.page_size}",
+               self.dune.get_execution_results, execution_id, limit=self.page_size, offset=offset
+           )
+           yield pd.DataFrame(page.get_rows())
+           offset = page.next_offset
+
+   def fetch_current_data(self):
+       """Fetch and validate current data from Dune Analytics page by page
+
+       Returns None when the fetch fails, and also when the latest execution
+       (or its rows) match what was processed last time, so all downstream
+       work is skipped. The query returns one row per wallet and token, so each
+       page is folded into running per-wallet total_pnl sums as it arrives and
+       memory grows with distinct wallets rather than rows. Returns one row per
+       wallet, highest total_pnl first.
+       """
+       try:
+           latest = self._with_retries(
+               "look up the latest execution",
+               self.dune.get_latest_result, self.query_id, sample_count=1
+           )
+           execution_id = latest.execution_id
+           previous = self.load_ingest_state()
+           if execution_id == previous.get('execution_id') and not self.force:
+               logger.info(f"No new Dune execution since {execution_id}, skipping update")
+               return None
+           
+           row_hash = hashlib.sha256()
+           row_count = 0
+           totals = None
+           for page in self.iter_result_pages(execution_id):
+               if page.empty:
+                   continue
+               page = page[['total_pnl', 'wallet']]
+               row_hash.update(pd.util.hash_pandas_object(page, index=False).to_numpy().tobytes())
+               page_totals = page.groupby('wallet', sort=False)['total_pnl'].sum()
+               totals = page_totals if totals is None else totals.add(page_totals, fill_value=0)
+               row_count += len(page)
+               metrics.count('dune_rows_fetched_total', len(page))
+               logger.info(f"Fetched {row_count} rows ({len(totals)} wallets) from execution {execution_id}")
+           
+           if totals is None:
+               raise ValueError("Received empty dataset from Dune")
+           df = totals.rename('total_pnl').rename_axis('wallet').reset_index()[['total_pnl', 'wallet']]
+           
+           self.pending_ingest_state = {
+               'execution_id': execution_id,
+               'row_hash': row_hash.hexdigest(),
+               'row_count': row_count,
+               'ingested_at': datetime.now().isoformat(timespec='seconds')
+           }
+           if self.pending_ingest_state['row_hash'] == previous.get('row_hash') and not self.force:
+               logger.info(f"Execution {execution_id} returned the same rows as last time, skipping update")
+               self.commit_ingest_state()
+               return None
+           return df.sort_values('total_pnl', ascending=False)
+       except Exception as e:
+           logger.error(f"Failed to fetch data: {str(e)}")
+           return None
+
    def load_history(self):
        """Load historical tracking data with validation"""
        if os.path.exists(self.history_file):
@@ -64,44 +143,68 @@ class MillionaireTracker:
                logger.warning("History file missing required columns, creating new history")
        return pd.DataFrame(columns=['wallet', 'total_pnl', 'first_seen', 'last_seen'])
 
-   def backup_data(self):
-       """Create timestamped backups of tracking data"""
-       timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-       for file in [self.history_file, self.current_file, self.stats_file]:
-           if os.path.exists(file):
-               backup_path = os.path.join(BACKUP_DIR, f'{timestamp}_{os.path.basename(file)}')
-               shutil.copy2(file, backup_path)
-               logger.info(f"Backup created: {backup_path}")
-
    def generate_statistics(self, current_data, history_data):
-       """Generate comprehensive statistics about millionaire wallets"""
+       """Generate comprehensive statistics about millionaire wallets
+
+       history_data is the merged history, so today's new wallets are the ones
+       first seen today. Tier and histogram bins are right-open, so a wallet at
+       exactly $5M counts in 5M-10M only.
+       """
        today = datetime.now().strftime('%Y-%m-%d')
+       summary = summarize(current_data['total_pnl'], self.tier_edges, self.percentiles)
        
        stats = {
            "date": today,
-           "total_current_millionaires": len(current_data),
+           "total_current_millionaires": summary['count'],
            "historical_total": len(history_data),
-           "new_today": len(current_data[~current_data['wallet'].isin(history_data['wallet'])]),
-           "pnl_stats": {
-               "highest": float(current_data['total_pnl'].max()),
-               "average": float(current_data['total_pnl'].mean()),
-               "median": float(current_data['total_pnl'].median()),
-               "total_combined": float(current_data['total_pnl'].sum())
-           },
-           "categories": {
-               "1M-5M": int(len(current_data[current_data['total_pnl'].between(1000000, 5000000)])),
-               "5M-10M": int(len(current_data[current_data['total_pnl'].between(5000000, 10000000)])),
-               "10M+": int(len(current_data[current_data['total_pnl'] > 10000000]))
-           }
+           "new_today": int((history_data['first_seen'] == today).sum()),
+           "pnl_stats": summary['pnl_stats'],
+           "percentiles": summary['percentiles'],
+           "categories": summary['categories'],
+           "histogram": summary['histogram']
        }
        
        return stats
 
+   def merge_history(self, history, millionaires, today):
+       """Upsert today's millionaires into history keyed on wallet
+
+       Rows are summed per wallet first, so millionaires may be the per-wallet
+       totals from fetch_current_data or raw rows with one row per wallet and
+       token. Existing wallets get a new total_pnl and last_seen and
+       keep their first_seen; new wallets are appended with first_seen = today.
+       """
+       latest = millionaires.groupby('wallet', sort=False)['total_pnl'].sum()
+       history = history.drop_duplicates(subset='wallet', keep='last').reset_index(drop=True)
+       
+       # One hash lookup per wallet locates every existing row at once
+       positions = pd.Index(history['wallet']).get_indexer(latest.index)
+       known = positions >= 0
+       
+       total_pnl = history['total_pnl'].to_numpy(dtype=float, copy=True)
+       total_pnl[positions[known]] = latest.to_numpy()[known]
+       last_seen = history['last_seen'].to_numpy(dtype=object, copy=True)
+       last_seen[positions[known]] = today
+       history = history.assign(total_pnl=total_pnl, last_seen=last_seen)
+       
+       new_rows = pd.DataFrame({
+           'wallet': latest.index[~known],
+           'total_pnl': latest.to_numpy()[~known],
+           'first_seen': today,
+           'last_seen': today
+       })
+       history = pd.concat([history, new_rows], ignore_index=True)
+       return history[['wallet', 'total_pnl', 'first_seen', 'last_seen']]
+
    def update_tracking(self):
-       """Update tracker with latest data and generate reports"""
+       """Update tracker with latest data and generate reports
+
+       Returns today's millionaires, or None when there was nothing new to process.
+       """
        try:
            # Fetch and validate current data
-           current_data = self.fetch_current_data()
+           with metrics.timer('fetch'):
+               current_data = self.fetch_current_data()
            if current_data is None:
                return
            
@@ -109,39 +212,31 @@ class MillionaireTracker:
            millionaires = current_data[current_data['total_pnl'] > 1000000].copy()
            today = datetime.now().strftime('%Y-%m-%d')
            
-           # Load and update history
-           history = self.load_history()
-           
-           # Backup existing data before updates
-           self.backup_data()
+           metrics.count('wallets_processed_total', len(millionaires))
            
-           # Update historical records
-           for _, row in millionaires.iterrows():
-               wallet = row['wallet']
-               if wallet in history['wallet'].values:
-                   # Update existing wallet
-                   history.loc[history['wallet'] == wallet, ['total_pnl', 'last_seen']] = [
-                       row['total_pnl'], 
-                       today
-                   ]
-               else:
-                   # Add new wallet
-                   new_row = pd.DataFrame({
-                       'wallet': [wallet],
-                       'total_pnl': [row['total_pnl']],
-                       'first_seen': [today],
-                       'last_seen': [today]
-                   })
-                   history = pd.concat([history, new_row], ignore_index=True)
+           # Load and update history
+           with metrics.timer('merge_history'):
+               history = self.load_history()
+               
+               # Update historical records
+               history = self.merge_history(history, millionaires, today)
            
-           # Generate and save statistics
-           stats = self.generate_statistics(millionaires, history)
+           # Generate and save statistics, folding today into the monthly rollups
+           with metrics.timer('statistics'):
+               stats = self.generate_statistics(millionaires, history)
+               self.rollup.add_day(today, millionaires['total_pnl'], stats['new_today'])
+               stats['trend'] = self.rollup.trend()
            
            # Save all updated data
-           history.to_csv(self.history_file, index=False)
-           millionaires.to_csv(self.current_file, index=False)
-           with open(self.stats_file, 'w') as f:
-               json.dump(stats, f, indent=4)
+           with metrics.timer('save'):
+               history.to_csv(self.history_file, index=False)
+               millionaires.to_csv(self.current_file, index=False)
+               with open(self.stats_file, 'w') as f:
+                   json.dump(stats, f, indent=4)
+               # Keep the day's PnL in the snapshot store; history only has the latest
+               self.snapshots.append(today, millionaires)
+               self.rollup.save()
+               self.commit_ingest_state()
            
            # Print summary
            print("\nPumpFun Millionaire Tracker Summary")
@@ -154,17 +249,48 @@ class MillionaireTracker:
            print(f"Average PNL: ${stats['pnl_stats']['average']:,.2f}")
            print(f"Median PNL: ${stats['pnl_stats']['median']:,.2f}")
            print(f"Total Combined PNL: ${stats['pnl_stats']['total_combined']:,.2f}")
+           print("\nPNL Tiers:")
+           for tier, count in stats['categories'].items():
+               print(f"{tier}: {count}")
+           
+           return millionaires
            
        except Exception as e:
            logger.error(f"Error updating tracker: {str(e)}")
            raise
 
-def main():
+def parse_args(argv=None):
+   parser = argparse.ArgumentParser(description="Track PumpFun millionaire wallets from Dune")
+   parser.add_argument('--force', action='store_true',
+                       help="Process the latest result even if it was already processed")
+   parser.add_argument('--page-size', type=int, default=50000, help="Rows fetched per Dune request")
+   parser.add_argument('--local-dune', metavar='CSV',
+                       help="Serve query results from a local CSV instead of the Dune API")
+   parser.add_argument('--trades', metavar='PARQUET',
+                       help="Compute the query locally from a dex_solana.trades Parquet dataset")
+   parser.add_argument('--tier-edges', type=float, nargs='+', default=TIER_EDGES,
+                       help="Lower edges of the PnL tiers; each tier runs up to the next edge")
+   parser.add_argument('--percentiles', type=float, nargs='+', default=PERCENTILES)
+   add_instrumentation_arguments(parser)
+   return parser.parse_args(argv)
+
+def main(argv=None):
    try:
-       logger.info("Starting millionaire tracker update...")
-       tracker = MillionaireTracker()
-       tracker.update_tracking()
-       logger.info("Update complete")
+       args = parse_args(argv)
+       with instrumented('get_millionaires', args):
+          logger.info("Starting millionaire tracker update...")
+          dune = None
+          if args.local_dune:
+              from mock_dune import LocalDuneClient
+              dune = LocalDuneClient(args.local_dune)
+          elif args.trades:
+              from mock_dune import LocalDuneClient
+              from pnl_engine import profitable_wallets
+              dune = LocalDuneClient(profitable_wallets(args.trades))
+          tracker = MillionaireTracker(dune=dune, page_size=args.page_size, force=args.force,
+                                       tier_edges=args.tier_edges, percentiles=args.percentiles)
+          tracker.update_tracking()
+          logger.info("Update complete")
        
    except Exception as e:
        logger.error(f"Tracker failed: {str(e)}")
@@ -0,0 +1,147 @@
+import os
+import ast
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from address_registry import encode_dictionary
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+HOLDINGS_FILE = os.path.join(DATA_DIR, 'holdings.parquet')
+
+HOLDINGS_COLUMNS = ['wallet', 'mint', 'amount', 'snapshot_date']
+
+HOLDINGS_SCHEMA = pa.schema([
+    ('wallet', pa.dictionary(pa.int32(), pa.string())),
+    ('mint', pa.dictionary(pa.int32(), pa.string())),
+    ('amount', pa.float64()),
+    ('snapshot_date', pa.dictionary(pa.int8(), pa.string())),
+])
+
+
+def empty_holdings():
+    return pd.DataFrame({
+        'wallet': pd.Series(dtype='category'),
+        'mint': pd.Series(dtype='category'),
+        'amount': pd.Series(dtype='float64'),
+        'snapshot_date': pd.Series(dtype='category')
+    })
+
+
+def holdings_frame(analyses, snapshot_date):
+    """Explode wallet analyses into the long (wallet, mint, amount, snapshot_date) table
+
+    analyses are wallet_details records carrying a token_holdings list. Wallets
+    the Dune query listed more than once are only exploded once.
+    """
+    wallets, mints, amounts = [], [], []
+    seen = set()
+    for analysis in analyses:
+        wallet = analysis['wallet']
+        if wallet in seen:
+            continue
+        seen.add(wallet)
+        for holding in analysis.get('token_holdings') or []:
+            wallets.append(wallet)
+            mints.append(holding.get('mint'))
+            amounts.append(float(holding.get('amount') or 0))
+    if not wallets:
+        return empty_holdings()
+    return pd.DataFrame({
+        'wallet': pd.Categorical(wallets),
+        'mint': pd.Categorical(mints),
+        'amount': amounts,
+        'snapshot_date': pd.Categorical([snapshot_date] * len(wallets))
+    })
+
+
+def write_holdings(holdings, path=HOLDINGS_FILE):
+    """Write the holdings table as Parquet with dictionary-encoded strings"""
+    table = pa.Table.from_pandas(holdings[HOLDINGS_COLUMNS], schema=HOLDINGS_SCHEMA, preserve_index=False)
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path, compression='zstd')
+    os.replace(tmp_path, path)
+    logger.info(f"Holdings store written: {len(holdings)} rows to {path}")
+
+
+def read_holdings(path=HOLDINGS_FILE, columns=None, wallets=None, min_amount=None):
+    """Load the holdings table, pushing column and row filters down to Parquet
+
+    wallets restricts the load to those wallets and min_amount drops smaller
+    positions; both are applied while reading rather than after.
+    """
+    filters = []
+    if wallets is not None:
+        filters.append(('wallet', 'in', list(dict.fromkeys(wallets))))
+    if min_amount is not None:
+        filters.append(('amount', '>', float(min_amount)))
+    table = pq.read_table(path, columns=columns, filters=filters or None)
+    return table.to_pandas()
+
+
+def read_holdings_ids(wallets, mints, path=HOLDINGS_FILE, min_amount=None):
+    """Load the holdings table as int32 wallet_id and mint_id columns plus amount
+
+    wallets and mints are AddressRegistry instances that number the
+    addresses. Strings are decoded once per dictionary entry of each
+    Parquet chunk and never materialized per row.
+    """
+    filters = [('amount', '>', float(min_amount))] if min_amount is not None else None
+    table = pq.read_table(path, columns=['wallet', 'mint', 'amount'], filters=filters)
+    wallet_ids = [encode_dictionary(wallets, chunk) for chunk in table['wallet'].chunks]
+    mint_ids = [encode_dictionary(mints, chunk) for chunk in table['mint'].chunks]
+    return pd.DataFrame({
+        'wallet_id': np.concatenate(wallet_ids) if wallet_ids else np.empty(0, dtype=np.int32),
+        'mint_id': np.concatenate(mint_ids) if mint_ids else np.empty(0, dtype=np.int32),
+        'amount': table['amount'].to_numpy()
+    })
+
+
+def parse_holdings_string(holdings_str):
+    """Parse a legacy token_holdings CSV cell into a list of holdings"""
+    if not isinstance(holdings_str, str) or not holdings_str or holdings_str == '[]':
+        return []
+    return ast.literal_eval(holdings_str)
+
+
+def holdings_from_strings(df, wallet_column='wallet'):
+    """Build the holdings table from a legacy token_holdings string column"""
+    if 'token_holdings' not in df.columns:
+        return empty_holdings()
+    analyses = [
+        {'wallet': wallet, 'token_holdings': parse_holdings_string(holdings_str)}
+        for wallet, holdings_str in zip(df[wallet_column], df['token_holdings'])
+    ]
+    return holdings_frame(analyses, snapshot_date=None)
+
+
+def load_holdings(df=None, wallet_column='wallet', path=HOLDINGS_FILE, wallets=None):
+    """Holdings for a run: the Parquet store when present, else parsed from df
+
+    Falls back to the token_holdings strings of df (a DataFrame or a CSV path,
+    only read when needed) so outputs written before the store existed keep
+    working.
+    """
+    if os.path.exists(path):
+        return read_holdings(path, wallets=wallets)
+    if isinstance(df, str):
+        df = pd.read_csv(df) if os.path.exists(df) else None
+    if df is not None:
+        logger.warning(f"{path} not found, parsing token_holdings strings instead")
+        holdings = holdings_from_strings(df, wallet_column)
+        if wallets is not None:
+            holdings = holdings[holdings['wallet'].isin(list(wallets))]
+        return holdings
+    return empty_holdings()
+
+
+def holdings_by_wallet(holdings):
+    """Group the long table into {wallet: [{'mint': ..., 'amount': ...}, ...]}"""
+    grouped = {}
+    for wallet, mint, amount in zip(holdings['wallet'], holdings['mint'], holdings['amount']):
+        grouped.setdefault(wallet, []).append({'mint': mint, 'amount': amount})
+    return grouped
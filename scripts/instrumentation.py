@@ -0,0 +1,345 @@
+import os
+import io
+import json
+import time
+import queue
+import atexit
+import bisect
+import pstats
+import logging
+import cProfile
+import threading
+import tracemalloc
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Run metrics are written next to tracker_statistics.json
+METRICS_DIR = os.path.join(BASE_DIR, 'tracking')
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+METRIC_PREFIX = 'pumpfun'
+# Upper bounds in seconds of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Seconds between progress lines of a long loop
+PROGRESS_INTERVAL = 10.0
+PROFILE_MODES = ('cpu', 'memory', 'all')
+PROFILE_TOP = 25
+
+
+def configure_logging(path=None, level=logging.INFO):
+    """logging.basicConfig for the scripts, with the writing moved off the calling thread
+
+    Records go to stderr and, when path is given, to that file. The
+    calling thread only puts them on a queue; a QueueListener thread
+    formats and writes them, so a slow disk or terminal does not hold up
+    a fetch loop. Like basicConfig, nothing changes when the root logger
+    already has handlers, so whichever script is imported first decides.
+    A forked worker process has no listener thread, so it writes directly.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if path:
+        handlers.insert(0, logging.FileHandler(path))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    def write_directly():
+        root.removeHandler(queue_handler)
+        for handler in handlers:
+            root.addHandler(handler)
+
+    os.register_at_fork(after_in_child=write_directly)
+    return listener
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
+
+
+class Timer:
+    """Context manager recording its block's duration into a Metrics histogram
+
+    The elapsed time stays readable as seconds once the block is left.
+    """
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.seconds = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        self.metrics.observe(self.name, self.seconds, **self.labels)
+
+
+class Metrics:
+    """Counters, gauges and histograms of one run, safe to update from any thread
+
+    Series are keyed by name and labels, as in Prometheus. Histograms keep
+    cumulative-ready bucket counts plus their sum and count, so recording a
+    latency is a bisect and a few additions under one lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': buckets, 'counts': [0] * (len(buckets) + 1),
+                                                    'sum': 0.0, 'count': 0}
+            histogram['counts'][bisect.bisect_left(buckets, value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def timer(self, stage, name='stage_seconds', **labels):
+        """Time a block as one observation of name{stage=...}"""
+        return Timer(self, name, dict(labels, stage=stage))
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+    def report(self):
+        """Every series as JSON-ready dicts"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            gauges = [{'name': name, 'labels': dict(labels), 'value': value}
+                      for (name, labels), value in sorted(self.gauges.items())]
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                bounds = [*histogram['buckets'], 'inf']
+                histograms.append({
+                    'name': name, 'labels': dict(labels), 'count': histogram['count'],
+                    'sum': round(histogram['sum'], 6),
+                    'mean': round(histogram['sum'] / histogram['count'], 6) if histogram['count'] else None,
+                    'buckets': {str(bound): count for bound, count in zip(bounds, histogram['counts']) if count}
+                })
+        return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+    def prometheus(self, prefix=METRIC_PREFIX, **extra_labels):
+        """The series in the Prometheus text exposition format
+
+        extra_labels (e.g. the script name) are added to every series, so the
+        files of several scripts can sit in one textfile collector directory.
+        """
+        extra = _label_key(extra_labels)
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                full = f'{prefix}_{name}'
+                declare(full, 'counter')
+                lines.append(f'{full}{_format_labels(extra + labels)} {value}')
+            for (name, labels), value in sorted(self.gauges.items()):
+                full = f'{prefix}_{name}'
+                declare(full, 'gauge')
+                lines.append(f'{full}{_format_labels(extra + labels)} {value}')
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                full = f'{prefix}_{name}'
+                declare(full, 'histogram')
+                cumulative = 0
+                for bound, count in zip([*histogram['buckets'], '+Inf'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f'{full}_bucket{_format_labels(extra + labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{full}_sum{_format_labels(extra + labels)} {histogram["sum"]}')
+                lines.append(f'{full}_count{_format_labels(extra + labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by every module of a process
+metrics = Metrics()
+
+
+class ProgressLog:
+    """Sampled progress of a loop: one INFO line per interval instead of one per item
+
+    Every update also adds the items to the metric counter, labeled with
+    stage when given, which the run report's per-second rates come from.
+    """
+
+    def __init__(self, log, total, label='wallets', stage=None, metric='wallets_processed_total',
+                 interval=PROGRESS_INTERVAL):
+        self.log = log
+        self.total = total
+        self.label = label
+        self.labels = {'stage': stage} if stage else {}
+        self.metric = metric
+        self.interval = interval
+        self.done = 0
+        self.start = self.last = time.perf_counter()
+
+    def update(self, items=1):
+        self.done += items
+        metrics.count(self.metric, items, **self.labels)
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.done == self.total:
+            self.last = now
+            rate = self.done / (now - self.start) if now > self.start else 0.0
+            eta = (self.total - self.done) / rate if rate and self.total else 0.0
+            self.log.info(f"Progress: {self.done}/{self.total} {self.label} ({rate:.1f}/s, ETA {eta:.0f}s)")
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _cpu_profile_report(profiler, path):
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP)
+    return {'stats_file': path, 'top_cumulative': out.getvalue().splitlines()}
+
+
+def _memory_profile_report():
+    current, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+    return {'current_bytes': current, 'peak_bytes': peak,
+            'top_allocations': [{'where': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                                for stat in top]}
+
+
+def run_report(name, status, seconds, profile=None):
+    """The JSON run report: metrics plus per-second rates of every *_processed_total counter
+
+    A counter labeled with a stage is divided by that stage's timed seconds
+    when it has any, e.g. fetch_wallets_per_second; others by the run's.
+    """
+    report = {'script': name, 'status': status,
+              'started_at': datetime.fromtimestamp(metrics.started).isoformat(timespec='seconds'),
+              'finished_at': datetime.now().isoformat(timespec='seconds'),
+              'seconds': round(seconds, 3), **metrics.report()}
+    stage_seconds = {histogram['labels']['stage']: histogram['sum'] for histogram in report['histograms']
+                     if histogram['name'] == 'stage_seconds'}
+    report['rates'] = {}
+    for counter in report['counters']:
+        if not counter['name'].endswith('_processed_total'):
+            continue
+        stage = counter['labels'].get('stage')
+        rate = f"{counter['name'][:-len('_processed_total')]}_per_second"
+        key = f"{stage}_{rate}" if stage else rate
+        elapsed = stage_seconds.get(stage) or seconds
+        if elapsed:
+            report['rates'][key] = round(report['rates'].get(key, 0) + counter['value'] / elapsed, 3)
+    if profile:
+        report['profile'] = profile
+    return report
+
+
+def export(name, status, seconds, metrics_dir=METRICS_DIR, profile=None):
+    """Write <name>.prom and <name>_run.json into metrics_dir, each replaced atomically
+
+    status is 'ok' or 'failed' at the end of a run, or 'running' for the
+    interim exports of a long-running process.
+    """
+    os.makedirs(metrics_dir, exist_ok=True)
+    metrics.set('run_seconds', round(seconds, 3))
+    metrics.set('run_success', int(status != 'failed'))
+    metrics.set('run_finished_timestamp_seconds', int(time.time()))
+    prom_path = os.path.join(metrics_dir, f'{name}.prom')
+    report_path = os.path.join(metrics_dir, f'{name}_run.json')
+    _write_atomic(prom_path, metrics.prometheus(script=name))
+    _write_atomic(report_path, json.dumps(run_report(name, status, seconds, profile), indent=4))
+    return prom_path, report_path
+
+
+@contextmanager
+def instrumented(name, args=None):
+    """Wrap a script's run: optional profiling, then the metrics export, also on failure
+
+    Metrics start from zero, so a run reports only its own work. args are
+    the parsed options of add_instrumentation_arguments; without them
+    metrics still go to METRICS_DIR and nothing is profiled.
+    """
+    metrics_dir = getattr(args, 'metrics_dir', METRICS_DIR)
+    profile = getattr(args, 'profile', None)
+    metrics.reset()
+    if metrics_dir == 'off':
+        yield metrics
+        return
+    cpu = profile in ('cpu', 'all')
+    memory = profile in ('memory', 'all')
+    profiler = cProfile.Profile() if cpu else None
+    if memory:
+        tracemalloc.start()
+    if profiler:
+        profiler.enable()
+    status = 'failed'
+    start = time.perf_counter()
+    try:
+        yield metrics
+        status = 'ok'
+    finally:
+        seconds = time.perf_counter() - start
+        report = {}
+        if profiler:
+            profiler.disable()
+            os.makedirs(metrics_dir, exist_ok=True)
+            report['cpu'] = _cpu_profile_report(profiler, os.path.join(metrics_dir, f'{name}.prof'))
+        if memory:
+            report['memory'] = _memory_profile_report()
+            tracemalloc.stop()
+        prom_path, report_path = export(name, status, seconds, metrics_dir, report or None)
+        logger.info(f"Metrics written to {prom_path} and {report_path}")
+
+
+def add_instrumentation_arguments(parser):
+    """Register the shared --metrics-dir / --profile options on a parser"""
+    parser.add_argument('--metrics-dir', default=METRICS_DIR,
+                        help="Where the Prometheus textfile and JSON run report go ('off' to skip them)")
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help="Profile the run with cProfile (cpu), tracemalloc (memory) or both (all)")
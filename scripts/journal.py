@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def row_key(wallet, pnl):
+    """Journal key of an input row; the Dune query may list a wallet once per token"""
+    return f"{wallet}:{pnl}"
+
+
+class WalletJournal:
+    """Append-only JSONL journal with one record per finished wallet
+
+    Each line holds {"key": ..., "record": ...}; the key defaults to the
+    record's wallet but callers may pass their own. Records are flushed as
+    they are written and fsynced every fsync_every records, so a crash loses
+    at most the last unsynced batch. A truncated final line left by a crash is
+    ignored on load. Opening without resume starts a fresh journal.
+    """
+
+    def __init__(self, path, key='wallet', resume=False, fsync_every=50):
+        self.path = path
+        self.key = key
+        self.fsync_every = max(1, int(fsync_every))
+        self._records = {}
+        self._unsynced = 0
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+            # Rewrite so a torn last line cannot merge with the next record
+            self._rewrite()
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+
+    def _load(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring unreadable journal line {line_number} in {self.path}")
+                    continue
+                self._records[record['key']] = record['record']
+        logger.info(f"Resuming from {len(self._records)} journaled wallets in {self.path}")
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for key, record in self._records.items():
+                f.write(json.dumps({'key': key, 'record': record}) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def __contains__(self, key):
+        return key in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, key):
+        """The journaled record of key, or None"""
+        return self._records.get(key)
+
+    def completed(self):
+        """Keys of every wallet already in the journal"""
+        return set(self._records)
+
+    def append(self, record, key=None):
+        """Journal one finished wallet"""
+        key = record[self.key] if key is None else key
+        self._records[key] = record
+        self._file.write(json.dumps({'key': key, 'record': record}) + '\n')
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        if self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def compact(self, order=None, output_paths=()):
+        """Materialize the journal as a DataFrame and write it to output_paths
+
+        order is the input's key sequence; rows follow it, so a key listed
+        twice in the input appears twice in the output just as it would have
+        without the journal. Paths ending in .parquet are written as Parquet,
+        anything else as CSV.
+        """
+        if order is None:
+            records = list(self._records.values())
+        else:
+            records = [self._records[key] for key in order if key in self._records]
+        df = pd.DataFrame(records)
+        for path in output_paths:
+            if path.endswith('.parquet'):
+                df.to_parquet(path, index=False)
+            else:
+                df.to_csv(path, index=False)
+        return df
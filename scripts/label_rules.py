@@ -0,0 +1,106 @@
+import os
+import re
+import json
+import numpy as np
+import pandas as pd
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'label_rules.json')
+
+# How each mint rule kind is written as a regex alternative
+RULE_KINDS = {
+    'contains': lambda text: re.escape(text),
+    'prefix': lambda text: '^' + re.escape(text),
+    'suffix': lambda text: re.escape(text) + '$',
+}
+
+
+class LabelRules:
+    """Wallet labeling rules from a declarative rule file
+
+    Mint rules (substrings, prefixes and suffixes, matched case-insensitively)
+    are compiled into one regex. Each rule is a named group inside a
+    lookahead, so a single scan of a mint reports every rule it matches, also
+    when their matches overlap (though not two rules starting at the same
+    character). Adding a rule adds an alternative, not another pass.
+    Amount thresholds and tier edges come from the same file. A value falls
+    in the tier after the last edge it exceeds, matching the '>' comparisons
+    the scripts used before.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.mint_rule_names = list(rules.get('mint_rules', {}))
+        alternatives = []
+        for i, (name, spec) in enumerate(rules.get('mint_rules', {}).items()):
+            patterns = [RULE_KINDS[kind](text) for kind, texts in spec.items() for text in texts]
+            alternatives.append(f"(?P<r{i}>{'|'.join(patterns)})")
+        self.pattern = re.compile(f"(?=(?:{'|'.join(alternatives)}))", re.IGNORECASE) if alternatives else None
+        self.amount_thresholds = rules.get('amount_thresholds', {})
+        self.tiers = rules.get('tiers', {})
+        self._mint_cache = {}
+
+    @classmethod
+    def load(cls, path=RULES_FILE):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _scan(self, mint):
+        if self.pattern is None:
+            return frozenset()
+        return frozenset(self.mint_rule_names[int(m.lastgroup[1:])] for m in self.pattern.finditer(mint))
+
+    def match(self, mint):
+        """Names of the mint rules a mint matches, cached per mint"""
+        mint = str(mint)
+        matched = self._mint_cache.get(mint)
+        if matched is None:
+            matched = self._mint_cache[mint] = self._scan(mint)
+        return matched
+
+    def match_counts(self, mints):
+        """Number of mints matching each rule"""
+        counts = dict.fromkeys(self.mint_rule_names, 0)
+        for mint in mints:
+            for name in self.match(mint):
+                counts[name] += 1
+        return counts
+
+    def mint_flags(self, mints):
+        """{rule: boolean array} per entry of a mint column, one scan per distinct mint"""
+        if not isinstance(mints.dtype, pd.CategoricalDtype):
+            mints = mints.astype('category')
+        codes = mints.cat.codes.to_numpy()
+        names = mints.cat.categories.astype(str)
+        flags = {}
+        for name in self.mint_rule_names:
+            # Missing mints have code -1, which indexes the appended False
+            flags[name] = np.zeros(len(names) + 1, dtype=bool)
+        for i, mint in enumerate(names):
+            for name in self._scan(mint):
+                flags[name][i] = True
+        return {name: flag[codes] for name, flag in flags.items()}
+
+    def threshold(self, name):
+        return self.amount_thresholds[name]
+
+    def tier(self, name, value):
+        """Label of the tier value falls in"""
+        tier = self.tiers[name]
+        return tier['labels'][int(np.searchsorted(tier['edges'], value, side='left'))]
+
+    def tier_labels(self, name, values):
+        """Tier labels for an array of values"""
+        tier = self.tiers[name]
+        positions = np.searchsorted(tier['edges'], np.asarray(values, dtype=float), side='left')
+        return np.asarray(tier['labels'], dtype=object)[positions]
+
+
+_default_rules = None
+
+
+def default_rules():
+    """The rules in label_rules.json, loaded once per process"""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = LabelRules.load()
+    return _default_rules
@@ -0,0 +1,72 @@
+import hashlib
+import pandas as pd
+from datetime import datetime, timezone
+from dune_client.models import ResultsResponse
+
+
+class LocalDuneClient:
+    """Offline stand-in for DuneClient serving rows from a DataFrame or CSV
+
+    Implements the two calls MillionaireTracker makes: get_latest_result for
+    execution metadata and get_execution_results for paginated rows. Calling
+    new_execution() simulates Dune finishing a fresh run of the query; the
+    execution id is derived from the rows unless one is given.
+    """
+
+    def __init__(self, rows, query_id=4364994, execution_id=None):
+        self.query_id = query_id
+        self.page_requests = 0
+        self.new_execution(rows, execution_id)
+
+    def new_execution(self, rows, execution_id=None):
+        if isinstance(rows, str):
+            rows = pd.read_csv(rows)
+        self.rows = rows.reset_index(drop=True)
+        if execution_id is None:
+            # Same rows give the same execution id, like re-reading an unchanged result
+            digest = hashlib.sha256(pd.util.hash_pandas_object(self.rows, index=False).to_numpy().tobytes())
+            execution_id = f"01LOCAL{digest.hexdigest()[:20].upper()}"
+        self.execution_id = execution_id
+        self.ended_at = datetime.now(timezone.utc).isoformat()
+
+    def _response(self, rows, next_offset=None):
+        records = rows.to_dict('records')
+        return ResultsResponse.from_dict({
+            'execution_id': self.execution_id,
+            'query_id': self.query_id,
+            'state': 'QUERY_STATE_COMPLETED',
+            'submitted_at': self.ended_at,
+            'execution_started_at': self.ended_at,
+            'execution_ended_at': self.ended_at,
+            'expires_at': self.ended_at,
+            'result': {
+                'rows': records,
+                'metadata': {
+                    'column_names': list(self.rows.columns),
+                    'column_types': ['varchar'] * len(self.rows.columns),
+                    'row_count': len(records),
+                    'result_set_bytes': 0,
+                    'total_row_count': len(self.rows),
+                    'total_result_set_bytes': 0,
+                    'datapoint_count': len(records) * len(self.rows.columns),
+                    'pending_time_millis': 0,
+                    'execution_time_millis': 0
+                }
+            },
+            'next_uri': None,
+            'next_offset': next_offset
+        })
+
+    def get_latest_result(self, query, sample_count=None, batch_size=None, **kwargs):
+        if sample_count is not None:
+            return self._response(self.rows.head(sample_count))
+        return self._response(self.rows)
+
+    def get_execution_results(self, job_id, limit=None, offset=None, **kwargs):
+        if job_id != self.execution_id:
+            raise ValueError(f"Unknown execution {job_id}")
+        self.page_requests += 1
+        offset = offset or 0
+        end = len(self.rows) if limit is None else offset + limit
+        next_offset = end if end < len(self.rows) else None
+        return self._response(self.rows.iloc[offset:end], next_offset)
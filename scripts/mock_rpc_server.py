@@ -0,0 +1,350 @@
+import json
+import time
+import base64
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+from token_accounts import BASE58_ALPHABET, TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID, b58decode, b58encode
+
+
+def fake_address(rng, suffix=''):
+    """Generate a base58 string shaped like a Solana address"""
+    body = ''.join(rng.choices(BASE58_ALPHABET, k=44 - len(suffix)))
+    return body + suffix
+
+
+def wallet_rng(wallet):
+    """Deterministic random generator for a wallet address"""
+    seed = int.from_bytes(hashlib.sha256(wallet.encode()).digest()[:8], 'big')
+    return random.Random(seed)
+
+
+def fake_mint(rng, pump):
+    """A 32-byte mint address, ending in 'pump' like pump.fun mints when asked"""
+    if not pump:
+        return b58encode(rng.randbytes(32))
+    # A leading digit of 1..15 keeps 44 base58 digits within 32 bytes
+    return rng.choice(BASE58_ALPHABET[1:16]) + fake_address(rng, 'pump')[1:]
+
+
+def mint_decimals(mint):
+    return wallet_rng(mint + ':decimals').choice([6, 6, 9])
+
+
+def fake_token_accounts(wallet, max_accounts=150, program_id=TOKEN_PROGRAM_ID):
+    """Deterministic token accounts for a wallet, roughly 80% pump mints
+
+    Token-2022 holds a smaller, separate set of accounts.
+    """
+    if program_id == TOKEN_2022_PROGRAM_ID:
+        rng = wallet_rng(wallet + ':token-2022')
+        count = min(max_accounts, int(rng.paretovariate(1.2)))
+    else:
+        rng = wallet_rng(wallet)
+        count = min(max_accounts, int(rng.paretovariate(1.2)) * 3)
+    accounts = []
+    for _ in range(count):
+        mint = fake_mint(rng, rng.random() < 0.8)
+        decimals = mint_decimals(mint)
+        raw_amount = int(round(rng.choice([0, 0, rng.uniform(1, 1e4), rng.uniform(1e4, 5e7)]), 6) * 10 ** decimals)
+        accounts.append({
+            'pubkey': fake_address(rng),
+            'account': {
+                'data': {
+                    'parsed': {
+                        'info': {
+                            'isNative': False,
+                            'mint': mint,
+                            'owner': wallet,
+                            'state': 'initialized',
+                            'tokenAmount': {
+                                'amount': str(raw_amount),
+                                'decimals': decimals,
+                                'uiAmount': raw_amount / 10 ** decimals,
+                                'uiAmountString': str(raw_amount / 10 ** decimals)
+                            }
+                        },
+                        'type': 'account'
+                    },
+                    'program': 'spl-token' if program_id == TOKEN_PROGRAM_ID else 'spl-token-2022',
+                    'space': 165
+                },
+                'executable': False,
+                'lamports': 2039280,
+                'owner': program_id,
+                'rentEpoch': 18446744073709551615,
+                'space': 165
+            }
+        })
+    return accounts
+
+
+def account_bytes(account):
+    """Binary layout of a parsed token account: mint, owner, amount, then zeroed fields"""
+    info = account['account']['data']['parsed']['info']
+    owner = hashlib.sha256(info['owner'].encode()).digest()
+    amount = int(info['tokenAmount']['amount']).to_bytes(8, 'little')
+    return (b58decode(info['mint']) + owner + amount).ljust(165, b'\0')
+
+
+def mint_bytes(mint):
+    """Binary layout of a mint account with its decimals at offset 44"""
+    return (b'\0' * 44 + bytes([mint_decimals(mint)]) + b'\1').ljust(82, b'\0')
+
+
+def encode_data(data, config):
+    """Account data as a [base64, 'base64'] pair, cut to the requested dataSlice"""
+    data_slice = config.get('dataSlice')
+    if data_slice:
+        data = data[data_slice['offset']:data_slice['offset'] + data_slice['length']]
+    return [base64.b64encode(data).decode(), 'base64']
+
+
+def is_valid_address(address):
+    return isinstance(address, str) and 32 <= len(address) <= 44 and all(c in BASE58_ALPHABET for c in address)
+
+
+def fake_account_info(wallet):
+    """Deterministic system account for a wallet, None for ~5% of wallets"""
+    rng = wallet_rng(wallet + ':info')
+    if rng.random() < 0.05:
+        return None
+    return {
+        'data': ['', 'base64'],
+        'executable': False,
+        'lamports': int(rng.uniform(1e7, 1e12)),
+        'owner': '11111111111111111111111111111111',
+        'rentEpoch': 18446744073709551615,
+        'space': 0
+    }
+
+
+class MockSolanaRpc:
+    """Answers the subset of Solana JSON-RPC used by the analysis scripts"""
+
+    def __init__(self, slot=300000000, rate_limit=None, retry_after=1):
+        self.slot = slot
+        self.request_count = 0
+        self.call_count = 0
+        self.throttled_count = 0
+        # Mints handed out in token accounts, so account lookups can answer for them
+        self.mints = set()
+        # Transactions sent per wallet since start, bumped with transact()
+        self.activity = {}
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self._window = (0, 0)
+        self._lock = threading.Lock()
+
+    def throttled(self):
+        """True when this request exceeds rate_limit requests in the current second"""
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            second = int(time.time())
+            window, count = self._window
+            count = count + 1 if window == second else 1
+            self._window = (second, count)
+            if count > self.rate_limit:
+                self.throttled_count += 1
+                return True
+            return False
+
+    def context(self):
+        return {'apiVersion': '2.0.15', 'slot': self.slot}
+
+    def error(self, call, code, message):
+        return {'jsonrpc': '2.0', 'id': call.get('id'), 'error': {'code': code, 'message': message}}
+
+    def account_info(self, address, config):
+        if address not in self.mints:
+            return fake_account_info(address)
+        account = {
+            'data': ['', 'base64'],
+            'executable': False,
+            'lamports': 1461600,
+            'owner': TOKEN_PROGRAM_ID,
+            'rentEpoch': 18446744073709551615,
+            'space': 82
+        }
+        if config.get('encoding') == 'base64':
+            account['data'] = encode_data(mint_bytes(address), config)
+        else:
+            account['data'] = {'parsed': {'info': {'decimals': mint_decimals(address)}, 'type': 'mint'},
+                               'program': 'spl-token', 'space': 82}
+        return account
+
+    def transact(self, wallet):
+        """Give a wallet a new latest signature, as if it had just traded"""
+        with self._lock:
+            self.activity[wallet] = self.activity.get(wallet, 0) + 1
+
+    def signatures(self, address, config):
+        rng = wallet_rng(f"{address}:{self.activity.get(address, 0)}")
+        # Some wallets never transacted
+        if rng.random() < 0.02:
+            return []
+        return [{'signature': ''.join(rng.choices(BASE58_ALPHABET, k=88)), 'slot': self.slot - rng.randrange(10 ** 6),
+                 'err': None, 'memo': None, 'blockTime': None, 'confirmationStatus': 'finalized'}
+                ][:config.get('limit', 1000)]
+
+    def token_accounts(self, owner, program_id, config):
+        accounts = fake_token_accounts(owner, program_id=program_id)
+        with self._lock:
+            self.mints.update(a['account']['data']['parsed']['info']['mint'] for a in accounts)
+        if config.get('encoding') != 'base64':
+            return accounts
+        return [{**a, 'account': {**a['account'], 'data': encode_data(account_bytes(a), config)}}
+                for a in accounts]
+
+    def handle_call(self, call):
+        method = call.get('method')
+        params = call.get('params', [])
+        config = params[-1] if len(params) > 1 and isinstance(params[-1], dict) else {}
+        result = None
+        if method == 'getAccountInfo':
+            if not is_valid_address(params[0]):
+                return self.error(call, -32602, 'Invalid param: Invalid')
+            result = {'context': self.context(), 'value': self.account_info(params[0], config)}
+        elif method == 'getMultipleAccounts':
+            keys = params[0]
+            if len(keys) > 100:
+                return self.error(call, -32602, 'Too many inputs provided; max 100')
+            if not all(is_valid_address(key) for key in keys):
+                return self.error(call, -32602, 'Invalid param: Invalid')
+            result = {'context': self.context(), 'value': [self.account_info(key, config) for key in keys]}
+        elif method == 'getTokenAccountsByOwner':
+            if not is_valid_address(params[0]):
+                return self.error(call, -32602, 'Invalid param: Invalid')
+            program_id = params[1].get('programId') if len(params) > 1 else None
+            if program_id not in (TOKEN_PROGRAM_ID, TOKEN_2022_PROGRAM_ID):
+                return self.error(call, -32602, 'Invalid param: unrecognized Token program id')
+            result = {'context': self.context(), 'value': self.token_accounts(params[0], program_id, config)}
+        elif method == 'getSignaturesForAddress':
+            if not is_valid_address(params[0]):
+                return self.error(call, -32602, 'Invalid param: Invalid')
+            result = self.signatures(params[0], config)
+        else:
+            return self.error(call, -32601, 'Method not found')
+        return {'jsonrpc': '2.0', 'id': call.get('id'), 'result': result}
+
+    def handle(self, body):
+        with self._lock:
+            self.request_count += 1
+            self.call_count += len(body) if isinstance(body, list) else 1
+        if isinstance(body, list):
+            return [self.handle_call(call) for call in body]
+        return self.handle_call(body)
+
+
+def make_handler(rpc, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'null')
+            if rpc.throttled():
+                self.send_response(429)
+                self.send_header('Retry-After', str(rpc.retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            if latency:
+                time.sleep(latency)
+            payload = json.dumps(rpc.handle(body)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, rate_limit=None):
+    """Start the mock server on a background thread and return (server, url)
+
+    With rate_limit set, requests beyond that many per second get a 429.
+    """
+    rpc = MockSolanaRpc(rate_limit=rate_limit)
+    server = ThreadingHTTPServer((host, port), make_handler(rpc, latency))
+    server.daemon_threads = True
+    server.rpc = rpc
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def fake_wallets(count, seed=0):
+    rng = random.Random(seed)
+    return [(fake_address(rng), round(rng.uniform(1e6, 6e7), 2)) for _ in range(count)]
+
+
+def measure_throughput(wallet_count=200, in_flight_levels=(1, 8, 32), latency=0.05):
+    """Time WalletAnalyzer against the mock server at several in-flight limits"""
+    from wallet_details import WalletAnalyzer
+
+    server, url = start_server(latency=latency)
+    wallets = fake_wallets(wallet_count)
+    results = []
+    try:
+        for in_flight in in_flight_levels:
+            analyzer = WalletAnalyzer(rpc_url=url, max_in_flight=in_flight, rate=0)
+            start = time.perf_counter()
+            if in_flight > 1:
+                for _ in analyzer.analyze_wallets_concurrently(wallets):
+                    pass
+            else:
+                for wallet, pnl in wallets:
+                    analyzer.analyze_wallet_activity(wallet, pnl)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'max_in_flight': in_flight,
+                'wallets': wallet_count,
+                'seconds': round(elapsed, 3),
+                'wallets_per_sec': round(wallet_count / elapsed, 1)
+            })
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock Solana JSON-RPC server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds to delay every response")
+    parser.add_argument('--rate-limit', type=int, help="Answer 429 beyond this many requests per second")
+    parser.add_argument('--bench', type=int, metavar='WALLETS',
+                        help="Measure WalletAnalyzer throughput against a private server and exit")
+    parser.add_argument('--in-flight', type=int, nargs='+', default=[1, 8, 32])
+    args = parser.parse_args()
+
+    if args.bench:
+        for result in measure_throughput(args.bench, args.in_flight, args.latency or 0.05):
+            print(f"max_in_flight={result['max_in_flight']:>4}  "
+                  f"{result['wallets']} wallets in {result['seconds']:.2f}s  "
+                  f"({result['wallets_per_sec']:.1f} wallets/sec)")
+        return
+
+    server, url = start_server(args.host, args.port, args.latency, args.rate_limit)
+    print(f"Mock Solana RPC listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
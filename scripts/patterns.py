@@ -1,156 +1,225 @@
 import os
+import numpy as np
 import pandas as pd
 import logging
+import argparse
 from datetime import datetime
+from holdings_store import load_holdings, holdings_by_wallet, parse_holdings_string
+from sharding import run_sharded, DEFAULT_CHUNK_SIZE
+from label_rules import default_rules
+from instrumentation import configure_logging, instrumented, add_instrumentation_arguments
 
 # Setup directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-logging.basicConfig(
-   level=logging.INFO,
-   format='%(asctime)s - %(levelname)s - %(message)s',
-   handlers=[
-       logging.FileHandler(os.path.join(DATA_DIR, 'pattern_analysis.log')),
-       logging.StreamHandler()
-   ]
-)
+configure_logging(os.path.join(DATA_DIR, 'pattern_analysis.log'))
 logger = logging.getLogger(__name__)
 
+PROFILE_COLUMNS = ['wallet_address', 'total_pnl', 'category', 'trading_style',
+                   'token_count', 'patterns', 'last_analyzed']
+
 class WalletPatternAnalyzer:
-   def analyze_token_holdings(self, holdings_str):
+   def __init__(self, rules=None):
+       self.rules = rules or default_rules()
+
+   def analyze_token_holdings(self, holdings):
        try:
-           if not holdings_str or holdings_str == '[]':
+           if isinstance(holdings, str):
+               holdings = parse_holdings_string(holdings)
+           if not holdings:
                return []
 
-           holdings = eval(holdings_str)
            patterns = []
            
            # Token type analysis
-           pump_tokens = [t for t in holdings if 'pump' in str(t['mint']).lower()]
-           meme_tokens = [t for t in holdings if any(x in str(t['mint']).lower() for x in ['pepe', 'doge', 'shib', 'wojak', 'chad', 'elon'])]
-           high_value_tokens = [t for t in holdings if float(t.get('amount', 0)) > 1000000]
+           matches = [self.rules.match(t['mint']) for t in holdings]
+           pump_tokens = [t for t, matched in zip(holdings, matches) if 'pump' in matched]
+           meme_count = sum('meme' in matched for matched in matches)
+           whale_amount = self.rules.threshold('whale_position')
+           high_value_tokens = [t for t in holdings if float(t.get('amount', 0)) > whale_amount]
            
            # Identify trading patterns
            if pump_tokens:
                pump_volume = sum(float(t.get('amount', 0)) for t in pump_tokens)
                patterns.append(f"Pump Specialist ({len(pump_tokens)} tokens, {pump_volume:,.0f} volume)")
            
-           if meme_tokens:
-               patterns.append(f"Meme Trader ({len(meme_tokens)} tokens)")
+           if meme_count:
+               patterns.append(f"Meme Trader ({meme_count} tokens)")
            
            if high_value_tokens:
                patterns.append(f"Whale Positions ({len(high_value_tokens)} large holdings)")
-           
-           # Portfolio diversity
-           if len(holdings) > 100:
-               patterns.append("Super Diversified")
-           elif len(holdings) > 50:
-               patterns.append("Highly Diversified")
-           elif len(holdings) > 20:
-               patterns.append("Moderately Diversified")
-           elif len(holdings) > 5:
-               patterns.append("Focused Trader")
-           else:
-               patterns.append("Concentrated Positions")
                
            return patterns
        except Exception as e:
            logger.error(f"Error analyzing holdings: {str(e)}")
            return []
 
-   def get_wallet_profile(self, row):
-       """Generate comprehensive wallet profile"""
+   def get_wallet_profile(self, row, holdings=None):
+       """Generate comprehensive wallet profile
+
+       holdings is the wallet's list from the holdings store; without it the
+       legacy token_holdings string on the row is parsed once.
+       """
+       if holdings is None:
+           holdings = parse_holdings_string(row.get('token_holdings', '[]')) if 'token_holdings' in row else []
        pnl = float(row['total_pnl'])
        
-       # Base categorization
-       if pnl > 10000000:
-           category = "Mega Whale"
-       elif pnl > 5000000:
-           category = "Whale"
-       else:
-           category = "Large Trader"
+       # Category and trading style come from the tiers in the rule file
+       category = self.rules.tier('pnl_category', pnl)
+       style = self.rules.tier('trading_style', len(holdings))
 
        # Get trading patterns
-       patterns = self.analyze_token_holdings(row.get('token_holdings', '[]'))
-       
-       # Determine primary trading style
-       if 'Super Diversified' in patterns:
-           style = 'Super Diversified'
-       elif 'Highly Diversified' in patterns:
-           style = 'Highly Diversified'
-       elif 'Moderately Diversified' in patterns:
-           style = 'Moderately Diversified'
-       elif 'Focused Trader' in patterns:
-           style = 'Focused Trader'
-       elif 'Concentrated Positions' in patterns:
-           style = 'Concentrated Trader'
-       else:
-           style = 'Unknown'
-
-       # Remove style from patterns to avoid duplication
-       patterns = [p for p in patterns if p not in 
-                  ['Super Diversified', 'Highly Diversified', 
-                   'Moderately Diversified', 'Focused Trader', 
-                   'Concentrated Positions']]
+       patterns = self.analyze_token_holdings(holdings)
 
        return {
            'wallet_address': row['wallet'],
            'total_pnl': pnl,
            'category': category,
            'trading_style': style,
-           'token_count': len(eval(row.get('token_holdings', '[]'))) if 'token_holdings' in row else 0,
+           'token_count': len(holdings),
            'patterns': ' | '.join(patterns) if patterns else 'None Detected',
            'last_analyzed': datetime.now().strftime('%Y-%m-%d')
        }
 
-def main():
+   def analyze_frame(self, df, holdings):
+       """Profile every wallet of df at once from the long holdings table
+
+       Vectorized equivalent of calling get_wallet_profile per row: holdings
+       are matched against the mint rules once per distinct mint, aggregated
+       per wallet with one groupby, and the profile columns are assembled
+       with column operations. Returns the same columns, in df's row order.
+       """
+       flags = self.rules.mint_flags(holdings['mint'])
+       pump, meme = flags['pump'], flags['meme']
+       amount = holdings['amount'].astype(float).to_numpy()
+       per_wallet = pd.DataFrame({
+           'wallet': holdings['wallet'].astype(str).to_numpy(),
+           'token_count': 1,
+           'pump_count': pump.astype(int),
+           'pump_volume': np.where(pump, amount, 0.0),
+           'meme_count': meme.astype(int),
+           'whale_count': (amount > self.rules.threshold('whale_position')).astype(int)
+       }).groupby('wallet', sort=False).sum()
+
+       wallets = df['wallet'].astype(str)
+       stats = per_wallet.reindex(wallets.to_numpy()).fillna(0)
+       stats.index = df.index
+       token_count = stats['token_count'].astype(int)
+
+       pnl = df['total_pnl'].astype(float)
+       category = self.rules.tier_labels('pnl_category', pnl)
+       style = self.rules.tier_labels('trading_style', token_count)
+
+       pump_count = stats['pump_count'].astype(int)
+       meme_count = stats['meme_count'].astype(int)
+       whale_count = stats['whale_count'].astype(int)
+       parts = [
+           ('Pump Specialist (' + pump_count.astype(str) + ' tokens, '
+            + stats['pump_volume'].map('{:,.0f}'.format) + ' volume)').where(pump_count > 0),
+           ('Meme Trader (' + meme_count.astype(str) + ' tokens)').where(meme_count > 0),
+           ('Whale Positions (' + whale_count.astype(str) + ' large holdings)').where(whale_count > 0)
+       ]
+       patterns = pd.Series('', index=df.index)
+       for part in parts:
+           separator = np.where((patterns != '') & part.notna(), ' | ', '')
+           patterns = patterns + separator + part.fillna('')
+
+       return pd.DataFrame({
+           'wallet_address': df['wallet'],
+           'total_pnl': pnl,
+           'category': category,
+           'trading_style': style,
+           'token_count': token_count,
+           'patterns': patterns.where(patterns != '', 'None Detected'),
+           'last_analyzed': datetime.now().strftime('%Y-%m-%d')
+       }, index=df.index)[PROFILE_COLUMNS].reset_index(drop=True)
+
+   def analyze_rows(self, df, holdings):
+       """Row-by-row profiles via get_wallet_profile, the reference for analyze_frame"""
+       wallet_holdings = holdings_by_wallet(holdings)
+       profiles = [self.get_wallet_profile(row, wallet_holdings.get(row['wallet'], []))
+                   for _, row in df.iterrows()]
+       return pd.DataFrame(profiles, columns=PROFILE_COLUMNS)
+
+def profile_chunk(df, holdings):
+   """Profiles for one shard of wallets, run inside a worker process"""
+   return WalletPatternAnalyzer().analyze_frame(df, holdings)
+
+def compare_profiles(frame_profiles, row_profiles):
+   """Describe the differences between two profile tables, empty when identical"""
+   if frame_profiles.shape != row_profiles.shape:
+       return [f"shape {frame_profiles.shape} != {row_profiles.shape}"]
+   differences = []
+   for column in PROFILE_COLUMNS:
+       left = frame_profiles[column].astype(str).to_numpy()
+       right = row_profiles[column].astype(str).to_numpy()
+       mismatched = np.flatnonzero(left != right)
+       if len(mismatched):
+           first = mismatched[0]
+           differences.append(f"{column}: {len(mismatched)} rows differ, e.g. row {first} "
+                              f"{left[first]!r} != {right[first]!r}")
+   return differences
+
+def parse_args(argv=None):
+   parser = argparse.ArgumentParser(description="Classify wallet trading patterns")
+   parser.add_argument('--verify', action='store_true',
+                       help="Also run the row-by-row path and fail if the outputs differ")
+   parser.add_argument('--workers', type=int, default=1,
+                       help="Processes to shard the wallets across (1 runs in this process)")
+   parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Wallets per shard")
+   add_instrumentation_arguments(parser)
+   return parser.parse_args(argv)
+
+def main(argv=None):
    try:
-       logger.info("Starting pattern analysis...")
-       
-       # Load previous analysis data
-       input_file = os.path.join(DATA_DIR, 'analysis_progress.csv')
-       df = pd.read_csv(input_file)
-       logger.info(f"Loaded {len(df)} wallets for analysis")
-       
-       # Analyze patterns
-       analyzer = WalletPatternAnalyzer()
-       wallet_profiles = []
-       
-       for idx, row in df.iterrows():
-           logger.info(f"Analyzing patterns for wallet {idx+1}/{len(df)}")
-           profile = analyzer.get_wallet_profile(row)
-           wallet_profiles.append(profile)
-           
-           # Save progress every 50 wallets
-           if (idx + 1) % 50 == 0:
-               progress_df = pd.DataFrame(wallet_profiles)
-               progress_df.to_csv(os.path.join(DATA_DIR, 'patterns_progress.csv'), index=False)
-       
-       # Create final dataframe and save
-       results_df = pd.DataFrame(wallet_profiles)
-       results_df.to_csv(os.path.join(DATA_DIR, 'patterns.csv'), index=False)
-       
-       # Generate summary statistics
-       print("\nPattern Analysis Summary:")
-       print(f"Total wallets analyzed: {len(results_df)}")
-       
-       print("\nCategories:")
-       print(results_df['category'].value_counts())
-       
-       print("\nTrading Styles:")
-       print(results_df['trading_style'].value_counts())
-       
-       print("\nToken Count Statistics:")
-       print(f"Average tokens per wallet: {results_df['token_count'].mean():.1f}")
-       print(f"Max tokens in wallet: {results_df['token_count'].max()}")
-       
-       # Pattern frequency analysis
-       patterns = results_df[results_df['patterns'] != 'None Detected']['patterns'].str.split(' | ').explode()
-       if not patterns.empty:
-           print("\nMost Common Patterns:")
-           print(patterns.value_counts().head(10))
+       args = parse_args(argv)
+       with instrumented('patterns', args):
+          logger.info("Starting pattern analysis...")
+          
+          # Load previous analysis data
+          input_file = os.path.join(DATA_DIR, 'analysis_progress.csv')
+          df = pd.read_csv(input_file)
+          logger.info(f"Loaded {len(df)} wallets for analysis")
+          
+          # Load holdings from the columnar store
+          holdings = load_holdings(df)
+          
+          # Analyze patterns
+          analyzer = WalletPatternAnalyzer()
+          results_df = run_sharded(profile_chunk, df, holdings, args.workers, args.chunk_size)
+          
+          if args.verify:
+              differences = compare_profiles(results_df, analyzer.analyze_rows(df, holdings))
+              for difference in differences:
+                  logger.error(f"Vectorized and row-by-row profiles differ: {difference}")
+              if differences:
+                  raise ValueError("Vectorized pattern analysis does not match the row-by-row path")
+              logger.info("Vectorized profiles match the row-by-row path")
+          
+          # Save final results
+          results_df.to_csv(os.path.join(DATA_DIR, 'patterns.csv'), index=False)
+          
+          # Generate summary statistics
+          print("\nPattern Analysis Summary:")
+          print(f"Total wallets analyzed: {len(results_df)}")
+          
+          print("\nCategories:")
+          print(results_df['category'].value_counts())
+          
+          print("\nTrading Styles:")
+          print(results_df['trading_style'].value_counts())
+          
+          print("\nToken Count Statistics:")
+          print(f"Average tokens per wallet: {results_df['token_count'].mean():.1f}")
+          print(f"Max tokens in wallet: {results_df['token_count'].max()}")
+          
+          # Pattern frequency analysis
+          patterns = results_df[results_df['patterns'] != 'None Detected']['patterns'].str.split(' | ').explode()
+          if not patterns.empty:
+              print("\nMost Common Patterns:")
+              print(patterns.value_counts().head(10))
        
    except Exception as e:
        logger.error(f"Analysis failed: {str(e)}")
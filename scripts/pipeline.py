@@ -0,0 +1,404 @@
+import os
+import json
+import hashlib
+import logging
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from datetime import datetime
+from rpc_cache import add_cache_arguments, open_cache
+from rpc_pool import add_rpc_arguments
+from refresh_state import DEFAULT_MAX_AGE_DAYS
+from sharding import run_sharded, DEFAULT_CHUNK_SIZE
+from instrumentation import configure_logging, metrics, instrumented, add_instrumentation_arguments
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SCRIPTS_DIR)
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+PIPELINE_DIR = os.path.join(DATA_DIR, 'pipeline')
+os.makedirs(DATA_DIR, exist_ok=True)
+
+configure_logging(os.path.join(DATA_DIR, 'pipeline.log'))
+logger = logging.getLogger(__name__)
+
+# Stage outputs also written under their old names, for the standalone scripts
+EXPORTS = {
+    'details.analysis': ['wallet_analysis_final.csv', 'analysis_progress.csv'],
+    'patterns.profiles': ['patterns.csv'],
+    'labels.labels': ['labeled_wallets_detailed.csv'],
+}
+
+
+def with_token_holdings(pipeline, analysis):
+    """The analysis with the token_holdings lists wallet_details writes, rebuilt from the holdings table"""
+    from holdings_store import holdings_by_wallet
+    grouped = holdings_by_wallet(pipeline.value('details.holdings'))
+    return analysis.assign(token_holdings=[grouped.get(wallet, []) for wallet in analysis['wallet']])
+
+
+# How an output is turned back into its legacy frame before it is exported
+EXPORT_FRAMES = {
+    'details.analysis': with_token_holdings,
+}
+
+
+def frame_hash(df):
+    """Content hash of a DataFrame, taken over its Arrow IPC serialization"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return hashlib.sha256(sink.getvalue()).hexdigest()
+
+
+def code_version(modules):
+    """Hash of the source files a stage runs; names without an extension are modules"""
+    digest = hashlib.sha256()
+    for module in sorted(set(modules)):
+        filename = module if os.path.splitext(module)[1] else f'{module}.py'
+        with open(os.path.join(SCRIPTS_DIR, filename), 'rb') as f:
+            digest.update(module.encode() + b'\0' + f.read())
+    return digest.hexdigest()
+
+
+class Stage:
+    """One pipeline step
+
+    inputs maps keyword arguments of func to 'stage.output' references, and
+    func(pipeline, **inputs) returns {output: DataFrame}. modules are the
+    scripts whose source makes up the stage's code version. Volatile stages
+    read outside state (files, Dune, RPC) and always run; their outputs are
+    still hashed, so unchanged results let the stages after them skip.
+    volatile may also be a function of the pipeline's options.
+    """
+
+    def __init__(self, name, func, inputs=None, outputs=(), modules=(), volatile=False):
+        self.name = name
+        self.func = func
+        self.inputs = dict(inputs or {})
+        self.outputs = list(outputs)
+        self.modules = list(modules)
+        self.volatile = volatile
+
+
+class Pipeline:
+    """Run stages in dependency order, handing DataFrames over in memory
+
+    A stage is skipped when its fingerprint (code version plus the content
+    hashes of its inputs) matches the last successful run and its cached
+    outputs exist. Outputs are cached as Parquet under cache_dir and only
+    loaded when a stage that runs needs them.
+
+    A Pipeline may be run again, as the daemon does: outputs already in
+    memory are not read back, and the RPC cache, analyzer and tracker stay
+    open between runs until close().
+    """
+
+    def __init__(self, stages, options=None, cache_dir=PIPELINE_DIR):
+        self.stages = {stage.name: stage for stage in stages}
+        self.options = options
+        self.cache_dir = cache_dir
+        self.state_file = os.path.join(cache_dir, 'state.json')
+        self.state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file) as f:
+                self.state = json.load(f)
+        self.values = {}
+        self.hashes = {}
+        self.incomplete = set()
+        self.timings = []
+        self._rpc_cache = None
+        self._analyzer = None
+        self._tracker = None
+        # Set by the daemon, whose own track job keeps the tracker's output current
+        self.follow_tracker = False
+        self.tracked = None
+
+    def order(self):
+        """Stage names in dependency order"""
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through stage {name}")
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage {name}")
+            visiting.add(name)
+            for ref in self.stages[name].inputs.values():
+                visit(ref.split('.', 1)[0])
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+    def rpc_cache(self):
+        """The RPC response cache chosen on the command line, opened once"""
+        if self._rpc_cache is None and self.options is not None:
+            self._rpc_cache = open_cache(self.options)
+        return self._rpc_cache
+
+    def analyzer(self):
+        """The details stage's WalletAnalyzer, built once so its HTTP sessions and mint decimals stay warm"""
+        if self._analyzer is None:
+            from wallet_details import WalletAnalyzer
+            options = self.options
+            self._analyzer = WalletAnalyzer(rpc_url=options.rpc_url, max_in_flight=options.max_in_flight,
+                                            batch_size=options.batch_size, cache=self.rpc_cache(),
+                                            rate=options.rpc_rate, max_retries=options.rpc_retries,
+                                            encoding=options.account_encoding)
+        return self._analyzer
+
+    def tracker(self):
+        """The millionaire tracker, built once so its Dune client is reused"""
+        if self._tracker is None:
+            from get_millionaires import MillionaireTracker
+            self._tracker = MillionaireTracker()
+        return self._tracker
+
+    def close(self):
+        if self._rpc_cache is not None:
+            self._rpc_cache.close()
+            self._rpc_cache = None
+        self._analyzer = None
+
+    def mark_incomplete(self, stage_name, reason):
+        """Keep a stage's outputs for this run but rerun it next time"""
+        logger.warning(f"Stage {stage_name} incomplete: {reason}")
+        self.incomplete.add(stage_name)
+
+    def _output_path(self, ref):
+        stage, output = ref.split('.', 1)
+        return os.path.join(self.cache_dir, stage, f'{output}.parquet')
+
+    def value(self, ref):
+        """A stage output, read from the Parquet cache if the stage was skipped"""
+        if ref not in self.values:
+            self.values[ref] = pq.read_table(self._output_path(ref)).to_pandas()
+        return self.values[ref]
+
+    def fingerprint(self, stage):
+        payload = {
+            'code': code_version(stage.modules + ['pipeline']),
+            'inputs': {name: self.hashes[ref] for name, ref in sorted(stage.inputs.items())}
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def _save_state(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_file)
+
+    def run(self, force=()):
+        """Run every stage whose inputs or code changed; force names stages to rerun anyway"""
+        self.hashes = {}
+        self.incomplete = set()
+        self.timings = []
+        for name in self.order():
+            stage = self.stages[name]
+            fingerprint = self.fingerprint(stage)
+            previous = self.state.get(name, {})
+            cached = (previous.get('fingerprint') == fingerprint
+                      and all(os.path.exists(self._output_path(f'{name}.{o}')) for o in stage.outputs))
+            volatile = stage.volatile(self.options) if callable(stage.volatile) else stage.volatile
+            if cached and not volatile and name not in force:
+                for output in stage.outputs:
+                    self.hashes[f'{name}.{output}'] = previous['outputs'][output]
+                self.timings.append({'stage': name, 'status': 'skipped', 'seconds': 0.0,
+                                     'rows': previous.get('rows')})
+                metrics.count('stages_skipped_total', stage=name)
+                logger.info(f"Stage {name} unchanged, skipping")
+                continue
+
+            logger.info(f"Running stage {name}")
+            with metrics.timer(name) as timer:
+                outputs = stage.func(self, **{arg: self.value(ref) for arg, ref in stage.inputs.items()})
+            seconds = timer.seconds
+
+            hashes = {}
+            for output in stage.outputs:
+                ref = f'{name}.{output}'
+                df = outputs[output]
+                path = self._output_path(ref)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                df.to_parquet(path, index=False)
+                self.values[ref] = df
+                self.hashes[ref] = hashes[output] = frame_hash(df)
+
+            rows = sum(len(outputs[output]) for output in stage.outputs)
+            if name in self.incomplete:
+                self.state.pop(name, None)
+            else:
+                self.state[name] = {'fingerprint': fingerprint, 'outputs': hashes, 'rows': rows,
+                                    'finished_at': datetime.now().isoformat(timespec='seconds')}
+            self._save_state()
+            self.timings.append({'stage': name, 'status': 'ran', 'seconds': seconds, 'rows': rows})
+            metrics.set('stage_rows', rows, stage=name)
+        return self.timings
+
+    def export(self, exports=EXPORTS, data_dir=DATA_DIR):
+        """Write the outputs of stages that ran this time under their legacy CSV names"""
+        ran = {timing['stage'] for timing in self.timings if timing['status'] == 'ran'}
+        for ref, filenames in exports.items():
+            if ref.split('.', 1)[0] in ran and ref in self.values:
+                df = self.values[ref]
+                if ref in EXPORT_FRAMES:
+                    df = EXPORT_FRAMES[ref](self, df)
+                for filename in filenames:
+                    df.to_csv(os.path.join(data_dir, filename), index=False)
+
+
+def load_wallets(pipeline):
+    """Wallets and PnL from the input CSV, a fresh tracker run with --track, or local trades with --trades
+
+    Under the daemon the wallets are the ones its last track job found, or
+    the tracker's current file before that job has found any, so the
+    tracker never runs twice and the input CSV is not read.
+    """
+    options = pipeline.options
+    if pipeline.follow_tracker:
+        wallet_df = pipeline.tracked
+        if wallet_df is None:
+            wallet_df = pd.read_csv(pipeline.tracker().current_file)
+    elif options.track:
+        tracker = pipeline.tracker()
+        wallet_df = tracker.update_tracking()
+        if wallet_df is None:
+            wallet_df = pd.read_csv(tracker.current_file)
+    elif options.trades:
+        from pnl_engine import profitable_wallets
+        wallet_df = profitable_wallets(options.trades)
+    else:
+        wallet_df = pd.read_csv(options.input)
+    return {'wallets': wallet_df[['wallet', 'total_pnl']].reset_index(drop=True)}
+
+
+def fetch_details(pipeline, wallets):
+    """Token holdings and wallet analysis over RPC; refresh with --force details, or every run with --incremental"""
+    from wallet_details import fetch_wallet_details, JOURNAL_FILE
+    from journal import WalletJournal
+    from refresh_state import WalletRefreshState
+    from holdings_store import holdings_frame, write_holdings
+
+    options = pipeline.options
+    analyzer = pipeline.analyzer()
+    journal = WalletJournal(JOURNAL_FILE, resume=options.resume)
+    refresh_state = WalletRefreshState(max_age_days=options.refresh_max_age) if options.incremental else None
+    analysis, failed_wallets, _ = fetch_wallet_details(analyzer, wallets, journal, refresh_state=refresh_state)
+    if refresh_state is not None:
+        logger.info(refresh_state.summary())
+    if failed_wallets:
+        pipeline.mark_incomplete('details', f"{len(failed_wallets)} wallets failed")
+
+    holdings = holdings_frame(analysis.to_dict('records'), datetime.now().strftime('%Y-%m-%d'))
+    write_holdings(holdings)
+    # Holdings travel as their own table; the nested column is only kept in the journal
+    return {'analysis': analysis.drop(columns=['token_holdings']), 'holdings': holdings}
+
+
+def profile_wallets(pipeline, analysis, holdings):
+    from patterns import profile_chunk
+    options = pipeline.options
+    return {'profiles': run_sharded(profile_chunk, analysis, holdings, options.workers, options.chunk_size)}
+
+
+def label_wallets(pipeline, wallets, holdings):
+    from wallet_labeler import label_chunk
+    options = pipeline.options
+    return {'labels': run_sharded(label_chunk, wallets, holdings, options.workers, options.chunk_size)}
+
+
+def special_wallets(pipeline, profiles, labels):
+    from traders import extract_special_wallets
+    return {'special': extract_special_wallets(profiles, labels_df=labels)}
+
+
+def token_patterns(pipeline, special, holdings):
+    from traders import analyze_token_patterns
+    patterns = analyze_token_patterns(special, holdings, workers=pipeline.options.workers,
+                                      chunk_size=pipeline.options.chunk_size)
+    return {'token_counts': patterns['token_index'].holder_counts().rename('frequency').reset_index()}
+
+
+def default_stages():
+    return [
+        Stage('wallets', load_wallets, outputs=['wallets'], volatile=True),
+        Stage('details', fetch_details, {'wallets': 'wallets.wallets'}, ['analysis', 'holdings'],
+              ['wallet_details', 'solana_rpc', 'rpc_pool', 'token_accounts', 'journal',
+               'refresh_state', 'holdings_store'],
+              # Unchanged wallets still need their holdings probed with --incremental
+              volatile=lambda options: options.incremental),
+        Stage('patterns', profile_wallets, {'analysis': 'details.analysis', 'holdings': 'details.holdings'},
+              ['profiles'], ['patterns', 'sharding', 'label_rules', 'label_rules.json']),
+        Stage('labels', label_wallets, {'wallets': 'wallets.wallets', 'holdings': 'details.holdings'},
+              ['labels'], ['wallet_labeler', 'holdings_store', 'sharding', 'label_rules',
+                            'label_rules.json']),
+        Stage('special_wallets', special_wallets, {'profiles': 'patterns.profiles', 'labels': 'labels.labels'},
+              ['special'], ['traders', 'wallet_bitmaps', 'address_registry', 'token_accounts']),
+        Stage('token_patterns', token_patterns, {'special': 'special_wallets.special', 'holdings': 'details.holdings'},
+              ['token_counts'], ['traders', 'token_index', 'address_registry', 'token_accounts', 'sharding']),
+    ]
+
+
+def add_pipeline_arguments(parser):
+    """Register the pipeline's options on a parser, shared with the daemon"""
+    parser.add_argument('--input', default=os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv'),
+                        help="CSV with wallet and total_pnl columns")
+    parser.add_argument('--track', action='store_true',
+                        help="Run the millionaire tracker and analyze its wallets instead of --input")
+    parser.add_argument('--trades', metavar='PARQUET',
+                        help="Compute the wallets from a local dex_solana.trades dataset instead of --input")
+    parser.add_argument('--max-in-flight', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--account-encoding', choices=['base64', 'jsonParsed'], default='base64')
+    parser.add_argument('--resume', action='store_true',
+                        help="Keep wallets journaled by an interrupted details stage")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Only refetch wallets whose latest signature changed since the last fetch")
+    parser.add_argument('--refresh-max-age', type=int, default=DEFAULT_MAX_AGE_DAYS, metavar='DAYS')
+    parser.add_argument('--force', nargs='*', metavar='STAGE',
+                        help="Rerun these stages even if unchanged (all stages when none are named)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes to shard the CPU-bound stages across")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Wallets per shard")
+    add_rpc_arguments(parser, "https://api.mainnet-beta.solana.com")
+    add_cache_arguments(parser)
+    add_instrumentation_arguments(parser)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the wallet analysis pipeline, skipping unchanged stages")
+    add_pipeline_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        with instrumented('pipeline', args):
+            pipeline = Pipeline(default_stages(), options=args)
+            force = pipeline.order() if args.force == [] else (args.force or [])
+            timings = pipeline.run(force=force)
+            pipeline.export()
+            pipeline.close()
+
+            print("\nPipeline Summary:")
+            print(f"{'stage':<18}{'status':<10}{'seconds':>10}{'rows':>10}")
+            for timing in timings:
+                rows = timing['rows'] if timing['rows'] is not None else '-'
+                print(f"{timing['stage']:<18}{timing['status']:<10}{timing['seconds']:>10.2f}{rows:>10}")
+            print(f"Total: {sum(t['seconds'] for t in timings):.2f}s")
+
+    except Exception as e:
+        logger.error(f"Pipeline failed: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
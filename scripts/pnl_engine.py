@@ -0,0 +1,215 @@
+import os
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from instrumentation import configure_logging, metrics, instrumented, add_instrumentation_arguments
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+
+# What queries/pumpfun_profitable_wallets.sql (Dune query 4364994) filters on
+PUMP_PROJECT = 'pumpdotfun'
+MINT_PATTERN = 'pump'
+QUOTE_MINTS = ['So11111111111111111111111111111111111111112', 'DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263']
+QUOTE_SYMBOLS = ['WETH', 'USDT', 'USDC']
+MAX_TOKEN_PRICE = 2
+MIN_TOTAL_PNL = 1000000
+
+TRADE_COLUMNS = ['block_time', 'trader_id', 'project', 'amount_usd',
+                 'token_bought_mint_address', 'token_bought_symbol', 'token_bought_amount',
+                 'token_sold_mint_address', 'token_sold_symbol', 'token_sold_amount']
+SIDES = {'sell': 'token_sold', 'buy': 'token_bought'}
+
+
+def sql_round(values, digits=2):
+    """Trino's ROUND on doubles: halves round away from zero, unlike numpy's"""
+    factor = 10.0 ** digits
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5) / factor
+
+
+def _timestamp(value, field_type):
+    """value as a scalar comparable with a block_time column of field_type"""
+    stamp = pd.Timestamp(value)
+    if getattr(field_type, 'tz', None):
+        stamp = stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp
+    elif stamp.tzinfo is not None:
+        stamp = stamp.tz_convert('UTC').tz_localize(None)
+    return pa.scalar(stamp.to_pydatetime(), type=field_type)
+
+
+def _per_value(column, predicate):
+    """predicate over a dictionary column, evaluated once per distinct value
+
+    Rows with a NULL value come out False, as a NULL fails every WHERE.
+    """
+    if not pa.types.is_dictionary(column.type):
+        return pc.fill_null(predicate(column), False)
+    return pc.fill_null(pc.take(predicate(column.dictionary), column.indices), False)
+
+
+def _is_pump_mint(mints):
+    return pc.and_(pc.invert(pc.is_in(mints, value_set=pa.array(QUOTE_MINTS))),
+                   pc.match_substring(mints, MINT_PATTERN, ignore_case=True))
+
+
+def _is_counted_symbol(symbols):
+    return pc.invert(pc.is_in(symbols, value_set=pa.array(QUOTE_SYMBOLS)))
+
+
+def _legs(batch, action):
+    """The datasales rows of one side of a batch of trades
+
+    NULL mints and symbols fail NOT IN and ILIKE in SQL, so the query's
+    COALESCE(symbol, mint) never falls back to the mint and asset is
+    simply the symbol.
+    """
+    prefix = SIDES[action]
+    keep = pc.and_(_per_value(batch[f'{prefix}_mint_address'], _is_pump_mint),
+                   _per_value(batch[f'{prefix}_symbol'], _is_counted_symbol))
+    table = pa.Table.from_batches([batch]).filter(keep)
+    amount = pc.cast(table[f'{prefix}_amount'], pa.float64())
+    usd = pc.cast(table['amount_usd'], pa.float64())
+    # NULLIF(amount, 0) in the divisor
+    divisor = pc.if_else(pc.equal(amount, 0), pa.scalar(None, pa.float64()), amount)
+    return pa.table({
+        'block_time': table['block_time'],
+        'wallet': table['trader_id'],
+        'token_address': table[f'{prefix}_mint_address'],
+        'asset': table[f'{prefix}_symbol'],
+        'amount': pc.negate(amount) if action == 'sell' else amount,
+        'usd_volume': usd if action == 'sell' else pc.negate(usd),
+        'tp': pc.divide(usd, divisor),
+    })
+
+
+def scan_trades(source, start=None, end=None):
+    """Read a Parquet trades dataset once into the query's datasales rows
+
+    Only TRADE_COLUMNS are read, with the string columns kept dictionary
+    encoded so the mint, symbol and project predicates run once per
+    distinct value rather than per row. A [start, end) window is pushed
+    down to the scanner, which skips row groups by their block_time
+    statistics. The pump wallet set and both trade sides come out of the
+    same pass, where the SQL scans the table three times. Returns the
+    datasales rows of pump wallets as a DataFrame with categorical wallet,
+    token_address and asset columns.
+    """
+    schema = ds.dataset(source, format='parquet', partitioning='hive').schema
+    strings = [name for name in TRADE_COLUMNS
+               if pa.types.is_string(schema.field(name).type) or pa.types.is_large_string(schema.field(name).type)]
+    dataset = ds.dataset(source, partitioning='hive',
+                         format=ds.ParquetFileFormat(read_options={'dictionary_columns': strings}))
+    condition = None
+    time_type = schema.field('block_time').type
+    if start is not None:
+        condition = ds.field('block_time') >= _timestamp(start, time_type)
+    if end is not None:
+        before_end = ds.field('block_time') < _timestamp(end, time_type)
+        condition = before_end if condition is None else condition & before_end
+
+    pump_wallets = set()
+    legs = []
+    rows = 0
+    for batch in dataset.scanner(columns=TRADE_COLUMNS, filter=condition).to_batches():
+        if not batch.num_rows:
+            continue
+        rows += batch.num_rows
+        pump = _per_value(batch['project'], lambda projects: pc.equal(projects, PUMP_PROJECT))
+        pump_wallets.update(pc.unique(pc.filter(batch['trader_id'], pump)).to_pylist())
+        legs.extend(_legs(batch, action) for action in SIDES)
+    metrics.count('trades_processed_total', rows, stage='scan')
+    logger.info(f"Scanned {rows} trades from {source}")
+
+    if not legs:
+        return pd.DataFrame(columns=['block_time', 'wallet', 'token_address', 'asset', 'amount', 'usd_volume', 'tp'])
+    df = pa.concat_tables(legs).to_pandas()
+    df = df[df['wallet'].isin(pump_wallets)].reset_index(drop=True)
+    for column in ('wallet', 'token_address', 'asset'):
+        df[column] = df[column].cat.remove_unused_categories()
+    return df
+
+
+def last_prices(legs):
+    """Per (token_address, asset), the tp of its latest trade with tp > 0
+
+    The SQL's ROW_NUMBER() picks any of several trades sharing the latest
+    block_time; here the one read last wins.
+    """
+    priced = legs[legs['tp'] > 0]
+    latest = priced.sort_values('block_time', kind='stable').drop_duplicates(['token_address', 'asset'], keep='last')
+    return latest[['token_address', 'asset', 'tp']].rename(columns={'tp': 'token_price'})
+
+
+def wallet_token_pnl(legs, max_token_price=MAX_TOKEN_PRICE):
+    """The query's df1: buy, sell, balance and PnL per wallet and token"""
+    volume = legs['usd_volume']
+    sums = pd.DataFrame({
+        'wallet': legs['wallet'], 'token_address': legs['token_address'], 'asset': legs['asset'],
+        'buy': (-volume).where(volume < 0),
+        'sell': volume.where(volume > 0),
+        'balance': legs['amount'],
+    }).groupby(['wallet', 'asset', 'token_address'], observed=True, sort=False)
+    # min_count=1 keeps SQL's NULL for groups without any value
+    t = sums[['buy', 'sell', 'balance']].sum(min_count=1).reset_index()
+    t['buy'] = sql_round(t['buy'])
+    t['sell'] = sql_round(t['sell'])
+
+    df = t.merge(last_prices(legs), on=['token_address', 'asset'], how='inner')
+    df = df[(df['token_price'] < max_token_price) & df['buy'].notna()].copy()
+    for column in ('wallet', 'token_address', 'asset'):
+        df[column] = df[column].astype(str)
+    held = df['balance'] * df['token_price']
+    df['pnl'] = sql_round(df['sell'] - df['buy']).where(df['sell'].notna() & (df['sell'] != 0))
+    df['usd_balance'] = sql_round(held)
+    df['total_pnl'] = sql_round(np.where(df['sell'].isna(), -df['buy'] + held, df['sell'] - df['buy'] + held))
+    df['token_balance'] = sql_round(df['balance'])
+    return df[['wallet', 'asset', 'token_address', 'buy', 'sell', 'pnl', 'usd_balance', 'total_pnl',
+               'token_balance', 'token_price']].reset_index(drop=True)
+
+
+def profitable_wallets(source, min_pnl=MIN_TOTAL_PNL, start=None, end=None, max_token_price=MAX_TOKEN_PRICE):
+    """wallet and total_pnl rows above min_pnl, highest first, as the Dune query returns
+
+    Like the query, a wallet appears once per token clearing the threshold.
+    """
+    with metrics.timer('scan'):
+        legs = scan_trades(source, start, end)
+    with metrics.timer('pnl'):
+        df = wallet_token_pnl(legs, max_token_price)
+    df = df[df['total_pnl'] > min_pnl]
+    return df[['wallet', 'total_pnl']].sort_values('total_pnl', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the PumpFun profitable wallets query from a local trades dataset")
+    parser.add_argument('trades', help="Parquet file or directory of dex_solana.trades rows")
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv'))
+    parser.add_argument('--min-pnl', type=float, default=MIN_TOTAL_PNL,
+                        help="Keep wallet and token pairs with total_pnl above this")
+    parser.add_argument('--max-token-price', type=float, default=MAX_TOKEN_PRICE)
+    parser.add_argument('--start', help="Only trades at or after this time (e.g. 2024-11-01)")
+    parser.add_argument('--end', help="Only trades before this time")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    configure_logging()
+    args = parse_args(argv)
+    with instrumented('pnl_engine', args):
+        start_time = time.time()
+        df = profitable_wallets(args.trades, args.min_pnl, args.start, args.end, args.max_token_price)
+        df.to_csv(args.output, index=False)
+        print(f"{len(df)} rows ({df['wallet'].nunique()} wallets) above ${args.min_pnl:,.0f} "
+              f"in {time.time() - start_time:.2f}s, saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
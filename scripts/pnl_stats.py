@@ -0,0 +1,245 @@
+import os
+import json
+import math
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tier and histogram bins are right-open: [edge_i, edge_i+1), the last one unbounded
+TIER_EDGES = [1000000, 5000000, 10000000]
+PERCENTILES = [10, 25, 50, 75, 90, 99]
+HISTOGRAM_EDGES = [1000000, 2000000, 5000000, 10000000, 20000000, 50000000, 100000000]
+
+
+def money_label(value):
+    """1000000 -> '1M', 2500000 -> '2.5M', 1000000000 -> '1B'"""
+    for divisor, suffix in ((1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(value) >= divisor:
+            return f"{value / divisor:g}{suffix}"
+    return f"{value:g}"
+
+
+def bin_labels(edges):
+    """Labels of the right-open bins between edges, ending with an open 'X+' bin"""
+    labels = [f"{money_label(lo)}-{money_label(hi)}" for lo, hi in zip(edges[:-1], edges[1:])]
+    return labels + [f"{money_label(edges[-1])}+"]
+
+
+def bin_counts(sorted_values, edges):
+    """Counts per right-open bin of already sorted values, via binary search"""
+    positions = np.searchsorted(sorted_values, np.asarray(edges, dtype=float), side='left')
+    return np.diff(np.append(positions, len(sorted_values)))
+
+
+def sorted_quantiles(sorted_values, quantiles):
+    """Linearly interpolated quantiles (numpy's default method) of sorted values"""
+    n = len(sorted_values)
+    if not n:
+        return [float('nan')] * len(quantiles)
+    position = np.asarray(quantiles, dtype=float) * (n - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, n - 1)
+    weight = position - lower
+    return list(sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight)
+
+
+def summarize(pnl, tier_edges=TIER_EDGES, percentiles=PERCENTILES, histogram_edges=HISTOGRAM_EDGES):
+    """Every PnL statistic the tracker reports, from one sort of the values
+
+    Max, median and percentiles are read off the sorted array, the sum comes
+    from one reduction, and tier and histogram counts from binary searches
+    into it, so no filtered copies are made.
+    """
+    values = np.sort(np.asarray(pnl, dtype=float))
+    total = float(values.sum())
+    median, *ranked = sorted_quantiles(values, [0.5] + [p / 100 for p in percentiles])
+    return {
+        'count': len(values),
+        'pnl_stats': {
+            'highest': float(values[-1]) if len(values) else float('nan'),
+            'average': total / len(values) if len(values) else float('nan'),
+            'median': float(median),
+            'total_combined': total
+        },
+        'percentiles': {f"p{p:g}": float(v) for p, v in zip(percentiles, ranked)},
+        'categories': dict(zip(bin_labels(tier_edges), map(int, bin_counts(values, tier_edges)))),
+        'histogram': dict(zip(bin_labels(histogram_edges), map(int, bin_counts(values, histogram_edges))))
+    }
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a bounded relative error
+
+    Positive values land in logarithmic buckets of width gamma = (1 + a) / (1 - a),
+    so any quantile is returned within relative accuracy a. Two sketches merge
+    by adding bucket counts, and a sketch added earlier can be subtracted
+    again, which lets rollups replace a day without rescanning.
+    """
+
+    def __init__(self, relative_accuracy=0.01, buckets=None, zeros=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = dict(buckets or {})
+        self.zeros = zeros
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.buckets.values())
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        positive = values[values > 0]
+        self.zeros += len(values) - len(positive)
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        return self
+
+    def merge(self, other, sign=1):
+        for key, count in other.buckets.items():
+            merged = self.buckets.get(key, 0) + sign * count
+            if merged:
+                self.buckets[key] = merged
+            else:
+                self.buckets.pop(key, None)
+        self.zeros += sign * other.zeros
+        return self
+
+    def subtract(self, other):
+        return self.merge(other, sign=-1)
+
+    def quantile(self, q):
+        count = self.count
+        if not count:
+            return float('nan')
+        rank = q * (count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket in relative terms
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'zeros': self.zeros,
+            'buckets': {str(key): count for key, count in sorted(self.buckets.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        buckets = {int(key): count for key, count in data.get('buckets', {}).items()}
+        return cls(data.get('relative_accuracy', 0.01), buckets, data.get('zeros', 0))
+
+
+def _empty_month():
+    return {'days': 0, 'wallet_days': 0, 'pnl_sum': 0.0, 'highest': None, 'new_wallets': 0,
+            'millionaires_first': None, 'millionaires_last': None, 'sketch': QuantileSketch()}
+
+
+class StatsRollup:
+    """Per-month running rollups of the daily statistics
+
+    Each day folds its count, PnL sum, maximum, new wallets and a quantile
+    sketch of its PnL values into its month, so multi-month trends come from
+    a few small records instead of rescanning history. The latest day's
+    contribution is kept, so rerunning a day replaces it rather than
+    counting it twice. Changes stay in memory until save().
+    """
+
+    def __init__(self, path, percentiles=PERCENTILES):
+        self.path = path
+        self.percentiles = percentiles
+        self.months = {}
+        self.last_day = None
+        if os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        for month, record in data.get('months', {}).items():
+            record = dict(record)
+            record['sketch'] = QuantileSketch.from_dict(record['sketch'])
+            self.months[month] = record
+        last_day = data.get('last_day')
+        if last_day:
+            last_day['sketch'] = QuantileSketch.from_dict(last_day['sketch'])
+        self.last_day = last_day
+
+    def save(self):
+        def dump(record):
+            return {**record, 'sketch': record['sketch'].to_dict()}
+
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'months': {month: dump(record) for month, record in sorted(self.months.items())},
+                'last_day': dump(self.last_day) if self.last_day else None
+            }, f, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, day, sign):
+        month = self.months.setdefault(day['date'][:7], _empty_month())
+        month['days'] += sign
+        month['wallet_days'] += sign * day['count']
+        month['pnl_sum'] += sign * day['pnl_sum']
+        month['new_wallets'] += sign * day['new_wallets']
+        month['sketch'].merge(day['sketch'], sign)
+        if sign > 0:
+            month['highest'] = day['highest'] if month['highest'] is None else max(month['highest'], day['highest'])
+            if month['millionaires_first'] is None:
+                month['millionaires_first'] = day['count']
+            month['millionaires_last'] = day['count']
+
+    def add_day(self, date, pnl, new_wallets=0):
+        """Fold one day of PnL values into its month"""
+        if self.last_day and date < self.last_day['date']:
+            raise ValueError(f"Cannot add {date} after {self.last_day['date']}")
+        if self.last_day and date == self.last_day['date']:
+            # The month maximum cannot be un-merged; it can only stay or rise on a rerun
+            self._apply(self.last_day, -1)
+            if self.months[date[:7]]['days'] == 0:
+                del self.months[date[:7]]
+
+        pnl = np.asarray(pnl, dtype=float)
+        day = {
+            'date': date,
+            'count': int(len(pnl)),
+            'pnl_sum': float(pnl.sum()),
+            'highest': float(pnl.max()) if len(pnl) else 0.0,
+            'new_wallets': int(new_wallets),
+            'sketch': QuantileSketch().add(pnl)
+        }
+        self._apply(day, 1)
+        self.last_day = day
+
+    def trend(self, months=None):
+        """Per-month trend stats plus the total over the selected months"""
+        selected = sorted(self.months) if months is None else [m for m in sorted(self.months) if m in months]
+        overall = QuantileSketch()
+        trend = {}
+        for month in selected:
+            record = self.months[month]
+            overall.merge(record['sketch'])
+            trend[month] = {
+                'days': record['days'],
+                'average_millionaires': record['wallet_days'] / record['days'] if record['days'] else 0,
+                'millionaires_first': record['millionaires_first'],
+                'millionaires_last': record['millionaires_last'],
+                'new_wallets': record['new_wallets'],
+                'average_pnl': record['pnl_sum'] / record['wallet_days'] if record['wallet_days'] else 0,
+                'highest': record['highest'],
+                'percentiles': {f"p{p:g}": record['sketch'].quantile(p / 100) for p in self.percentiles}
+            }
+        return {
+            'months': trend,
+            'overall_percentiles': {f"p{p:g}": overall.quantile(p / 100) for p in self.percentiles}
+        }
@@ -0,0 +1,439 @@
+import os
+import json
+import time
+import queue
+import signal
+import logging
+import argparse
+import threading
+import socketserver
+from datetime import datetime
+import pandas as pd
+from pnl_engine import (PUMP_PROJECT, MINT_PATTERN, QUOTE_MINTS, QUOTE_SYMBOLS, MAX_TOKEN_PRICE,
+                        MIN_TOTAL_PNL, SIDES, sql_round)
+from instrumentation import configure_logging, metrics, instrumented, export, add_instrumentation_arguments
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+STATE_FILE = os.path.join(DATA_DIR, 'pnl_stream_state.json')
+
+_QUOTE_MINTS = set(QUOTE_MINTS)
+_QUOTE_SYMBOLS = set(QUOTE_SYMBOLS)
+
+
+def _number(value):
+    """value as a float, None for missing values and NaN"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if value != value else value
+
+
+def _seconds(value):
+    """Epoch seconds of a block_time given as a number or an ISO string"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+def trade_legs(trade):
+    """(token_address, asset, amount, usd_volume, tp) for each side of a trade the query counts
+
+    The same rows pnl_engine keeps: a side counts when its mint contains
+    'pump' and neither the mint nor the symbol is a quote currency.
+    """
+    usd = _number(trade.get('amount_usd'))
+    for action, prefix in SIDES.items():
+        mint = trade.get(f'{prefix}_mint_address')
+        symbol = trade.get(f'{prefix}_symbol')
+        # Missing values may also arrive as NaN from a DataFrame
+        if (not isinstance(mint, str) or not isinstance(symbol, str) or mint in _QUOTE_MINTS
+                or symbol in _QUOTE_SYMBOLS or MINT_PATTERN not in mint.lower()):
+            continue
+        amount = _number(trade.get(f'{prefix}_amount'))
+        tp = usd / amount if usd is not None and amount else None
+        if action == 'sell':
+            yield mint, symbol, None if amount is None else -amount, usd, tp
+        else:
+            yield mint, symbol, amount, None if usd is None else -usd, tp
+
+
+class PnlAccumulator:
+    """Running PnL per (wallet, mint, asset), updated one trade at a time
+
+    Each position keeps its buy USD, sell USD and token balance, and each
+    mint its latest positive trade price, so a trade costs a few dict
+    updates however long the history is. Positions are only re-valued when
+    crossings() or millionaires() is called: those touched since the last
+    call, those of mints whose last price moved and those of wallets that
+    just made their first pumpdotfun trade. The values follow
+    pnl_engine.wallet_token_pnl, so the millionaire set matches the Dune
+    query over the same trades.
+
+    Like the query, only trades of wallets with a pumpdotfun trade set last
+    prices. Until a wallet qualifies its latest prices are held aside, and
+    they are merged in when it does.
+    """
+
+    def __init__(self, min_pnl=MIN_TOTAL_PNL, max_token_price=MAX_TOKEN_PRICE):
+        self.min_pnl = min_pnl
+        self.max_token_price = max_token_price
+        # (wallet, mint, asset) -> [buy usd, sell usd, token balance], None until seen
+        self.positions = {}
+        # (mint, asset) -> (block time, price)
+        self.prices = {}
+        self.pump_wallets = set()
+        # wallet -> {(mint, asset): (block time, price)} for wallets not yet in pump_wallets
+        self.pending_prices = {}
+        # Positions above min_pnl at the last evaluation, with their total_pnl
+        self.above = {}
+        self.holders = {}
+        self.wallet_positions = {}
+        self.dirty = set()
+        self.repriced = set()
+        self.trade_count = 0
+
+    def _set_price(self, prices, mint_key, block_time, tp):
+        current = prices.get(mint_key)
+        # Later trades win ties, like the last row read in pnl_engine
+        if current is None or block_time >= current[0]:
+            prices[mint_key] = (block_time, tp)
+            return True
+        return False
+
+    def _qualify(self, wallet):
+        """Count a wallet's trades from now on, including the prices it set before"""
+        self.pump_wallets.add(wallet)
+        for mint_key, (block_time, tp) in self.pending_prices.pop(wallet, {}).items():
+            if self._set_price(self.prices, mint_key, block_time, tp):
+                self.repriced.add(mint_key)
+        self.dirty.update(self.wallet_positions.get(wallet, ()))
+
+    def add_trade(self, trade):
+        """Apply one dex_solana.trades row, given as a dict"""
+        wallet = trade.get('trader_id')
+        if wallet is None:
+            return
+        self.trade_count += 1
+        if wallet not in self.pump_wallets and trade.get('project') == PUMP_PROJECT:
+            self._qualify(wallet)
+        block_time = None
+        for mint, asset, amount, usd_volume, tp in trade_legs(trade):
+            key = (wallet, mint, asset)
+            mint_key = (mint, asset)
+            position = self.positions.get(key)
+            if position is None:
+                position = self.positions[key] = [None, None, None]
+                self.holders.setdefault(mint_key, set()).add(key)
+                self.wallet_positions.setdefault(wallet, set()).add(key)
+            if usd_volume is not None:
+                if usd_volume < 0:
+                    position[0] = (position[0] or 0.0) - usd_volume
+                elif usd_volume > 0:
+                    position[1] = (position[1] or 0.0) + usd_volume
+            if amount is not None:
+                position[2] = (position[2] or 0.0) + amount
+            self.dirty.add(key)
+
+            if tp is not None and tp > 0:
+                if block_time is None:
+                    block_time = _seconds(trade['block_time'])
+                if wallet in self.pump_wallets:
+                    if self._set_price(self.prices, mint_key, block_time, tp):
+                        self.repriced.add(mint_key)
+                else:
+                    self._set_price(self.pending_prices.setdefault(wallet, {}), mint_key, block_time, tp)
+
+    def add_trades(self, trades):
+        for trade in trades:
+            self.add_trade(trade)
+
+    def total_pnl(self, key):
+        """The query's total_pnl of a position, or None where the query drops it"""
+        wallet, mint, asset = key
+        position = self.positions.get(key)
+        price = self.prices.get((mint, asset))
+        if wallet not in self.pump_wallets or position is None or price is None:
+            return None
+        buy, sell, balance = position
+        if price[1] >= self.max_token_price or buy is None or balance is None:
+            return None
+        held = balance * price[1]
+        buy = sql_round(buy)
+        if sell is None:
+            return float(sql_round(-buy + held))
+        return float(sql_round(sql_round(sell) - buy + held))
+
+    def crossings(self):
+        """Re-value changed positions; returns ({key: pnl} entered, {key: last pnl} exited)
+
+        A position that stays above min_pnl has its value refreshed but is
+        not reported.
+        """
+        dirty = self.dirty
+        for mint_key in self.repriced:
+            dirty.update(self.holders.get(mint_key, ()))
+        entered, exited = {}, {}
+        for key in dirty:
+            pnl = self.total_pnl(key)
+            previous = self.above.get(key)
+            if pnl is not None and pnl > self.min_pnl:
+                self.above[key] = pnl
+                if previous is None:
+                    entered[key] = pnl
+            elif previous is not None:
+                del self.above[key]
+                exited[key] = previous
+        self.dirty = set()
+        self.repriced = set()
+        return entered, exited
+
+    def millionaires(self):
+        """wallet and total_pnl rows above min_pnl, highest first, like the Dune query"""
+        self.crossings()
+        return (pd.DataFrame([(key[0], pnl) for key, pnl in self.above.items()], columns=['wallet', 'total_pnl'])
+                .sort_values('total_pnl', ascending=False, kind='stable')
+                .reset_index(drop=True))
+
+    def save(self, path, source_position=None):
+        """Write the state and the source position it covers, atomically"""
+        state = {
+            'min_pnl': self.min_pnl,
+            'max_token_price': self.max_token_price,
+            'trade_count': self.trade_count,
+            'source_position': source_position,
+            'positions': [[*key, *position] for key, position in self.positions.items()],
+            'prices': [[*mint_key, *price] for mint_key, price in self.prices.items()],
+            'pump_wallets': list(self.pump_wallets),
+            'pending_prices': {wallet: [[*mint_key, *price] for mint_key, price in prices.items()]
+                               for wallet, prices in self.pending_prices.items()},
+            'above': [[*key, pnl] for key, pnl in self.above.items()],
+            'dirty': [list(key) for key in self.dirty],
+            'repriced': [list(mint_key) for mint_key in self.repriced],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, min_pnl=MIN_TOTAL_PNL, max_token_price=MAX_TOKEN_PRICE):
+        """Restore a saved state; returns the accumulator and its source position
+
+        When the thresholds differ from the saved ones every position is
+        re-valued on the next crossings() call.
+        """
+        with open(path) as f:
+            state = json.load(f)
+        accumulator = cls(min_pnl, max_token_price)
+        accumulator.trade_count = state['trade_count']
+        for wallet, mint, asset, *position in state['positions']:
+            key = (wallet, mint, asset)
+            accumulator.positions[key] = position
+            accumulator.holders.setdefault((mint, asset), set()).add(key)
+            accumulator.wallet_positions.setdefault(wallet, set()).add(key)
+        accumulator.prices = {(mint, asset): (block_time, tp) for mint, asset, block_time, tp in state['prices']}
+        accumulator.pump_wallets = set(state['pump_wallets'])
+        accumulator.pending_prices = {wallet: {(mint, asset): (block_time, tp) for mint, asset, block_time, tp in prices}
+                                      for wallet, prices in state['pending_prices'].items()}
+        if state['min_pnl'] == min_pnl and state['max_token_price'] == max_token_price:
+            accumulator.above = {(wallet, mint, asset): pnl for wallet, mint, asset, pnl in state['above']}
+            accumulator.dirty = {tuple(key) for key in state['dirty']}
+            accumulator.repriced = {tuple(mint_key) for mint_key in state['repriced']}
+        else:
+            accumulator.dirty = set(accumulator.positions)
+        return accumulator, state['source_position']
+
+
+class JsonlTailSource:
+    """Trade events appended to a JSONL file, one JSON object per line
+
+    position is the byte offset just past the last complete line read, so
+    a restart from a saved position picks up where the last run stopped.
+    With follow the file is tailed like tail -f, yielding None while no
+    new line has arrived; otherwise iteration stops at the end of the file.
+    A file shorter than position is taken as rotated and read from the
+    start.
+    """
+
+    def __init__(self, path, position=0, follow=True, poll_interval=0.5):
+        self.path = path
+        self.position = position or 0
+        self.follow = follow
+        self.poll_interval = poll_interval
+
+    def __iter__(self):
+        while not os.path.exists(self.path):
+            if not self.follow:
+                return
+            time.sleep(self.poll_interval)
+            yield None
+        with open(self.path, 'rb') as f:
+            if os.path.getsize(self.path) < self.position:
+                logger.warning(f"{self.path} is shorter than the saved position, reading it from the start")
+                self.position = 0
+            f.seek(self.position)
+            while True:
+                line = f.readline()
+                if line.endswith(b'\n'):
+                    self.position += len(line)
+                    if line.strip():
+                        yield _parse_event(line)
+                    continue
+                # Nothing or half a line yet: come back for the rest
+                f.seek(self.position)
+                if not self.follow:
+                    return
+                time.sleep(self.poll_interval)
+                yield None
+
+
+class SocketSource:
+    """Newline-delimited JSON trade events sent to a local TCP port
+
+    A stand-in for a streaming trade feed: any number of clients may
+    connect and write events. Events cannot be replayed, so position is
+    None and a restart only restores the accumulated state.
+    """
+
+    position = None
+
+    def __init__(self, host='127.0.0.1', port=0, poll_interval=0.5):
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        events = self.events
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if line.strip():
+                        events.put(_parse_event(line))
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.events.get(timeout=self.poll_interval)
+            except queue.Empty:
+                yield None
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _parse_event(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        logger.warning(f"Skipping malformed trade event: {line[:200]!r}")
+        return None
+
+
+def log_crossings(entered, exited):
+    for (wallet, mint, asset), pnl in sorted(entered.items(), key=lambda item: -item[1]):
+        logger.info(f"Entered: {wallet} on {asset} ({mint}) at ${pnl:,.2f}")
+    for (wallet, mint, asset), pnl in exited.items():
+        logger.info(f"Exited: {wallet} on {asset} ({mint}), last at ${pnl:,.2f}")
+
+
+def run(accumulator, source, state_path=None, snapshot_every=300, report=None, report_every=60):
+    """Feed source events into accumulator until the source ends or the process is interrupted
+
+    The state and the source position are saved every snapshot_every
+    seconds and on the way out. report(accumulator) is called every
+    report_every seconds, on SIGUSR1 where available, and once at the end.
+    """
+    requested = threading.Event()
+    if report is not None and hasattr(signal, 'SIGUSR1') and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: requested.set())
+    last_snapshot = last_report = time.monotonic()
+    try:
+        for event in source:
+            if event is not None:
+                accumulator.add_trade(event)
+            now = time.monotonic()
+            if report is not None and (requested.is_set() or (report_every and now - last_report >= report_every)):
+                requested.clear()
+                report(accumulator)
+                last_report = now
+            if state_path and snapshot_every and now - last_snapshot >= snapshot_every:
+                accumulator.save(state_path, source.position)
+                last_snapshot = now
+    except KeyboardInterrupt:
+        logger.info("Interrupted, saving state")
+    finally:
+        # Report first, so the saved state knows what was already announced
+        if report is not None:
+            report(accumulator)
+        if state_path:
+            accumulator.save(state_path, source.position)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Keep PumpFun wallet PnL current from a stream of trade events")
+    feed = parser.add_mutually_exclusive_group(required=True)
+    feed.add_argument('--jsonl', metavar='PATH', help="Tail a JSONL file of dex_solana.trades rows")
+    feed.add_argument('--listen', type=int, metavar='PORT',
+                      help="Accept newline-delimited JSON trades on this local TCP port")
+    parser.add_argument('--no-follow', action='store_true', help="Stop at the end of the --jsonl file")
+    parser.add_argument('--state', default=STATE_FILE, help="Snapshot file restored on start")
+    parser.add_argument('--snapshot-every', type=float, default=300, metavar='SECONDS')
+    parser.add_argument('--report-every', type=float, default=60, metavar='SECONDS',
+                        help="Log threshold crossings and rewrite --output this often (also on SIGUSR1)")
+    parser.add_argument('--output', default=os.path.join(DATA_DIR, 'streaming_millionaires.csv'))
+    parser.add_argument('--min-pnl', type=float, default=MIN_TOTAL_PNL)
+    parser.add_argument('--max-token-price', type=float, default=MAX_TOKEN_PRICE)
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    configure_logging()
+    args = parse_args(argv)
+    with instrumented('pnl_stream', args):
+        position = None
+        if os.path.exists(args.state):
+            accumulator, position = PnlAccumulator.load(args.state, args.min_pnl, args.max_token_price)
+            logger.info(f"Restored {len(accumulator.positions)} positions after {accumulator.trade_count} trades")
+        else:
+            accumulator = PnlAccumulator(args.min_pnl, args.max_token_price)
+
+        if args.jsonl:
+            source = JsonlTailSource(args.jsonl, position, follow=not args.no_follow)
+        else:
+            source = SocketSource(port=args.listen)
+            logger.info(f"Listening for trades on {source.address[0]}:{source.address[1]}")
+
+        counted = accumulator.trade_count
+
+        def report(accumulator):
+            nonlocal counted
+            with metrics.timer('report'):
+                log_crossings(*accumulator.crossings())
+                millionaires = accumulator.millionaires()
+                millionaires.to_csv(args.output, index=False)
+            logger.info(f"{len(millionaires)} positions above ${args.min_pnl:,.0f} "
+                        f"after {accumulator.trade_count} trades")
+            metrics.count('trades_processed_total', accumulator.trade_count - counted)
+            counted = accumulator.trade_count
+            metrics.set('positions', len(accumulator.positions))
+            metrics.set('positions_above_min_pnl', len(millionaires))
+            # A long-running stream exports on every report, not only on exit
+            if args.metrics_dir != 'off':
+                export('pnl_stream', 'running', time.time() - metrics.started, args.metrics_dir)
+
+        run(accumulator, source, args.state, args.snapshot_every, report, args.report_every)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import sys
+import argparse
+import importlib
+
+# command: (module, function, summary). Modules are only imported once their
+# command is chosen, so `pumpfun status` never loads pandas or pyarrow
+COMMANDS = {
+    'track': ('get_millionaires', 'main', "Fetch the millionaire wallets from Dune and update the history"),
+    'details': ('wallet_details', 'main', "Fetch token holdings of the profitable wallets over RPC"),
+    'activity': ('wallet_analysis', 'main', "Check which profitable wallets are still active"),
+    'patterns': ('patterns', 'main', "Classify wallet trading patterns"),
+    'labels': ('wallet_labeler', 'main', "Label wallets by their holdings"),
+    'traders': ('traders', 'main', "Extract the special wallet categories and their tokens"),
+    'pipeline': ('pipeline', 'main', "Run every stage, skipping the unchanged ones"),
+    'pnl': ('pnl_engine', 'main', "Compute the profitable wallets query from local trades"),
+    'stream': ('pnl_stream', 'main', "Keep wallet PnL current from a stream of trades"),
+    'snapshots': ('snapshot_store', 'main', "Inspect the daily millionaire snapshots"),
+    'bench': ('benchmark', 'main', "Benchmark the stages on synthetic data"),
+    'daemon': ('daemon', 'main', "Stay resident and run the tracker and pipeline on a schedule"),
+    'status': ('daemon', 'status_main', "Show what a running daemon is doing"),
+    'trigger': ('daemon', 'trigger_main', "Ask a running daemon to run a job now"),
+    'stop': ('daemon', 'stop_main', "Stop a running daemon"),
+    'query': ('query_service', 'main', "Serve wallet lookups and leaderboards over local HTTP/JSON"),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='pumpfun', description="PumpFun wallet analysis",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="commands:\n" + '\n'.join(f"  {name:<11}{summary}" for name, (_, _, summary) in COMMANDS.items())
+              + "\n\nRun `pumpfun <command> --help` for a command's options.")
+    parser.add_argument('command', choices=COMMANDS, metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    module_name, function, _ = COMMANDS[args.command]
+    # The command's own parser then reports itself as `pumpfun <command>`
+    sys.argv[0] = f'pumpfun {args.command}'
+    return getattr(importlib.import_module(module_name), function)(args.args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+import os
+import glob
+import json
+import hashlib
+import time
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+import numpy as np
+import pandas as pd
+from wallet_bitmaps import label_masks
+from instrumentation import configure_logging, metrics, instrumented, export, add_instrumentation_arguments
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BASE_DIR, 'data')
+TRADERS_DIR = os.path.join(BASE_DIR, 'traders')
+TRACKING_DIR = os.path.join(BASE_DIR, 'tracking')
+
+# The outputs the store is built from; missing files are skipped
+SOURCES = {
+    'history': os.path.join(TRACKING_DIR, 'millionaire_history.csv'),
+    'patterns': os.path.join(DATA_DIR, 'patterns.csv'),
+    'labels': os.path.join(DATA_DIR, 'labeled_wallets_detailed.csv'),
+    'master': os.path.join(TRADERS_DIR, 'special_wallets_master.csv'),
+}
+# traders/<category>_analysis.csv, one file per special wallet category
+CATEGORY_PATTERN = os.path.join(TRADERS_DIR, '*_analysis.csv')
+
+QUERY_HOST = '127.0.0.1'
+QUERY_PORT = 8766
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+# Rows looked at per step of a filtered scan; a multiple of 8 so steps
+# start on a bitmap byte
+SCAN_CHUNK = 1 << 15
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25)
+
+RECORD_COLUMNS = ['wallet', 'total_pnl', 'first_seen', 'last_seen', 'category', 'trading_style',
+                  'token_count', 'patterns', 'last_analyzed']
+
+
+def source_signature(sources=SOURCES, category_pattern=CATEGORY_PATTERN):
+    """(path, mtime, size) of every source file present, to tell when they changed"""
+    paths = sorted(set(sources.values()) | set(glob.glob(category_pattern)))
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        signature.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def _read(path, columns):
+    """Rows of a source CSV with the named columns, None when it is missing or lacks them"""
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path)
+    if not set(columns) <= set(df.columns):
+        return None
+    return df
+
+
+def _json_values(series):
+    """A column as a list of JSON-ready values, None for missing ones"""
+    values = series.to_numpy(dtype=object)
+    values[series.isna().to_numpy()] = None
+    return values.tolist()
+
+
+class WalletStore:
+    """Read-only, indexed view of one build of the wallet outputs
+
+    Rows are kept in descending PnL order, so the PnL index is the row
+    order itself: top-K is a prefix and a PnL range is found by binary
+    search. A dict maps each wallet to its row (the hash index), and each
+    label or category has a bitmap of its rows packed eight to a byte.
+    A label filter ANDs the bitmaps a chunk at a time, and its hits come
+    out already ordered by PnL, so a page stops as soon as it is full.
+    Stores are never modified; a reload builds a new one and swaps it in.
+    """
+
+    def __init__(self, frame, masks, categories=(), signature=(), loaded_at=None):
+        order = np.argsort(-frame['total_pnl'].to_numpy(dtype=float, na_value=np.nan), kind='stable')
+        frame = frame.iloc[order].reset_index(drop=True)
+        if 'token_count' in frame:
+            frame['token_count'] = frame['token_count'].astype('Int64')
+        self.size = len(frame)
+        # Negated so the descending PnL is an ascending array; NaN sorts last
+        self.neg_pnl = -frame['total_pnl'].to_numpy(dtype=float, na_value=np.nan)
+        self.columns = {column: _json_values(frame[column]) if column in frame else [None] * self.size
+                        for column in RECORD_COLUMNS}
+        self.rows = dict(zip(self.columns['wallet'], range(self.size)))
+        self.bitmaps = {name: np.packbits(mask[order]) for name, mask in masks.items()}
+        # The same bits as bytes, which index to plain ints for single rows
+        self._members = {name: bitmap.tobytes() for name, bitmap in self.bitmaps.items()}
+        self.counts = {name: int(np.count_nonzero(mask)) for name, mask in masks.items()}
+        self.categories = set(categories)
+        self.signature = signature
+        self.version = hashlib.sha1(repr(signature).encode()).hexdigest()[:12]
+        self.loaded_at = loaded_at or time.time()
+
+    @classmethod
+    def build(cls, sources=SOURCES, category_pattern=CATEGORY_PATTERN):
+        """Join the tracker history, wallet profiles, labels and special categories on wallet"""
+        signature = source_signature(sources, category_pattern)
+        profile_columns = ['wallet_address', 'total_pnl', 'category', 'trading_style', 'token_count',
+                           'patterns', 'last_analyzed']
+        history = _read(sources['history'], ['wallet', 'total_pnl'])
+        # Pattern profiles first, then the master list for wallets they lack
+        profiles = [df for df in (_read(sources['patterns'], profile_columns),
+                                  _read(sources['master'], profile_columns)) if df is not None]
+        labeled = _read(sources['labels'], ['wallet_address', 'detailed_labels'])
+
+        frame = pd.DataFrame({'wallet': pd.Series(dtype=object)})
+        if history is not None:
+            # The latest PnL the tracker saw wins over the profiles' snapshot of it
+            history = history.drop_duplicates('wallet', keep='last')
+            frame = history[[c for c in ('wallet', 'total_pnl', 'first_seen', 'last_seen') if c in history]]
+        if profiles:
+            profile = (pd.concat(profiles)[profile_columns].rename(columns={'wallet_address': 'wallet'})
+                       .drop_duplicates('wallet'))
+            frame = frame.merge(profile, on='wallet', how='outer', suffixes=('', '_profile'))
+            if 'total_pnl_profile' in frame:
+                frame['total_pnl'] = frame['total_pnl'].combine_first(frame.pop('total_pnl_profile'))
+        if 'total_pnl' not in frame:
+            frame['total_pnl'] = np.nan
+        frame = frame.dropna(subset=['wallet']).reset_index(drop=True)
+        frame['wallet'] = frame['wallet'].astype(str)
+        rows = pd.Index(frame['wallet'])
+
+        masks = {}
+
+        def add(label, mask):
+            masks[label] = masks[label] | mask if label in masks else mask
+
+        if 'category' in frame:
+            for column, separator in (('category', None), ('trading_style', None), ('patterns', ' | ')):
+                for label, mask in label_masks(frame[column], separator).items():
+                    add(label, mask)
+        if labeled is not None:
+            labeled = labeled.drop_duplicates('wallet_address')
+            positions = rows.get_indexer(labeled['wallet_address'].astype(str))
+            known = positions >= 0
+            for label, mask in label_masks(labeled['detailed_labels'][known], ' | ').items():
+                full = np.zeros(len(frame), dtype=bool)
+                full[positions[known][mask]] = True
+                add(label, full)
+
+        categories = []
+        for path in sorted(glob.glob(category_pattern)):
+            members = _read(path, ['wallet_address'])
+            if members is None:
+                # token_analysis.csv shares the naming but lists tokens
+                continue
+            name = os.path.basename(path)[:-len('_analysis.csv')]
+            positions = rows.get_indexer(members['wallet_address'].astype(str))
+            mask = np.zeros(len(frame), dtype=bool)
+            mask[positions[positions >= 0]] = True
+            add(name, mask)
+            categories.append(name)
+        return cls(frame, masks, categories, signature)
+
+    def record(self, row):
+        record = {column: values[row] for column, values in self.columns.items()}
+        record['pnl_rank'] = row + 1
+        byte, bit = row >> 3, 128 >> (row & 7)
+        held = [name for name, members in self._members.items() if members[byte] & bit]
+        record['labels'] = [name for name in held if name not in self.categories]
+        record['categories'] = [name for name in held if name in self.categories]
+        return record
+
+    def lookup(self, wallet):
+        """Record of one wallet, None when it is not in the store"""
+        row = self.rows.get(wallet)
+        return None if row is None else self.record(row)
+
+    def _bounds(self, min_pnl=None, max_pnl=None):
+        start = 0 if max_pnl is None else int(np.searchsorted(self.neg_pnl, -max_pnl, side='left'))
+        stop = self.size if min_pnl is None else int(np.searchsorted(self.neg_pnl, -min_pnl, side='right'))
+        return start, stop
+
+    def scan(self, labels=(), min_pnl=None, max_pnl=None, cursor=0, limit=DEFAULT_LIMIT):
+        """Up to limit records by descending PnL from row cursor on
+
+        Only wallets holding every one of labels and within the PnL range
+        are returned. The returned cursor resumes the scan after the last
+        record, and is None once the scan has reached the end.
+        """
+        for label in labels:
+            if label not in self.bitmaps:
+                return [], None
+        start, stop = self._bounds(min_pnl, max_pnl)
+        position = max(start, cursor)
+        found = []
+        if not labels:
+            found = list(range(position, min(stop, position + limit)))
+        bitmaps = [self.bitmaps[label] for label in labels]
+        while labels and position < stop and len(found) < limit:
+            end = min(stop, (position // 8 + SCAN_CHUNK // 8) * 8)
+            first = position // 8
+            combined = bitmaps[0][first:(end + 7) // 8]
+            for bitmap in bitmaps[1:]:
+                combined = combined & bitmap[first:(end + 7) // 8]
+            bits = np.unpackbits(combined)[position - first * 8:end - first * 8]
+            found.extend((np.flatnonzero(bits)[:limit - len(found)] + position).tolist())
+            position = end
+        next_cursor = found[-1] + 1 if len(found) == limit and found[-1] + 1 < stop else None
+        return [self.record(row) for row in found], next_cursor
+
+    def stats(self):
+        return {'version': self.version, 'wallets': self.size, 'labels': len(self.bitmaps),
+                'loaded_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.loaded_at)),
+                'sources': [path for path, _, _ in self.signature]}
+
+
+class QueryService:
+    """Holds the current WalletStore and swaps in rebuilt ones
+
+    Requests read self.store once and keep that store for their whole
+    answer, so a reload never disturbs requests in flight, and a build
+    that fails leaves the previous store serving.
+    """
+
+    def __init__(self, sources=SOURCES, category_pattern=CATEGORY_PATTERN):
+        self.sources = sources
+        self.category_pattern = category_pattern
+        self.store = WalletStore.build(sources, category_pattern)
+        self._reload_lock = threading.Lock()
+        logger.info(f"Loaded {self.store.size} wallets and {len(self.store.bitmaps)} labels")
+
+    def reload(self, force=False):
+        """Rebuild the store when its sources changed; returns whether a new one was swapped in"""
+        with self._reload_lock:
+            if not force and source_signature(self.sources, self.category_pattern) == self.store.signature:
+                return False
+            try:
+                with metrics.timer('query_reload'):
+                    store = WalletStore.build(self.sources, self.category_pattern)
+            except Exception as e:
+                logger.error(f"Reload failed, still serving version {self.store.version}: {str(e)}")
+                return False
+            self.store = store
+            metrics.count('query_reloads_total')
+            logger.info(f"Reloaded {store.size} wallets and {len(store.bitmaps)} labels (version {store.version})")
+            return True
+
+
+def _int_param(params, name, default, low=0, high=None):
+    value = int(params.get(name, [default])[0])
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{name} must be at least {low}" + (f" and at most {high}" if high is not None else ""))
+    return value
+
+
+def _float_param(params, name):
+    return float(params[name][0]) if name in params else None
+
+
+def handle_query(service, method, target):
+    """(HTTP status, JSON body) for one request to the query API
+
+    GET /wallet/<address>        one wallet's record
+    GET /top?k=10&label=...      the k highest PnL wallets, optionally with every label
+    GET /wallets?label=...&min_pnl=&max_pnl=&cursor=0&limit=100
+                                 a page of wallets by descending PnL and the cursor of the next
+    GET /labels                  wallets per label and category
+    GET /stats                   version and size of the loaded store
+    POST /reload                 rebuild now if the sources changed (?force=1 always)
+    """
+    store = service.store
+    url = urlsplit(target)
+    params = parse_qs(url.query)
+    path = url.path.rstrip('/')
+    try:
+        if method == 'POST' and path == '/reload':
+            reloaded = service.reload(force=params.get('force', ['0'])[0] not in ('0', 'false'))
+            return 200, {'reloaded': reloaded, **service.store.stats()}
+        if method != 'GET':
+            return 405, {'error': f"{method} is not supported on {path or '/'}"}
+        if path.startswith('/wallet/'):
+            record = store.lookup(unquote(path[len('/wallet/'):]))
+            if record is None:
+                return 404, {'error': 'wallet not found', 'version': store.version}
+            return 200, {'version': store.version, 'wallet': record}
+        if path in ('/top', '/wallets'):
+            labels = params.get('label', [])
+            if path == '/top':
+                limit, cursor = _int_param(params, 'k', 10, 1, MAX_LIMIT), 0
+            else:
+                limit = _int_param(params, 'limit', DEFAULT_LIMIT, 1, MAX_LIMIT)
+                cursor = _int_param(params, 'cursor', 0)
+            records, next_cursor = store.scan(labels, _float_param(params, 'min_pnl'),
+                                              _float_param(params, 'max_pnl'), cursor, limit)
+            return 200, {'version': store.version, 'wallets': records, 'next_cursor': next_cursor}
+        if path == '/labels':
+            return 200, {'version': store.version, 'labels': dict(sorted(store.counts.items()))}
+        if path == '/stats':
+            return 200, store.stats()
+        return 404, {'error': f"unknown path {path or '/'}"}
+    except ValueError as e:
+        return 400, {'error': str(e)}
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self, method):
+        start = time.perf_counter()
+        if method == 'POST':
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status, body = handle_query(self.server.service, method, self.path)
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        endpoint = urlsplit(self.path).path.strip('/').split('/', 1)[0] or 'root'
+        metrics.count('query_requests_total', endpoint=endpoint, status=str(status))
+        metrics.observe('query_seconds', time.perf_counter() - start, buckets=QUERY_BUCKETS, endpoint=endpoint)
+
+    def do_GET(self):
+        self._answer('GET')
+
+    def do_POST(self):
+        self._answer('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_query_server(service, host=QUERY_HOST, port=QUERY_PORT):
+    """Serve service on a background thread and return (server, url)"""
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    server.daemon_threads = True
+    server.service = service
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve wallet lookups and leaderboards over local HTTP/JSON")
+    parser.add_argument('--query-host', default=QUERY_HOST, help="Address the query API listens on")
+    parser.add_argument('--query-port', type=int, default=QUERY_PORT, help="Port of the query API")
+    parser.add_argument('--reload-every', type=float, default=30, metavar='SECONDS',
+                        help="How often to check the outputs for changes and reload them")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    configure_logging()
+    args = parse_args(argv)
+    with instrumented('query_service', args):
+        service = QueryService()
+        server, url = start_query_server(service, args.query_host, args.query_port)
+        logger.info(f"Serving {service.store.size} wallets on {url}")
+        try:
+            while True:
+                time.sleep(args.reload_every)
+                service.reload()
+                # A long-running service exports as it goes, not only on exit
+                if args.metrics_dir != 'off':
+                    export('query_service', 'running', time.time() - metrics.started, args.metrics_dir)
+        except KeyboardInterrupt:
+            logger.info("Interrupted, shutting down")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    main()
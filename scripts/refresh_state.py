@@ -0,0 +1,114 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+from solana_rpc import chunked
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REFRESH_STATE_FILE = os.path.join(BASE_DIR, 'data', 'wallet_refresh_state.json')
+
+DEFAULT_MAX_AGE_DAYS = 7
+
+
+def latest_signature(response):
+    """(signature, slot) of a getSignaturesForAddress limit-1 reply
+
+    A wallet without transactions gives (None, None); a failed probe None.
+    """
+    if not response or not isinstance(response.get('result'), list):
+        return None
+    if not response['result']:
+        return None, None
+    entry = response['result'][0]
+    return entry.get('signature'), entry.get('slot')
+
+
+class WalletRefreshState:
+    """Latest transaction signature and analysis of every wallet last fetched
+
+    A wallet whose newest signature still matches the stored one has not
+    transacted since, so its stored analysis is carried forward instead of
+    re-pulling its token accounts. Tokens sent into a wallet's existing token
+    accounts do not show up among the wallet's own signatures, so wallets
+    are fully refreshed anyway once their last fetch is max_age_days old.
+    """
+
+    def __init__(self, path=REFRESH_STATE_FILE, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_age_days = max_age_days
+        self.wallets = {}
+        self.stats = {'probed': 0, 'unchanged': 0, 'changed': 0, 'new': 0, 'expired': 0, 'probe_failed': 0}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.wallets = json.load(f)
+
+    def probe(self, client, wallets, batch_size=100):
+        """Split wallets into (changed, unchanged) with their latest signatures
+
+        Probes are getSignaturesForAddress calls with limit 1, sent batch_size
+        to a JSON-RPC batch. Wallets whose probe fails count as changed. With
+        an RpcCache the probes are cached for the getSignaturesForAddress TTL
+        like any other call, and offline replay probes the recorded state.
+        Returns the changed wallets, the unchanged ones and {wallet: (signature,
+        slot)} for every wallet probed successfully.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        oldest = (datetime.now() - timedelta(days=self.max_age_days)).strftime('%Y-%m-%d')
+        changed, unchanged, signatures = [], [], {}
+        for chunk in chunked(dict.fromkeys(wallets), batch_size):
+            responses = client.batch_call([("getSignaturesForAddress", [wallet, {"limit": 1}]) for wallet in chunk])
+            for wallet, response in zip(chunk, responses):
+                self.stats['probed'] += 1
+                latest = latest_signature(response)
+                stored = self.wallets.get(wallet)
+                if latest is None:
+                    self.stats['probe_failed'] += 1
+                    changed.append(wallet)
+                    continue
+                signatures[wallet] = latest
+                if stored is None:
+                    self.stats['new'] += 1
+                    changed.append(wallet)
+                elif stored['signature'] != latest[0]:
+                    self.stats['changed'] += 1
+                    changed.append(wallet)
+                elif stored['fetched'] < oldest:
+                    self.stats['expired'] += 1
+                    changed.append(wallet)
+                else:
+                    self.stats['unchanged'] += 1
+                    stored['checked'] = today
+                    unchanged.append(wallet)
+        return changed, unchanged, signatures
+
+    def record(self, wallet):
+        """The stored analysis of a wallet"""
+        return self.wallets[wallet]['record']
+
+    def update(self, records, signatures):
+        """Store freshly fetched analyses with the signatures probed before fetching them"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        for record in records:
+            wallet = record['wallet']
+            if wallet not in signatures:
+                continue
+            signature, slot = signatures[wallet]
+            self.wallets[wallet] = {'signature': signature, 'slot': slot, 'fetched': today,
+                                    'checked': today, 'record': record}
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.wallets, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def skip_ratio(self):
+        return self.stats['unchanged'] / self.stats['probed'] if self.stats['probed'] else 0.0
+
+    def summary(self):
+        return (f"Incremental refresh: {self.stats['unchanged']} of {self.stats['probed']} wallets unchanged "
+                f"({self.skip_ratio:.1%} skipped), {self.stats['changed']} changed, {self.stats['new']} new, "
+                f"{self.stats['expired']} expired, {self.stats['probe_failed']} probes failed")
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, 'data', 'rpc_cache.sqlite')
+
+CACHE_MODES = ('off', 'read-through', 'offline-replay')
+
+# Seconds a cached response stays fresh, by RPC method
+DEFAULT_TTLS = {
+    'getAccountInfo': 6 * 3600,
+    'getTokenAccountsByOwner': 6 * 3600,
+    'getSignaturesForAddress': 300,
+}
+DEFAULT_TTL = 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Hits only note their access time; the notes are written in one short
+# transaction once this many pile up, so reads never hold the write lock
+TOUCH_BATCH = 256
+
+
+def cache_key(method, params):
+    """Stable key for (method, params, commitment)"""
+    commitment = 'finalized'
+    for param in params or []:
+        if isinstance(param, dict) and 'commitment' in param:
+            commitment = param['commitment']
+    raw = json.dumps([method, params, commitment], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class RpcCache:
+    """SQLite-backed store of JSON-RPC responses with per-method TTL and LRU eviction
+
+    In read-through mode fresh entries are served and misses go to the network.
+    In offline-replay mode every stored entry is served regardless of age and
+    misses never reach the network.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, mode='read-through', ttls=None,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}, expected one of {CACHE_MODES}")
+        self.path = path
+        self.mode = mode
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._touched = {}
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                method TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    @property
+    def offline(self):
+        return self.mode == 'offline-replay'
+
+    def get(self, method, params):
+        """Return the cached response, or None on a miss"""
+        key = cache_key(method, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                metrics.count('rpc_cache_lookups_total', method=method, result='miss')
+                return None
+            body, stored_at = row
+            if not self.offline and now - stored_at > self.ttls.get(method, DEFAULT_TTL):
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                metrics.count('rpc_cache_lookups_total', method=method, result='expired')
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= TOUCH_BATCH:
+                self._write(self._flush_touches)
+            self.stats['hits'] += 1
+        metrics.count('rpc_cache_lookups_total', method=method, result='hit')
+        return json.loads(body)
+
+    def put(self, method, params, response):
+        """Store a successful response; error responses are never cached"""
+        if self.offline or not response or 'result' not in response:
+            return
+        body = json.dumps(response, separators=(',', ':')).encode()
+        now = time.time()
+        key = cache_key(method, params)
+
+        def store():
+            previous = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, method, body, len(body), now, now)
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            # Eviction goes by access time, so pending touches count
+            self._flush_touches()
+            self._evict()
+
+        with self._lock:
+            if self._write(store):
+                self.stats['stores'] += 1
+
+    def _flush_touches(self):
+        touched, self._touched = self._touched, {}
+        if touched:
+            self._conn.executemany("UPDATE responses SET accessed_at = ? WHERE key = ?",
+                                   [(accessed_at, key) for key, accessed_at in touched.items()])
+
+    def _write(self, change):
+        """Run change in its own transaction; a busy or broken cache is logged, never raised
+
+        Another process may hold the cache's write lock, and a fetch must
+        not fail over a response it merely could not store.
+        """
+        total_bytes = self._total_bytes
+        try:
+            change()
+            self._conn.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            self._conn.rollback()
+            self._total_bytes = total_bytes
+            logger.warning(f"RPC cache write to {self.path} failed: {str(e)}")
+            metrics.count('rpc_cache_write_errors_total')
+            return False
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        victims = []
+        for key, size in rows:
+            if self._total_bytes <= self.max_bytes:
+                break
+            victims.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self.stats['evictions'] += len(victims)
+
+    def summary(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        hit_rate = self.stats['hits'] / lookups if lookups else 0.0
+        return (f"Cache ({self.mode}): {self.stats['hits']} hits, {self.stats['misses']} misses "
+                f"({hit_rate:.1%} hit rate), {self.stats['stores']} stored, "
+                f"{self.stats['evictions']} evicted")
+
+    def close(self):
+        with self._lock:
+            self._write(self._flush_touches)
+            self._conn.close()
+
+
+def add_cache_arguments(parser):
+    """Register the shared --cache-mode / --cache-path options on a parser"""
+    parser.add_argument('--cache-mode', choices=CACHE_MODES, default='off',
+                        help="RPC response cache: off, read-through, or offline-replay (no network)")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH, help="SQLite file for the RPC cache")
+    parser.add_argument('--cache-max-mb', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="Evict least recently used responses beyond this size")
+
+
+def open_cache(args):
+    """Build the cache selected on the command line, or None when disabled"""
+    if args.cache_mode == 'off':
+        return None
+    return RpcCache(args.cache_path, mode=args.cache_mode, max_bytes=args.cache_max_mb * 1024 * 1024)
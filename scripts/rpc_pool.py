@@ -0,0 +1,278 @@
+import time
+import random
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+import requests
+from instrumentation import metrics
+
+logger = logging.getLogger(__name__)
+
+# Requests per second per endpoint; the scripts used to sleep 0.1s between wallets
+DEFAULT_RATE = 10.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_TIMEOUT = 30
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+# Responses worth retrying; other non-200 answers are final
+THROTTLE_STATUSES = {429}
+RETRY_STATUSES = {408, 500, 502, 503, 504}
+# Endpoints scoring below this lose their place in the failover order
+HEALTHY_SCORE = 0.5
+# Seconds for an idle endpoint's health to recover half of its deficit
+HEALTH_HALF_LIFE = 60.0
+
+
+def retry_after_seconds(value, now=None):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - (now or time.time()))
+    except (TypeError, ValueError):
+        return None
+
+
+def rpc_method(payload):
+    """Method of a JSON-RPC payload; a batch is named after its method when it has only one"""
+    if isinstance(payload, dict):
+        return payload.get('method', 'unknown')
+    methods = {call.get('method', 'unknown') for call in payload}
+    return f"batch:{methods.pop()}" if len(methods) == 1 else 'batch'
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token bucket refilled at rate tokens per second, holding at most burst
+
+    acquire() blocks until a token is free and returns how long it waited.
+    pause(seconds) empties the bucket until then, which is how Retry-After is
+    honored for everyone sharing the endpoint rather than only the caller.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    delay = self.paused_until - now
+                else:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        with self._lock:
+            now = time.monotonic()
+            self.paused_until = max(self.paused_until, now + seconds)
+            self.tokens = 0.0
+            self.updated = max(self.updated, self.paused_until)
+
+
+class Endpoint:
+    """One RPC provider: its rate limiter, AIMD concurrency limit, health and stats
+
+    The concurrency limit grows by 1/limit per success and halves on a
+    throttle or failure (additive increase, multiplicative decrease), and the
+    request rate does the same between 1/8 of its configured value and that
+    value. Health is a moving average of request outcomes that also drifts
+    back towards 1 while the endpoint is left alone, so a provider that was
+    failed over from gets tried again.
+    """
+
+    def __init__(self, url, rate=DEFAULT_RATE, max_concurrency=1):
+        self.url = url
+        self.max_rate = float(rate or 0)
+        # A rate of 0 leaves the endpoint unthrottled, e.g. for a local server
+        self.bucket = TokenBucket(rate) if rate else None
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.health = 1.0
+        self.health_updated = time.monotonic()
+        self.cooldown_until = 0.0
+        self.stats = {'requests': 0, 'ok': 0, 'throttled': 0, 'errors': 0, 'retries': 0,
+                      'throttle_seconds': 0.0, 'latency_seconds': 0.0}
+
+    @property
+    def name(self):
+        # API keys travel in the query string; keep them out of logs
+        return self.url.split('?')[0]
+
+    def available(self, now):
+        return now >= self.cooldown_until and self.in_flight < int(self.limit)
+
+    def score(self, now):
+        idle = max(0.0, now - self.health_updated)
+        return 1 - (1 - self.health) * 0.5 ** (idle / HEALTH_HALF_LIFE)
+
+    def _record(self, success):
+        now = time.monotonic()
+        self.health = 0.9 * self.score(now) + (0.1 if success else 0.0)
+        self.health_updated = now
+
+    def succeeded(self):
+        self._record(True)
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        if self.bucket:
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate / 20)
+
+    def backed_off(self, cooldown=0.0):
+        self._record(False)
+        self.limit = max(1.0, self.limit / 2)
+        if self.bucket:
+            self.bucket.rate = max(self.max_rate / 8, self.bucket.rate / 2)
+        if cooldown:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + cooldown)
+            if self.bucket:
+                # Also holds back requests that already passed checkout
+                self.bucket.pause(cooldown)
+
+
+class EndpointPool:
+    """Send JSON-RPC payloads through several endpoints with failover
+
+    Each attempt goes to the first available healthy endpoint in the given
+    order, or to the healthiest one when none is healthy, so the first URL is
+    the primary and the others take over while it is throttled or failing. A 429 pauses the
+    endpoint for its Retry-After (or a backoff delay); 5xx answers, timeouts
+    and connection errors count against its health. Both are retried with
+    jittered exponential backoff, on another endpoint when one is free, up
+    to max_retries times. Other non-200 answers are returned as final.
+    """
+
+    def __init__(self, urls, rate=DEFAULT_RATE, max_concurrency=1, max_retries=DEFAULT_MAX_RETRIES,
+                 timeout=DEFAULT_TIMEOUT):
+        if isinstance(urls, str):
+            urls = [urls]
+        self.endpoints = [Endpoint(url, rate, max_concurrency) for url in urls]
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.gave_up = 0
+        self._cond = threading.Condition()
+
+    def _checkout(self, avoid=None):
+        """Reserve a slot on the best available endpoint, waiting for one if needed"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [e for e in self.endpoints if e.available(now)]
+                if len(ready) > 1 and avoid in ready:
+                    ready.remove(avoid)
+                if ready:
+                    healthy = [e for e in ready if e.score(now) >= HEALTHY_SCORE]
+                    endpoint = healthy[0] if healthy else max(ready, key=lambda e: e.score(now))
+                    endpoint.in_flight += 1
+                    return endpoint
+                cooling = [e.cooldown_until - now for e in self.endpoints if e.cooldown_until > now]
+                self._cond.wait(timeout=min(cooling) if cooling else None)
+
+    def _checkin(self, endpoint, method, outcome, attempt, throttle_seconds, start, cooldown=0.0):
+        """Release the slot and record how the attempt went"""
+        latency = time.perf_counter() - start
+        metrics.observe('rpc_request_seconds', latency, method=method, endpoint=endpoint.name)
+        metrics.count('rpc_requests_total', method=method, endpoint=endpoint.name, outcome=outcome)
+        if attempt:
+            metrics.count('rpc_retries_total', endpoint=endpoint.name)
+        if throttle_seconds:
+            metrics.count('rpc_throttle_seconds_total', throttle_seconds, endpoint=endpoint.name)
+        with self._cond:
+            endpoint.in_flight -= 1
+            endpoint.stats['requests'] += 1
+            endpoint.stats['retries'] += bool(attempt)
+            endpoint.stats['throttle_seconds'] += throttle_seconds
+            endpoint.stats['latency_seconds'] += latency
+            if outcome == 'ok':
+                endpoint.stats['ok'] += 1
+                endpoint.succeeded()
+            else:
+                endpoint.stats['throttled' if outcome == 'throttled' else 'errors'] += 1
+                endpoint.backed_off(cooldown)
+            self._cond.notify_all()
+
+    def post(self, session, payload):
+        """POST payload and return the response; None when every attempt failed
+
+        The returned response may have a non-200 status that is not worth
+        retrying; the caller decides what to make of it.
+        """
+        endpoint = None
+        method = rpc_method(payload)
+        for attempt in range(self.max_retries + 1):
+            endpoint = self._checkout(avoid=endpoint)
+            waited = endpoint.bucket.acquire() if endpoint.bucket else 0.0
+            start = time.perf_counter()
+            try:
+                response = session.post(endpoint.url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                self._checkin(endpoint, method, 'error', attempt, waited, start, backoff_delay(attempt))
+                logger.warning(f"{endpoint.name} request failed (attempt {attempt + 1}): {str(e)}")
+                continue
+
+            if response.status_code in THROTTLE_STATUSES:
+                delay = retry_after_seconds(response.headers.get('Retry-After'))
+                delay = backoff_delay(attempt) if delay is None else delay
+                self._checkin(endpoint, method, 'throttled', attempt, waited + delay, start, delay)
+                logger.warning(f"{endpoint.name} throttled, pausing it for {delay:.2f}s")
+            elif response.status_code in RETRY_STATUSES:
+                self._checkin(endpoint, method, 'error', attempt, waited, start, backoff_delay(attempt))
+                logger.warning(f"{endpoint.name} answered HTTP {response.status_code} (attempt {attempt + 1})")
+            else:
+                self._checkin(endpoint, method, 'ok' if response.status_code == 200 else 'error', attempt, waited, start)
+                return response
+
+        with self._cond:
+            self.gave_up += 1
+        metrics.count('rpc_gave_up_total', method=method)
+        logger.error(f"Giving up on a request after {self.max_retries + 1} attempts")
+        return None
+
+    def stats(self):
+        now = time.monotonic()
+        return {e.name: {**e.stats, 'health': round(e.score(now), 3), 'concurrency_limit': round(e.limit, 2),
+                         'rate': round(e.bucket.rate, 2) if e.bucket else None} for e in self.endpoints}
+
+    def summary(self):
+        lines = [f"RPC endpoints ({self.gave_up} requests given up):"]
+        for name, stats in self.stats().items():
+            lines.append(f"  {name}: {stats['requests']} requests, {stats['ok']} ok, "
+                         f"{stats['throttled']} throttled, {stats['errors']} errors, "
+                         f"{stats['retries']} retries, {stats['throttle_seconds']:.1f}s throttled, "
+                         f"health {stats['health']:.2f}")
+        return '\n'.join(lines)
+
+
+def add_rpc_arguments(parser, default_url):
+    """Register the shared endpoint pool options on a parser"""
+    parser.add_argument('--rpc-url', nargs='+', default=[default_url],
+                        help="Solana JSON-RPC endpoints, primary first; later ones take over on failure")
+    parser.add_argument('--rpc-rate', type=float, default=DEFAULT_RATE,
+                        help="Requests per second allowed per endpoint (0 for no limit)")
+    parser.add_argument('--rpc-retries', type=int, default=DEFAULT_MAX_RETRIES,
+                        help="Retries of a throttled or failed request before giving up")
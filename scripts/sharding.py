@@ -0,0 +1,132 @@
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Per-worker view of the shared holdings, set up once by _attach
+_shared = {}
+
+
+def _wallet_ids(column, wallets):
+    """Position in wallets of each entry of column, -1 when absent"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # Look up each distinct wallet once instead of every row
+        per_category = wallets.get_indexer(column.cat.categories.astype(str))
+        return np.append(per_category, -1)[column.cat.codes.to_numpy()]
+    return wallets.get_indexer(column.astype(str))
+
+
+class SharedHoldings:
+    """Holdings table grouped by wallet and placed in one shared memory block
+
+    Rows are ordered by the wallet's first position in the input frame, keeping
+    their original order within a wallet, so any set of wallets maps to a few
+    contiguous row ranges. The block holds the CSR offsets of those ranges
+    followed by the table as an Arrow IPC stream, which workers map without
+    copying. Each row keeps its original position in a 'row' column.
+    """
+
+    def __init__(self, wallet_column, holdings):
+        self.row_wallets, wallets = pd.factorize(pd.Series(wallet_column).astype(str))
+        wallets = pd.Index(wallets)
+        ids = _wallet_ids(holdings['wallet'], wallets)
+        rows = np.flatnonzero(ids >= 0)
+        order = rows[np.argsort(ids[rows], kind='stable')]
+        offsets = np.zeros(len(wallets) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(ids[rows], minlength=len(wallets)), out=offsets[1:])
+
+        table = pa.Table.from_pandas(holdings.iloc[order], preserve_index=False)
+        table = table.append_column('row', pa.array(order, type=pa.int64()))
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        stream = sink.getvalue()
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(1, offsets.nbytes + stream.size))
+        block = np.ndarray(offsets.nbytes + stream.size, dtype=np.uint8, buffer=self.shm.buf)
+        block[:offsets.nbytes] = offsets.view(np.uint8)
+        block[offsets.nbytes:] = np.frombuffer(stream, dtype=np.uint8)
+        del block
+        self.handle = (self.shm.name, len(offsets), stream.size)
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(name, offsets_length, stream_size):
+    shm = shared_memory.SharedMemory(name=name)
+    offsets = np.ndarray(offsets_length, dtype=np.int64, buffer=shm.buf)
+    stream = pa.py_buffer(shm.buf[offsets.nbytes:offsets.nbytes + stream_size])
+    _shared.update(shm=shm, offsets=offsets, table=pa.ipc.open_stream(stream).read_all())
+
+
+def _holdings_for(wallet_ids):
+    """Holdings rows of the given wallets, as a DataFrame indexed by original row"""
+    offsets = _shared['offsets']
+    ids = np.unique(wallet_ids)
+    starts = offsets[ids]
+    lengths = offsets[ids + 1] - starts
+    segment_starts = np.cumsum(lengths) - lengths
+    positions = np.arange(lengths.sum()) + np.repeat(starts - segment_starts, lengths)
+    holdings = _shared['table'].take(pa.array(positions, type=pa.int64())).to_pandas()
+    holdings.index = pd.Index(holdings.pop('row').to_numpy())
+    return holdings
+
+
+def _run_chunk(func, df, wallet_ids):
+    return func(df, _holdings_for(wallet_ids))
+
+
+def concat_frames(results):
+    return pd.concat(results, ignore_index=True)
+
+
+def run_sharded(func, df, holdings, workers=1, chunk_size=DEFAULT_CHUNK_SIZE,
+                wallet_column='wallet', merge=concat_frames):
+    """Apply func(df_chunk, holdings_chunk) over chunks of df on a process pool
+
+    func must be a module-level function whose result for a chunk depends only
+    on that chunk's rows and their wallets' holdings. Holdings chunks are
+    indexed by their row position in holdings. Chunks hold chunk_size distinct
+    wallets, and every row of a wallet listed more than once goes to the chunk
+    of its first row, so chunks cover disjoint wallets and no holdings are
+    sent twice. Results are merged in chunk order, so the output does not
+    depend on which worker finishes first; concat_frames also puts the rows
+    back in df order, for funcs that return one row per row of their chunk.
+    With workers <= 1, func runs once over everything in this process.
+    """
+    holdings = holdings.reset_index(drop=True)
+    if workers <= 1 or len(df) <= chunk_size:
+        return merge([func(df, holdings)])
+
+    with SharedHoldings(df[wallet_column], holdings) as shared:
+        # Wallet ids follow first appearance, so without repeats these are the
+        # contiguous row ranges of chunk_size rows
+        chunk_of_row = shared.row_wallets // chunk_size
+        positions = np.argsort(chunk_of_row, kind='stable')
+        chunks = np.split(positions, np.searchsorted(chunk_of_row[positions], np.arange(1, chunk_of_row.max() + 1)))
+        logger.info(f"Sharding {len(df)} wallets into {len(chunks)} chunks across {workers} workers")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=shared.handle) as pool:
+            results = list(pool.map(
+                _run_chunk,
+                [func] * len(chunks),
+                [df.iloc[rows] for rows in chunks],
+                [shared.row_wallets[rows] for rows in chunks]
+            ))
+    merged = merge(results)
+    if merge is concat_frames and (np.diff(positions) < 0).any():
+        merged = merged.iloc[np.argsort(positions, kind='stable')].reset_index(drop=True)
+    return merged
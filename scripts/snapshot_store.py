@@ -0,0 +1,231 @@
+import os
+import glob
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(BASE_DIR, 'tracking', 'snapshots')
+
+SNAPSHOT_COLUMNS = ['wallet', 'total_pnl', 'change']
+SNAPSHOT_SCHEMA = pa.schema([
+    ('wallet', pa.dictionary(pa.int32(), pa.string())),
+    ('total_pnl', pa.float64()),
+    ('change', pa.dictionary(pa.int8(), pa.string())),
+])
+PARTITIONING = ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+
+# full.parquet holds every wallet of the day, delta.parquet only what changed
+FULL_FILE = 'full.parquet'
+DELTA_FILE = 'delta.parquet'
+
+
+def empty_snapshot():
+    return pd.DataFrame({
+        'wallet': pd.Series(dtype='object'),
+        'total_pnl': pd.Series(dtype='float64')
+    })
+
+
+def daily_totals(millionaires):
+    """One total_pnl per wallet; the Dune query lists a wallet once per token"""
+    totals = millionaires.groupby(millionaires['wallet'].astype(str), sort=False)['total_pnl'].sum()
+    return totals.astype(float)
+
+
+class SnapshotStore:
+    """Append-only store of daily millionaire snapshots, partitioned by date
+
+    Each day is a date=YYYY-MM-DD directory holding one Parquet file of
+    (wallet, total_pnl, change) rows, where change is enter, update, exit or
+    hold. Most days are deltas against the previous day: only wallets that
+    entered, changed PnL or dropped out are written. Every checkpoint_every
+    days a full snapshot is written instead, so rebuilding any date reads at
+    most that many partitions. Queries push date and wallet filters down to
+    Parquet rather than loading every snapshot.
+    """
+
+    def __init__(self, root=SNAPSHOT_DIR, checkpoint_every=30):
+        self.root = root
+        self.checkpoint_every = max(1, int(checkpoint_every))
+
+    def _partition_dir(self, date):
+        return os.path.join(self.root, f'date={date}')
+
+    def dates(self):
+        """Snapshot dates in the store, oldest first"""
+        return sorted(
+            os.path.basename(path).split('=', 1)[1]
+            for path in glob.glob(os.path.join(self.root, 'date=*'))
+            if os.path.exists(os.path.join(path, FULL_FILE)) or os.path.exists(os.path.join(path, DELTA_FILE))
+        )
+
+    def is_checkpoint(self, date):
+        return os.path.exists(os.path.join(self._partition_dir(date), FULL_FILE))
+
+    def _read(self, start, end, wallets=None, columns=('wallet', 'total_pnl', 'change')):
+        """Rows of the partitions dated start..end, with filters pushed down"""
+        if not self.dates():
+            return pd.DataFrame(columns=list(columns) + ['date'])
+        dataset = ds.dataset(self.root, format='parquet', partitioning=PARTITIONING)
+        condition = (ds.field('date') >= start) & (ds.field('date') <= end)
+        if wallets is not None:
+            condition = condition & ds.field('wallet').isin(list(dict.fromkeys(wallets)))
+        table = dataset.to_table(columns=list(columns) + ['date'], filter=condition)
+        df = table.to_pandas()
+        for column in ('wallet', 'change', 'date'):
+            if column in df.columns:
+                df[column] = df[column].astype(str)
+        return df
+
+    def snapshot(self, date, wallets=None):
+        """The millionaire set as of date: wallet and total_pnl, highest first
+
+        Replays the deltas since the last full snapshot on or before date.
+        wallets restricts the rebuild to those wallets.
+        """
+        dates = [d for d in self.dates() if d <= date]
+        if not dates:
+            return empty_snapshot()
+        checkpoint = next((d for d in reversed(dates) if self.is_checkpoint(d)), dates[0])
+        rows = self._read(checkpoint, date, wallets)
+        latest = rows.sort_values('date', kind='stable').drop_duplicates('wallet', keep='last')
+        latest = latest[latest['change'] != 'exit']
+        return (latest[['wallet', 'total_pnl']]
+                .sort_values('total_pnl', ascending=False)
+                .reset_index(drop=True))
+
+    def append(self, date, millionaires):
+        """Store the day's millionaires, deduplicated against the previous day
+
+        Rewriting the latest date replaces it; dates before the latest one are
+        rejected because later deltas were computed against them.
+        """
+        dates = self.dates()
+        if dates and date < dates[-1]:
+            raise ValueError(f"Snapshot for {date} is older than the latest stored date {dates[-1]}")
+        earlier = [d for d in dates if d < date]
+
+        current = daily_totals(millionaires)
+        previous = self.snapshot(earlier[-1]).set_index('wallet')['total_pnl'] if earlier else pd.Series(dtype=float)
+
+        checkpoints = [d for d in earlier if self.is_checkpoint(d)]
+        since_checkpoint = sum(d > checkpoints[-1] for d in earlier) if checkpoints else None
+        full = since_checkpoint is None or since_checkpoint + 1 >= self.checkpoint_every
+
+        known = current.index.isin(previous.index)
+        before = previous.reindex(current.index).to_numpy()
+        change = np.where(~known, 'enter', np.where(before == current.to_numpy(), 'hold', 'update'))
+        rows = pd.DataFrame({'wallet': current.index, 'total_pnl': current.to_numpy(), 'change': change})
+        if not full:
+            rows = rows[rows['change'] != 'hold']
+        exited = previous.index[~previous.index.isin(current.index)]
+        rows = pd.concat([
+            rows,
+            pd.DataFrame({'wallet': exited, 'total_pnl': np.nan, 'change': 'exit'})
+        ], ignore_index=True)
+
+        self._write(date, rows, FULL_FILE if full else DELTA_FILE)
+        counts = rows['change'].value_counts()
+        logger.info(f"Snapshot {date} stored as {'full' if full else 'delta'}: "
+                    f"{counts.get('enter', 0)} entered, {counts.get('update', 0)} updated, "
+                    f"{counts.get('exit', 0)} exited")
+        return rows
+
+    def _write(self, date, rows, filename):
+        partition = self._partition_dir(date)
+        os.makedirs(partition, exist_ok=True)
+        table = pa.Table.from_pandas(rows[SNAPSHOT_COLUMNS], schema=SNAPSHOT_SCHEMA, preserve_index=False)
+        # Dot-prefixed so dataset scans never pick up a half-written file
+        tmp_path = os.path.join(partition, f'.{filename}.tmp')
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, os.path.join(partition, filename))
+        for other in (FULL_FILE, DELTA_FILE):
+            if other != filename and os.path.exists(os.path.join(partition, other)):
+                os.remove(os.path.join(partition, other))
+
+    def wallet_history(self, wallets, start=None, end=None):
+        """PnL trajectory of wallets: one row per date their total_pnl changed
+
+        Exits appear with a NaN total_pnl. With start, the first row per wallet
+        is its value as of start, so the trajectory is complete for the range.
+        """
+        if isinstance(wallets, str):
+            wallets = [wallets]
+        dates = self.dates()
+        if not dates:
+            return pd.DataFrame(columns=['date', 'wallet', 'total_pnl'])
+        start = start or dates[0]
+        end = end or dates[-1]
+
+        opening = self.snapshot(start, wallets).assign(date=start)
+        rows = self._read(start, end, wallets)
+        rows = rows[(rows['date'] > start) & (rows['change'] != 'hold')]
+        history = pd.concat([opening, rows[['date', 'wallet', 'total_pnl']]], ignore_index=True)
+        history = history.sort_values(['wallet', 'date'], kind='stable')
+        # A full snapshot repeats unchanged values; keep only the change points
+        same = (history['wallet'] == history['wallet'].shift()) & (
+            (history['total_pnl'] == history['total_pnl'].shift())
+            | (history['total_pnl'].isna() & history['total_pnl'].shift().isna()))
+        return history[~same][['date', 'wallet', 'total_pnl']].reset_index(drop=True)
+
+    def changes(self, start, end):
+        """Wallets that entered and exited the millionaire set between two dates"""
+        before = self.snapshot(start)
+        after = self.snapshot(end)
+        entries = after[~after['wallet'].isin(before['wallet'])].reset_index(drop=True)
+        exits = before[~before['wallet'].isin(after['wallet'])].reset_index(drop=True)
+        return entries, exits
+
+    def summary(self):
+        """Partition count, checkpoints and bytes on disk"""
+        files = glob.glob(os.path.join(self.root, 'date=*', '*.parquet'))
+        return {
+            'dates': len(self.dates()),
+            'checkpoints': sum(os.path.basename(f) == FULL_FILE for f in files),
+            'bytes': sum(os.path.getsize(f) for f in files)
+        }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query the daily millionaire snapshot store")
+    parser.add_argument('--root', default=SNAPSHOT_DIR)
+    parser.add_argument('--import-csv', metavar='CSV', help="Append a current_millionaires CSV as --date")
+    parser.add_argument('--date', help="Snapshot date (YYYY-MM-DD) for --import-csv or --on")
+    parser.add_argument('--on', action='store_true', help="Print the millionaire set as of --date")
+    parser.add_argument('--wallet', nargs='+', help="Print the PnL trajectory of these wallets")
+    parser.add_argument('--between', nargs=2, metavar=('START', 'END'),
+                        help="Print the wallets that entered and exited between two dates")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    store = SnapshotStore(args.root)
+
+    if args.import_csv:
+        store.append(args.date, pd.read_csv(args.import_csv))
+    if args.on:
+        print(store.snapshot(args.date).to_string(index=False))
+    if args.wallet:
+        print(store.wallet_history(args.wallet).to_string(index=False))
+    if args.between:
+        entries, exits = store.changes(*args.between)
+        print(f"Entered ({len(entries)}):")
+        print(entries.to_string(index=False))
+        print(f"\nExited ({len(exits)}):")
+        print(exits.to_string(index=False))
+
+    summary = store.summary()
+    print(f"\n{summary['dates']} snapshots, {summary['checkpoints']} full, {summary['bytes'] / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from rpc_pool import EndpointPool, DEFAULT_RATE, DEFAULT_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+# Solana RPC rejects getMultipleAccounts calls with more keys than this
+MAX_MULTIPLE_ACCOUNTS = 100
+
+
+def chunked(items, size):
+    """Split a sequence into consecutive chunks of at most size items"""
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class SolanaRpcClient:
+    """Thin JSON-RPC client shared by the wallet scripts
+
+    Single calls keep the scripts' old contract: the decoded response body on
+    HTTP 200, otherwise None. Batched helpers split their responses back into
+    one getAccountInfo-shaped response per address so callers never have to
+    know a lookup was batched. With an RpcCache attached every call is looked
+    up there first, per address for batched lookups.
+
+    rpc_url may be a list of endpoints, the first being the primary. Requests
+    go through an EndpointPool that rate limits, retries throttled or failed
+    requests and fails over between them; None is only returned once it
+    gives up.
+    """
+
+    def __init__(self, rpc_url, pool_size=1, max_batch_size=MAX_MULTIPLE_ACCOUNTS, cache=None,
+                 rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES):
+        urls = [rpc_url] if isinstance(rpc_url, str) else list(rpc_url)
+        self.rpc_url = urls[0]
+        self.cache = cache
+        self.pool_size = max(1, int(pool_size))
+        self.max_batch_size = min(max_batch_size, MAX_MULTIPLE_ACCOUNTS)
+        self.endpoints = EndpointPool(urls, rate=rate, max_concurrency=self.pool_size, max_retries=max_retries)
+        self.request_count = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        """Create an HTTP session sized for the configured pool"""
+        session = requests.Session()
+        session.headers.update({
+            'Content-Type': 'application/json'
+        })
+        adapter = HTTPAdapter(pool_connections=len(self.endpoints.endpoints), pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @property
+    def session(self):
+        """Session owned by the calling thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._create_session()
+        return session
+
+    def post(self, payload):
+        """POST a JSON-RPC payload and return the decoded body, or None"""
+        with self._lock:
+            self.request_count += 1
+        response = self.endpoints.post(self.session, payload)
+        return response.json() if response is not None and response.status_code == 200 else None
+
+    def _from_cache(self, method, params):
+        """Return (found, response); in offline replay a miss counts as found"""
+        if self.cache is None:
+            return False, None
+        response = self.cache.get(method, params)
+        return response is not None or self.cache.offline, response
+
+    def _store(self, method, params, response):
+        if self.cache is not None:
+            self.cache.put(method, params, response)
+
+    def call(self, method, params, request_id="1"):
+        """Send a single JSON-RPC call"""
+        found, response = self._from_cache(method, params)
+        if found:
+            return response
+        response = self._send(method, params, request_id)
+        self._store(method, params, response)
+        return response
+
+    def _send(self, method, params, request_id="1"):
+        return self.post({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": params
+        })
+
+    def batch_call(self, calls):
+        """Send (method, params) pairs as one JSON-RPC batch array
+
+        Returns one response per call in the original order. Each entry carries
+        its own result or error; a transport failure yields None for every call.
+        """
+        results = [None] * len(calls)
+        missing = []
+        for i, (method, params) in enumerate(calls):
+            found, response = self._from_cache(method, params)
+            if found:
+                results[i] = response
+            else:
+                missing.append(i)
+        if not missing:
+            return results
+
+        payload = [
+            {"jsonrpc": "2.0", "id": i, "method": calls[i][0], "params": calls[i][1]}
+            for i in missing
+        ]
+        try:
+            body = self.post(payload)
+        except Exception as e:
+            logger.error(f"Batch request of {len(missing)} calls failed: {str(e)}")
+            return results
+        if not isinstance(body, list):
+            # Some providers answer a rejected batch with a single error object
+            for i in missing:
+                results[i] = body
+            return results
+        by_id = {entry.get('id'): entry for entry in body if isinstance(entry, dict)}
+        for i in missing:
+            results[i] = by_id.get(i)
+            self._store(calls[i][0], calls[i][1], results[i])
+        return results
+
+    def get_multiple_accounts(self, addresses, config=None):
+        """Look up accounts in getMultipleAccounts chunks
+
+        Returns {address: response} where each response looks like a
+        getAccountInfo reply. When a chunk is rejected as a whole (for example
+        because one key is malformed) it is retried as a batch of individual
+        getAccountInfo calls so the failure stays with the offending wallet.
+        """
+        responses = {}
+        missing = []
+        for address in dict.fromkeys(addresses):
+            found, response = self._from_cache("getAccountInfo", self._account_params(address, config))
+            if found:
+                responses[address] = response
+            else:
+                missing.append(address)
+
+        for chunk in chunked(missing, self.max_batch_size):
+            params = [chunk, config] if config else [chunk]
+            try:
+                # Cached per address below rather than per chunk
+                body = self._send("getMultipleAccounts", params)
+            except Exception as e:
+                logger.error(f"Error fetching {len(chunk)} accounts: {str(e)}")
+                body = None
+
+            # A null result (some nodes answer that way when overloaded) falls back too
+            if body and isinstance(body.get('result'), dict):
+                context = body['result'].get('context')
+                values = body['result'].get('value') or []
+                for address, value in zip(chunk, values):
+                    responses[address] = {
+                        'jsonrpc': '2.0',
+                        'id': body.get('id'),
+                        'result': {'context': context, 'value': value}
+                    }
+                    self._store("getAccountInfo", self._account_params(address, config), responses[address])
+                continue
+
+            results = self.batch_call([
+                ("getAccountInfo", self._account_params(address, config)) for address in chunk
+            ])
+            for address, result in zip(chunk, results):
+                responses[address] = result
+        return responses
+
+    @staticmethod
+    def _account_params(address, config):
+        return [address, config] if config else [address]
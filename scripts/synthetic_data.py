@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+BASE58_ALPHABET = np.frombuffer(b'123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz', dtype=np.uint8)
+MEME_WORDS = ['pepe', 'doge', 'shib', 'wojak', 'chad', 'elon']
+SOL_MINT = 'So11111111111111111111111111111111111111112'
+USDC_MINT = 'EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v'
+
+
+def synthetic_addresses(count, rng, suffix=''):
+    """Random 44-character base58 addresses, generated without a Python loop
+
+    A leading digit of 1..15 ('2'..'G') keeps each one the base58 form of
+    a 32-byte key, like real addresses.
+    """
+    width = 44 - len(suffix)
+    digits = rng.integers(0, len(BASE58_ALPHABET), size=(count, width))
+    digits[:, 0] = digits[:, 0] % 15 + 1
+    codes = BASE58_ALPHABET[digits]
+    addresses = codes.view(f'S{width}').ravel().astype(str)
+    return np.char.add(addresses, suffix) if suffix else addresses
+
+
+def synthetic_mints(count, rng, pump_ratio=0.8, meme_ratio=0.02):
+    """Mint universe: mostly pump-suffixed, with a few meme-keyword mints"""
+    pump_count = int(count * pump_ratio)
+    mints = np.concatenate([
+        synthetic_addresses(pump_count, rng, 'pump'),
+        synthetic_addresses(count - pump_count, rng)
+    ])
+    meme = rng.random(count) < meme_ratio
+    words = np.array(MEME_WORDS)[rng.integers(0, len(MEME_WORDS), size=int(meme.sum()))]
+    mints[meme] = [word + mint[len(word):] for word, mint in zip(words, mints[meme])]
+    return mints[rng.permutation(count)]
+
+
+def synthetic_wallets(count, seed=0):
+    """Wallet universe with power-law PnL above the $1M threshold"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'wallet': synthetic_addresses(count, rng),
+        'total_pnl': np.round(1e6 * (1 + rng.pareto(1.5, count)), 2)
+    })
+
+
+def synthetic_holdings(wallets, seed=0, max_tokens=500, snapshot_date='2024-12-04'):
+    """Long holdings table with power-law token counts and Zipf-popular mints
+
+    Shaped like holdings_store output: dictionary-encoded wallet, mint and
+    snapshot_date columns plus float amounts spread over nine decades.
+    """
+    rng = np.random.default_rng(seed + 1)
+    wallets = np.asarray(wallets)
+    counts = np.minimum((rng.pareto(1.5, len(wallets)) * 8).astype(np.int64), max_tokens)
+    universe = synthetic_mints(max(1000, len(wallets) // 2), rng)
+    total = int(counts.sum())
+    # Zipf ranks make a handful of mints widely co-held, like real pump launches
+    ranks = np.minimum(rng.zipf(1.3, total), len(universe)) - 1
+    return pd.DataFrame({
+        'wallet': pd.Categorical(np.repeat(wallets, counts)),
+        'mint': pd.Categorical(universe[ranks]),
+        'amount': np.round(10 ** rng.uniform(0, 9, total), 6),
+        'snapshot_date': pd.Categorical([snapshot_date]).repeat(total)
+    })
+
+
+def synthetic_tracking_data(wallet_count, seed=0, new_ratio=0.1, duplicate_ratio=0.15):
+    """History of wallet_count wallets plus a Dune-shaped result for today
+
+    Today's result revisits most known wallets, adds new_ratio new ones and
+    repeats duplicate_ratio of its rows the way the per-token query does.
+    """
+    rng = np.random.default_rng(seed)
+    wallets = synthetic_addresses(wallet_count, rng)
+    history = pd.DataFrame({
+        'wallet': wallets,
+        'total_pnl': np.round(1e6 * (1 + rng.pareto(1.5, wallet_count)), 2),
+        'first_seen': '2024-12-01',
+        'last_seen': '2024-12-03'
+    })
+
+    seen = rng.choice(wallets, size=int(wallet_count * (1 - new_ratio)), replace=False)
+    new = synthetic_addresses(int(wallet_count * new_ratio), rng)
+    today = np.concatenate([seen, new])
+    today = np.concatenate([today, rng.choice(today, size=int(len(today) * duplicate_ratio))])
+    millionaires = pd.DataFrame({
+        'total_pnl': np.round(1e6 * (1 + rng.pareto(1.5, len(today))), 2),
+        'wallet': today
+    }).sort_values('total_pnl', ascending=False)
+    return history, millionaires
+
+
+def synthetic_trades(count, seed=0, wallet_count=None, mint_count=None, start='2024-11-01', days=30):
+    """dex_solana.trades-shaped swaps of mostly pump.fun tokens against SOL
+
+    Zipf-distributed traders and tokens concentrate volume enough for some
+    wallet and token pairs to clear $1M of PnL. A few rows carry what the
+    profitable wallets query has to filter out: USDC quotes, missing
+    symbols, missing USD amounts, zero token amounts and trades on other
+    venues. Block times are distinct seconds while count fits the window.
+    """
+    rng = np.random.default_rng(seed)
+    wallet_count = wallet_count or max(10, count // 50)
+    mint_count = mint_count or max(10, count // 200)
+    wallets = synthetic_addresses(wallet_count, rng)
+    mints = synthetic_mints(mint_count, rng)
+    symbols = np.char.add('TKN', np.arange(mint_count).astype(str)).astype(object)
+    symbols[rng.random(mint_count) < 0.03] = None
+    base_prices = 10 ** rng.uniform(-7, 0.5, mint_count)
+
+    trader = np.minimum(rng.zipf(1.4, count), wallet_count) - 1
+    token = np.minimum(rng.zipf(1.2, count), mint_count) - 1
+    amount_usd = np.round(10 ** rng.uniform(1, 6.5, count), 2)
+    amount_usd[rng.random(count) < 0.01] = np.nan
+    token_amount = np.round(np.nan_to_num(amount_usd, nan=1.0) / (base_prices[token] * rng.lognormal(0, 0.5, count)), 6)
+    token_amount[rng.random(count) < 0.005] = 0
+    usdc = rng.random(count) < 0.05
+    quote_mint = np.where(usdc, USDC_MINT, SOL_MINT)
+    quote_symbol = np.where(usdc, 'USDC', 'SOL')
+    quote_amount = np.round(np.nan_to_num(amount_usd) / np.where(usdc, 1.0, 230.0), 6)
+
+    buy = rng.random(count) < 0.55
+    window = days * 86400
+    seconds = rng.permutation(window)[:count] if count <= window else rng.integers(0, window, count)
+    return pd.DataFrame({
+        'block_time': pd.Timestamp(start, tz='UTC') + pd.to_timedelta(np.sort(seconds), unit='s'),
+        'tx_id': synthetic_addresses(count, rng),
+        'trader_id': wallets[trader],
+        'project': np.where(rng.random(count) < 0.8, 'pumpdotfun', 'raydium'),
+        'token_bought_mint_address': np.where(buy, mints[token], quote_mint),
+        'token_bought_symbol': np.where(buy, symbols[token], quote_symbol),
+        'token_bought_amount': np.where(buy, token_amount, quote_amount),
+        'token_sold_mint_address': np.where(buy, quote_mint, mints[token]),
+        'token_sold_symbol': np.where(buy, quote_symbol, symbols[token]),
+        'token_sold_amount': np.where(buy, quote_amount, token_amount),
+        'amount_usd': amount_usd
+    })
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+from address_registry import AddressRegistry
+
+
+def _group_offsets(keys, count):
+    """Order and offsets that group positions by key, in linear time"""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=count), out=offsets[1:])
+    return order, offsets
+
+
+class MintWalletIndex:
+    """Inverted index between mints and the wallets holding them
+
+    Wallets and mints are AddressRegistry ids. Both directions are stored
+    as CSR-style arrays: the wallets holding mint m are
+    wallet_ids[mint_offsets[m]:mint_offsets[m + 1]], and the mints held by
+    wallet w are mint_ids[wallet_offsets[w]:wallet_offsets[w + 1]]. A wallet
+    holding the same mint in several token accounts is counted once.
+    Address strings are only built for what is returned.
+    """
+
+    def __init__(self, wallets, mints, pair_wallets, pair_mints):
+        self.wallets = wallets
+        self.mints = mints
+
+        order, self.mint_offsets = _group_offsets(pair_mints, len(mints))
+        self.wallet_ids = pair_wallets[order]
+        order, self.wallet_offsets = _group_offsets(pair_wallets, len(wallets))
+        self.mint_ids = pair_mints[order]
+
+    @classmethod
+    def from_holdings(cls, holdings, wallets=None, mints=None):
+        """Build the index from the long (wallet, mint, ...) holdings table
+
+        wallets and mints are registries to number addresses with, new
+        ones by default.
+        """
+        holdings = holdings[holdings['wallet'].notna() & holdings['mint'].notna()]
+        wallets = AddressRegistry() if wallets is None else wallets
+        mints = AddressRegistry() if mints is None else mints
+        return cls.from_ids(wallets.encode(holdings['wallet']), mints.encode(holdings['mint']), wallets, mints)
+
+    @classmethod
+    def from_ids(cls, wallet_ids, mint_ids, wallets, mints):
+        """Build the index from parallel wallet and mint id arrays"""
+        # Collapse repeated (wallet, mint) pairs with one hash pass
+        width = max(len(wallets), 1)
+        pairs = pd.unique(np.asarray(mint_ids, dtype=np.int64) * width + np.asarray(wallet_ids, dtype=np.int64))
+        return cls(wallets, mints, pairs % width, pairs // width)
+
+    def __len__(self):
+        return len(self.mints)
+
+    def holder_ids(self, mint):
+        """Dense ids of the wallets holding mint"""
+        m = self.mints.id(mint)
+        if m is None:
+            return np.empty(0, dtype=np.int64)
+        return self.wallet_ids[self.mint_offsets[m]:self.mint_offsets[m + 1]]
+
+    def holders(self, mint):
+        """Set of wallet addresses holding mint"""
+        return set(self.wallets[self.holder_ids(mint)])
+
+    def _ranked_counts(self, n=None):
+        """Ids and holder counts of the n most held mints (all held ones by default)"""
+        counts = np.diff(self.mint_offsets)
+        ranked = np.argsort(-counts, kind='stable')
+        ranked = ranked[counts[ranked] > 0][:n]
+        return ranked, counts[ranked]
+
+    def holder_counts(self):
+        """Number of wallets holding each mint, most held first"""
+        ranked, counts = self._ranked_counts()
+        return pd.Series(counts, index=pd.Index(self.mints.decode(ranked), name='token'))
+
+    def top_mints(self, n=10):
+        """The n mints held by the most wallets"""
+        ranked, counts = self._ranked_counts(n)
+        return pd.Series(counts, index=pd.Index(self.mints.decode(ranked), name='token'))
+
+    def co_held_with(self, mint, n=10):
+        """Mints most often held by the wallets that also hold mint"""
+        holder_ids = self.holder_ids(mint)
+        if not len(holder_ids):
+            return pd.Series(dtype='int64')
+        starts = self.wallet_offsets[holder_ids]
+        ends = self.wallet_offsets[holder_ids + 1]
+        held = np.concatenate([self.mint_ids[s:e] for s, e in zip(starts, ends)])
+        counts = np.bincount(held, minlength=len(self.mints))
+        counts[self.mints.id(mint)] = 0
+        top = np.argsort(-counts, kind='stable')[:n]
+        top = top[counts[top] > 0]
+        return pd.Series(counts[top], index=pd.Index(self.mints[top], name='token'))
+
+    def special_holders(self, mint, special_wallets):
+        """Which of special_wallets hold mint"""
+        return self.holders(mint).intersection(special_wallets)
@@ -1,7 +1,15 @@
 import os
+import numpy as np
 import pandas as pd
 import logging
+import argparse
 from datetime import datetime
+from itertools import combinations
+from holdings_store import load_holdings
+from token_index import MintWalletIndex
+from wallet_bitmaps import WalletBitmaps, label_masks
+from sharding import run_sharded, DEFAULT_CHUNK_SIZE
+from instrumentation import configure_logging, metrics, instrumented, add_instrumentation_arguments
 
 # Setup directories
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -9,34 +17,57 @@ DATA_DIR = os.path.join(BASE_DIR, 'data')
 TRADERS_DIR = os.path.join(BASE_DIR, 'traders')
 os.makedirs(TRADERS_DIR, exist_ok=True)
 
-logging.basicConfig(
-   level=logging.INFO,
-   format='%(asctime)s - %(levelname)s - %(message)s',
-   handlers=[
-       logging.FileHandler(os.path.join(TRADERS_DIR, 'special_wallets.log')),
-       logging.StreamHandler()
-   ]
-)
+configure_logging(os.path.join(TRADERS_DIR, 'special_wallets.log'))
 logger = logging.getLogger(__name__)
 
-def extract_special_wallets():
-   # Load patterns CSV
-   patterns_file = os.path.join(DATA_DIR, 'patterns.csv')
-   patterns_df = pd.read_csv(patterns_file)
+def special_categories(patterns_df):
+   """Row masks of patterns_df for each category of special wallets"""
+   return {
+       'super_diversified': patterns_df['trading_style'] == 'Super Diversified',
+       'high_volume_traders': patterns_df['token_count'] > 100,
+       'mega_whales': patterns_df['category'] == 'Mega Whale',
+       'pump_specialists': patterns_df['patterns'].str.contains('Pump', na=False),
+       'whale_positions': patterns_df['patterns'].str.contains('Whale Positions', na=False)
+   }
+
+def category_bitmaps(patterns_df, categories, labels_df=None):
+   """WalletBitmaps of the special categories, then the pattern and labeler ones
+
+   Returns the bitmaps and the wallet id of each patterns_df row. Pattern
+   categories are named category:, style: and pattern:<label>, and the
+   labeler's labels label:<label>.
+   """
+   bitmaps = WalletBitmaps()
+   ids = bitmaps.registry.encode(patterns_df['wallet_address'])
+   for category, mask in categories.items():
+       bitmaps.add_ids(category, ids[mask.to_numpy(dtype=bool)])
+   for column, prefix, separator in [('category', 'category', None), ('trading_style', 'style', None),
+                                     ('patterns', 'pattern', ' | ')]:
+       for label, mask in label_masks(patterns_df[column], separator).items():
+           bitmaps.add_ids(f'{prefix}:{label}', ids[mask])
+   if labels_df is not None:
+       label_ids = bitmaps.registry.encode(labels_df['wallet_address'])
+       for label, mask in label_masks(labels_df['detailed_labels'], ' | ').items():
+           bitmaps.add_ids(f'label:{label}', label_ids[mask])
+   return bitmaps, ids
+
+def extract_special_wallets(patterns_df=None, output_dir=TRADERS_DIR, labels_df=None):
+   # Load patterns CSV unless the profiles are handed over directly
+   if patterns_df is None:
+       patterns_file = os.path.join(DATA_DIR, 'patterns.csv')
+       patterns_df = pd.read_csv(patterns_file)
+       labels_file = os.path.join(DATA_DIR, 'labeled_wallets_detailed.csv')
+       if os.path.exists(labels_file):
+           labels_df = pd.read_csv(labels_file)
    
    # Different categories of special wallets
-   special_wallets = {
-       'super_diversified': patterns_df[patterns_df['trading_style'] == 'Super Diversified'],
-       'high_volume_traders': patterns_df[patterns_df['token_count'] > 100],
-       'mega_whales': patterns_df[patterns_df['category'] == 'Mega Whale'],
-       'pump_specialists': patterns_df[patterns_df['patterns'].str.contains('Pump', na=False)],
-       'whale_positions': patterns_df[patterns_df['patterns'].str.contains('Whale Positions', na=False)]
-   }
+   categories = special_categories(patterns_df)
+   special_wallets = {category: patterns_df[mask] for category, mask in categories.items()}
    
    # Create detailed analysis for each category
    for category, wallets in special_wallets.items():
        if len(wallets) > 0:
-           output_file = os.path.join(TRADERS_DIR, f'{category}_analysis.csv')
+           output_file = os.path.join(output_dir, f'{category}_analysis.csv')
            wallets.to_csv(output_file, index=False)
            
            print(f"\n{category.replace('_', ' ').title()} Analysis:")
@@ -47,93 +78,119 @@ def extract_special_wallets():
            top_5 = wallets.nlargest(5, 'total_pnl')[['wallet_address', 'total_pnl', 'trading_style', 'patterns']]
            print(top_5.to_string())
            
-   # Find overlap between categories
-   print("\nWallet Category Overlap Analysis:")
-   mega_whale_addresses = set(special_wallets['mega_whales']['wallet_address'])
-   pump_specialist_addresses = set(special_wallets['pump_specialists']['wallet_address'])
-   whale_position_addresses = set(special_wallets['whale_positions']['wallet_address'])
-   
-   # Calculate overlaps
-   mega_whale_and_pump = mega_whale_addresses.intersection(pump_specialist_addresses)
-   mega_whale_and_whale_pos = mega_whale_addresses.intersection(whale_position_addresses)
-   pump_and_whale_pos = pump_specialist_addresses.intersection(whale_position_addresses)
+   # Every category, pattern and label as a bitmap over wallet ids
+   bitmaps, ids = category_bitmaps(patterns_df, categories, labels_df)
+   overlaps = bitmaps.overlap_matrix()
+   overlaps.to_csv(os.path.join(output_dir, 'category_overlap_matrix.csv'))
+   metrics.set('wallet_categories', len(bitmaps))
    
-   print(f"Mega Whales who are Pump Specialists: {len(mega_whale_and_pump)}")
-   print(f"Mega Whales with Whale Positions: {len(mega_whale_and_whale_pos)}")
-   print(f"Pump Specialists with Whale Positions: {len(pump_and_whale_pos)}")
+   # Find overlap between each pair of special categories
+   print("\nWallet Category Overlap Analysis:")
+   overlap_data = {'category': [], 'count': [], 'addresses': []}
+   for first, second in combinations(categories, 2):
+       name = f"{first.replace('_', ' ').title()} & {second.replace('_', ' ').title()}"
+       print(f"{name}: {overlaps.loc[first, second]}")
+       overlap_data['category'].append(name)
+       overlap_data['count'].append(overlaps.loc[first, second])
+       overlap_data['addresses'].append(bitmaps.wallets(bitmaps.intersection(first, second)))
    
    # Save overlap analysis
-   overlap_data = {
-       'category': ['Mega Whale & Pump', 'Mega Whale & Whale Pos', 'Pump & Whale Pos'],
-       'count': [len(mega_whale_and_pump), len(mega_whale_and_whale_pos), len(pump_and_whale_pos)],
-       'addresses': [list(mega_whale_and_pump), list(mega_whale_and_whale_pos), list(pump_and_whale_pos)]
-   }
    overlap_df = pd.DataFrame(overlap_data)
-   overlap_df.to_csv(os.path.join(TRADERS_DIR, 'category_overlaps.csv'), index=False)
+   overlap_df.to_csv(os.path.join(output_dir, 'category_overlaps.csv'), index=False)
    
-   # Create master list of special wallets
-   all_special_wallets = pd.concat(special_wallets.values())
-   all_special_wallets = all_special_wallets.drop_duplicates(subset=['wallet_address'])
-   master_file = os.path.join(TRADERS_DIR, 'special_wallets_master.csv')
+   # Create master list of special wallets: the wallets of any category, listed
+   # category by category in the order above, each by its first row there
+   rows = np.flatnonzero(bitmaps.contains(bitmaps.union(*categories), ids))
+   first_category = np.full(len(patterns_df), len(categories))
+   for position, mask in reversed(list(enumerate(categories.values()))):
+       first_category[mask.to_numpy(dtype=bool)] = position
+   rows = rows[np.lexsort((rows, first_category[rows]))]
+   rows = rows[~pd.Series(ids[rows]).duplicated().to_numpy()]
+   all_special_wallets = patterns_df.iloc[rows]
+   master_file = os.path.join(output_dir, 'special_wallets_master.csv')
    all_special_wallets.to_csv(master_file, index=False)
    
    return all_special_wallets
 
-def analyze_token_patterns(df):
+def token_pattern_chunk(df, holdings):
+   """Mergeable pieces of analyze_token_patterns for one shard of wallets
+
+   Returns the first row of each (wallet, mint) pair, the token count per
+   wallet and the large positions, all indexed by holdings row so shards
+   can be put back in the original order.
+   """
+   holdings = holdings[holdings['wallet'].isin(df['wallet_address'])]
+   pairs = holdings.loc[~holdings.duplicated(['wallet', 'mint']), ['wallet', 'mint']]
+   tokens_per_wallet = holdings.groupby(holdings['wallet'].astype(str), sort=False).size()
+   amounts = holdings['amount'].astype(float)
+   return pairs, tokens_per_wallet, amounts[amounts > 1000000]
+
+def merge_token_patterns(results):
+   pairs, tokens_per_wallet, large = zip(*results)
+   return (pd.concat(pairs).sort_index(kind='stable'),
+           pd.concat(tokens_per_wallet),
+           pd.concat(large).sort_index(kind='stable'))
+
+def analyze_token_patterns(df, holdings=None, output_dir=TRADERS_DIR, workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
    """Analyze common patterns among special wallets"""
-   # Load the original analysis data to get token holdings
-   analysis_file = os.path.join(DATA_DIR, 'analysis_progress.csv')
-   full_data = pd.read_csv(analysis_file)
+   # Load token holdings for the special wallets only
+   if holdings is None:
+       analysis_file = os.path.join(DATA_DIR, 'analysis_progress.csv')
+       holdings = load_holdings(analysis_file, wallets=df['wallet_address'])
    
-   # Merge with special wallets
-   special_wallets_with_data = df.merge(full_data, left_on='wallet_address', right_on='wallet', how='left')
+   # Shards cover disjoint wallets, so their pieces simply concatenate
+   pairs, tokens_per_wallet, large = run_sharded(
+       token_pattern_chunk, df, holdings, workers, chunk_size,
+       wallet_column='wallet_address', merge=merge_token_patterns
+   )
+   token_index = MintWalletIndex.from_holdings(pairs)
    
    patterns = {
-       'token_counts': [],
-       'holding_sizes': [],
-       'common_tokens': set(),
-       'trade_frequencies': []
+       'token_counts': tokens_per_wallet.reindex(df['wallet_address']).dropna().astype(int).tolist(),
+       'holding_sizes': large.tolist(),
+       # Registry of the held mints; len, in and iteration work as on a set
+       'common_tokens': token_index.mints,
+       'trade_frequencies': [],
+       'token_index': token_index
    }
    
-   for _, row in special_wallets_with_data.iterrows():
-       if 'token_holdings' in row and row['token_holdings'] != '[]':
-           holdings = eval(row['token_holdings'])
-           patterns['token_counts'].append(len(holdings))
-           
-           for holding in holdings:
-               if float(holding.get('amount', 0)) > 1000000:
-                   patterns['holding_sizes'].append(float(holding['amount']))
-               patterns['common_tokens'].add(holding['mint'])
-   
-   # Save detailed token analysis
-   token_analysis = {
-       'token': list(patterns['common_tokens']),
-       'frequency': [patterns['token_counts'].count(token) for token in patterns['common_tokens']]
-   }
-   token_df = pd.DataFrame(token_analysis)
-   token_df = token_df.sort_values('frequency', ascending=False)
-   token_df.to_csv(os.path.join(TRADERS_DIR, 'token_analysis.csv'), index=False)
+   # Save detailed token analysis: how many special wallets hold each token
+   token_df = token_index.holder_counts().rename('frequency').reset_index()
+   token_df.to_csv(os.path.join(output_dir, 'token_analysis.csv'), index=False)
    
    return patterns
 
-def main():
+def parse_args(argv=None):
+   parser = argparse.ArgumentParser(description="Analyze special wallet categories and their tokens")
+   parser.add_argument('--workers', type=int, default=1,
+                       help="Processes to shard the wallets across (1 runs in this process)")
+   parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Wallets per shard")
+   add_instrumentation_arguments(parser)
+   return parser.parse_args(argv)
+
+def main(argv=None):
    try:
-       logger.info("Starting special wallet analysis...")
-       
-       # Extract and analyze special wallets
-       special_wallets = extract_special_wallets()
-       
-       # Analyze token patterns
-       patterns = analyze_token_patterns(special_wallets)
-       
-       print("\nDetailed Token Analysis:")
-       print(f"Total unique tokens held: {len(patterns['common_tokens'])}")
-       if patterns['token_counts']:
-           print(f"Average tokens per wallet: {sum(patterns['token_counts'])/len(patterns['token_counts']):.1f}")
-       if patterns['holding_sizes']:
-           print(f"Average large position size: {sum(patterns['holding_sizes'])/len(patterns['holding_sizes']):,.0f}")
-       
-       logger.info("Analysis complete. Results saved to traders directory.")
+       args = parse_args(argv)
+       with instrumented('traders', args):
+          logger.info("Starting special wallet analysis...")
+          
+          # Extract and analyze special wallets
+          special_wallets = extract_special_wallets()
+          
+          # Analyze token patterns
+          patterns = analyze_token_patterns(special_wallets, workers=args.workers, chunk_size=args.chunk_size)
+          
+          print("\nDetailed Token Analysis:")
+          print(f"Total unique tokens held: {len(patterns['common_tokens'])}")
+          if patterns['token_counts']:
+              print(f"Average tokens per wallet: {sum(patterns['token_counts'])/len(patterns['token_counts']):.1f}")
+          if patterns['holding_sizes']:
+              print(f"Average large position size: {sum(patterns['holding_sizes'])/len(patterns['holding_sizes']):,.0f}")
+          
+          print("\nMost Held Tokens:")
+          print(patterns['token_index'].top_mints(10).to_string())
+          
+          logger.info("Analysis complete. Results saved to traders directory.")
        
    except Exception as e:
        logger.error(f"Analysis failed: {str(e)}")
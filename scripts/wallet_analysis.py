@@ -1,52 +1,48 @@
 import os
 import pandas as pd
-import requests
 import logging
-import time
+import argparse
 from datetime import datetime
+from solana_rpc import SolanaRpcClient, MAX_MULTIPLE_ACCOUNTS
+from rpc_pool import add_rpc_arguments, DEFAULT_RATE, DEFAULT_MAX_RETRIES
+from rpc_cache import add_cache_arguments, open_cache
+from journal import WalletJournal, row_key
+from instrumentation import configure_logging, ProgressLog, instrumented, add_instrumentation_arguments
 
 # Setup
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
+JOURNAL_FILE = os.path.join(DATA_DIR, 'wallet_analysis_journal.jsonl')
+HELIUS_RPC_URL = "https://mainnet.helius-rpc.com/?api-key=68ef0900-ddc2-4300-b079-df0db172e839"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(DATA_DIR, 'analysis.log')),
-        logging.StreamHandler()
-    ]
-)
+configure_logging(os.path.join(DATA_DIR, 'analysis.log'))
 logger = logging.getLogger(__name__)
 
 class SimpleWalletAnalyzer:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json'
-        })
+    def __init__(self, batch_size=MAX_MULTIPLE_ACCOUNTS, cache=None, rpc_url=HELIUS_RPC_URL,
+                 rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES):
         # Use RPC endpoint instead of REST API
-        self.rpc_url = "https://mainnet.helius-rpc.com/?api-key=68ef0900-ddc2-4300-b079-df0db172e839"
+        self.client = SolanaRpcClient(rpc_url, max_batch_size=batch_size, cache=cache,
+                                      rate=rate, max_retries=max_retries)
+        self.rpc_url = self.client.rpc_url
 
     def get_wallet_info(self, wallet_address):
         """Get basic wallet information using JSON-RPC"""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": "my-id",
-            "method": "getAccountInfo",
-            "params": [wallet_address]
-        }
-        
         try:
-            response = self.session.post(self.rpc_url, json=payload)
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self.client.call("getAccountInfo", [wallet_address], request_id="my-id")
         except Exception as e:
             logger.error(f"Error fetching wallet {wallet_address}: {str(e)}")
             return None
 
+    def get_wallet_infos(self, wallet_addresses):
+        """Get basic wallet information for many wallets via getMultipleAccounts
+
+        Returns {wallet: response}; a wallet whose lookup failed maps to its own
+        error response (or None) without affecting the rest of the batch.
+        """
+        return self.client.get_multiple_accounts(wallet_addresses)
+
     def analyze_wallet(self, wallet_data, pnl):
         """Simple wallet analysis"""
         analysis = {
@@ -75,48 +71,77 @@ class SimpleWalletAnalyzer:
         except:
             return 'Unknown'
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check activity of profitable wallets")
+    parser.add_argument('--resume', action='store_true',
+                        help="Skip wallets already recorded in the journal by an interrupted run")
+    add_rpc_arguments(parser, HELIUS_RPC_URL)
+    add_cache_arguments(parser)
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
     try:
-        # Initialize analyzer
-        analyzer = SimpleWalletAnalyzer()
-        
-        # Load wallet data
-        input_file = os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv')
-        wallet_df = pd.read_csv(input_file)
-        logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
-        
-        analyses = []
-        for idx, row in wallet_df.iterrows():
-            wallet = row['wallet']
-            pnl = row['total_pnl']
+        args = parse_args(argv)
+        with instrumented('wallet_analysis', args):
+            cache = open_cache(args)
             
-            logger.info(f"Analyzing wallet {idx+1}/{len(wallet_df)}: {wallet}")
+            # Initialize analyzer
+            analyzer = SimpleWalletAnalyzer(cache=cache, rpc_url=args.rpc_url, rate=args.rpc_rate,
+                                            max_retries=args.rpc_retries)
             
-            # Get and analyze wallet data
-            wallet_data = analyzer.get_wallet_info(wallet)
-            analysis = analyzer.analyze_wallet(wallet_data, pnl)
-            analysis['wallet'] = wallet
-            analyses.append(analysis)
+            # Load wallet data
+            input_file = os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv')
+            wallet_df = pd.read_csv(input_file)
+            logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
             
-            # Save progress every 10 wallets
-            if (idx + 1) % 10 == 0:
-                progress_df = pd.DataFrame(analyses)
-                progress_df.to_csv(os.path.join(DATA_DIR, 'analysis_progress.csv'), index=False)
-                logger.info(f"Progress saved: {idx+1}/{len(wallet_df)} wallets analyzed")
+            # Wallets finished by an earlier, interrupted run are skipped on --resume
+            journal = WalletJournal(JOURNAL_FILE, resume=args.resume)
+            keys = [row_key(w, p) for w, p in zip(wallet_df['wallet'], wallet_df['total_pnl'])]
+            pending_df = wallet_df[[key not in journal for key in keys]]
+            pending_df = pending_df.drop_duplicates(subset=['wallet', 'total_pnl']).reset_index(drop=True)
+            if len(journal):
+                logger.info(f"Skipping {len(wallet_df) - len(pending_df)} wallets already journaled")
             
-            time.sleep(0.1)  # Gentle rate limiting
-        
-        # Save final results
-        final_df = pd.DataFrame(analyses)
-        final_df.to_csv(os.path.join(DATA_DIR, 'wallet_analysis_final.csv'), index=False)
-        
-        # Print summary
-        print("\nAnalysis Summary:")
-        print(f"Total wallets analyzed: {len(final_df)}")
-        print("\nWallet Categories:")
-        print(final_df['category'].value_counts())
-        print("\nActivity Levels:")
-        print(final_df['activity_level'].value_counts())
+            wallet_infos = {}
+            progress = ProgressLog(logger, len(pending_df), stage='fetch')
+            for idx, row in pending_df.iterrows():
+                wallet = row['wallet']
+                pnl = row['total_pnl']
+            
+                # Fetch the next batch of wallets in a single getMultipleAccounts call
+                if idx % analyzer.client.max_batch_size == 0:
+                    batch = pending_df['wallet'].iloc[idx:idx + analyzer.client.max_batch_size]
+                    wallet_infos = analyzer.get_wallet_infos(batch)
+            
+                logger.debug(f"Analyzing wallet {idx+1}/{len(pending_df)}: {wallet}")
+            
+                # Analyze wallet data
+                wallet_data = wallet_infos.get(wallet)
+                analysis = analyzer.analyze_wallet(wallet_data, pnl)
+                analysis['wallet'] = wallet
+                journal.append(analysis, key=row_key(wallet, pnl))
+                progress.update()
+            
+            journal.close()
+            
+            # Compact the journal into the final results, in input order
+            final_df = journal.compact(order=keys, output_paths=[
+                os.path.join(DATA_DIR, 'wallet_analysis_final.csv')
+            ])
+            
+            # Print summary
+            print("\nAnalysis Summary:")
+            print(f"Total wallets analyzed: {len(final_df)}")
+            print(f"RPC requests sent: {analyzer.client.request_count}")
+            print(analyzer.client.endpoints.summary())
+            if cache is not None:
+                print(cache.summary())
+                cache.close()
+            print("\nWallet Categories:")
+            print(final_df['category'].value_counts())
+            print("\nActivity Levels:")
+            print(final_df['activity_level'].value_counts())
         
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
@@ -1,79 +1,151 @@
 import os
 import pandas as pd
-import requests
 import logging
 import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
+from solana_rpc import SolanaRpcClient, MAX_MULTIPLE_ACCOUNTS, chunked
+from rpc_pool import add_rpc_arguments, DEFAULT_RATE, DEFAULT_MAX_RETRIES
+from token_accounts import (TOKEN_PROGRAMS, MINT_DECIMALS_SLICE, ENCODINGS, token_accounts_params,
+                            decode_sliced_accounts, decode_parsed_accounts, decode_mint_decimals,
+                            held_mints, sliced_holdings)
+from rpc_cache import add_cache_arguments, open_cache
+from holdings_store import holdings_frame, write_holdings
+from journal import WalletJournal, row_key
+from refresh_state import WalletRefreshState, DEFAULT_MAX_AGE_DAYS
+from instrumentation import configure_logging, metrics, ProgressLog, instrumented, add_instrumentation_arguments
 
 # Setup
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-logging.basicConfig(
-   level=logging.INFO,
-   format='%(asctime)s - %(levelname)s - %(message)s',
-   handlers=[
-       logging.FileHandler(os.path.join(DATA_DIR, 'analysis.log')),
-       logging.StreamHandler()
-   ]
-)
+DEFAULT_RPC_URL = "https://api.mainnet-beta.solana.com"
+JOURNAL_FILE = os.path.join(DATA_DIR, 'wallet_details_journal.jsonl')
+
+configure_logging(os.path.join(DATA_DIR, 'analysis.log'))
 logger = logging.getLogger(__name__)
 
 class WalletAnalyzer:
-   def __init__(self):
-       self.session = requests.Session()
-       self.session.headers.update({
-           'Content-Type': 'application/json'
-       })
-       # Using public Solana RPC endpoint
-       self.rpc_url = "https://api.mainnet-beta.solana.com"
+   def __init__(self, rpc_url=DEFAULT_RPC_URL, max_in_flight=1, batch_size=MAX_MULTIPLE_ACCOUNTS, cache=None,
+                rate=DEFAULT_RATE, max_retries=DEFAULT_MAX_RETRIES, encoding='base64'):
+       # Using public Solana RPC endpoint unless others are given
+       self.encoding = encoding
+       # Decimals never change once a mint exists, so they are looked up once per run
+       self.mint_decimals = {}
+       # Wallets whose token accounts, account info or mint decimals could not be read
+       self.token_lookup_failures = set()
+       self.info_lookup_failures = set()
+       self.decimals_lookup_failures = set()
+       # Mints whose decimals lookup errored, as opposed to ones without decimals
+       self.failed_mints = set()
+       self.max_in_flight = max(1, int(max_in_flight))
+       self.batch_size = max(1, min(int(batch_size), MAX_MULTIPLE_ACCOUNTS))
+       self.client = SolanaRpcClient(rpc_url, pool_size=self.max_in_flight, max_batch_size=self.batch_size,
+                                     cache=cache, rate=rate, max_retries=max_retries)
+       self.rpc_url = self.client.rpc_url
 
    def get_wallet_info(self, wallet_address):
        """Get basic wallet information"""
-       payload = {
-           "jsonrpc": "2.0",
-           "id": "1",
-           "method": "getAccountInfo",
-           "params": [
+       try:
+           return self.client.call("getAccountInfo", [
                wallet_address,
                {"encoding": "jsonParsed"}
-           ]
-       }
-       
-       try:
-           response = self.session.post(self.rpc_url, json=payload)
-           return response.json() if response.status_code == 200 else None
+           ])
        except Exception as e:
            logger.error(f"Error fetching wallet info: {str(e)}")
+           self.info_lookup_failures.add(wallet_address)
            return None
 
-   def get_token_accounts(self, wallet_address):
-       """Get token accounts owned by wallet"""
-       payload = {
-           "jsonrpc": "2.0",
-           "id": "1",
-           "method": "getTokenAccountsByOwner",
-           "params": [
-               wallet_address,
-               {
-                   "programId": "TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA"
-               },
-               {"encoding": "jsonParsed"}
-           ]
-       }
-       
+   def get_wallet_infos(self, wallet_addresses):
+       """Get basic wallet information for many wallets via getMultipleAccounts"""
+       responses = self.client.get_multiple_accounts(wallet_addresses, {"encoding": "jsonParsed"})
+       self.info_lookup_failures.update(
+           wallet for wallet in wallet_addresses if 'result' not in (responses.get(wallet) or {})
+       )
+       return responses
+
+   def fetch_token_accounts(self, wallet_address):
+       """Token accounts owned by wallet under both token programs, not yet scaled
+
+       Both programs are queried in one JSON-RPC batch. With base64 encoding
+       only the mint and amount bytes of each account are transferred and
+       decoded in bulk, giving {'token_count', 'mints', 'amounts'} with raw
+       amounts; jsonParsed keeps the verbose path and gives finished
+       {'token_count', 'holdings'}. None when neither program could be queried.
+       """
        try:
-           response = self.session.post(self.rpc_url, json=payload)
-           return response.json() if response.status_code == 200 else None
+           responses = self.client.batch_call([
+               ("getTokenAccountsByOwner", token_accounts_params(wallet_address, program, self.encoding))
+               for program in TOKEN_PROGRAMS
+           ])
+           if not any(response and 'result' in response for response in responses):
+               self.token_lookup_failures.add(wallet_address)
+               return None
+           if self.encoding == 'jsonParsed':
+               token_count, holdings = decode_parsed_accounts(responses)
+               return {'token_count': token_count, 'holdings': holdings}
+           token_count, mints, amounts = decode_sliced_accounts(responses)
+           return {'token_count': token_count, 'mints': mints, 'amounts': amounts}
        except Exception as e:
            logger.error(f"Error fetching token accounts: {str(e)}")
+           self.token_lookup_failures.add(wallet_address)
            return None
 
-   def analyze_wallet_activity(self, wallet_address, pnl):
-       """Comprehensive wallet analysis"""
-       wallet_info = self.get_wallet_info(wallet_address)
-       token_data = self.get_token_accounts(wallet_address)
+   def resolve_token_accounts(self, token_data, wallet_address=None):
+       """Scale raw amounts by their mint's decimals, looking up any not known yet"""
+       if not token_data or 'holdings' in token_data:
+           return token_data
+       mints = held_mints(token_data)
+       decimals = self.get_mint_decimals(mints)
+       if wallet_address is not None and not self.failed_mints.isdisjoint(mints):
+           self.decimals_lookup_failures.add(wallet_address)
+       return {'token_count': token_data['token_count'],
+               'holdings': sliced_holdings(token_data['mints'], token_data['amounts'], decimals)}
+
+   def get_token_accounts(self, wallet_address):
+       """Token account count and holdings of a wallet, or None when the lookup failed"""
+       return self.resolve_token_accounts(self.fetch_token_accounts(wallet_address), wallet_address)
+
+   def get_token_accounts_many(self, wallet_addresses):
+       """{wallet: token accounts}, with one decimals lookup for all their new mints"""
+       fetched = {wallet: self.fetch_token_accounts(wallet) for wallet in wallet_addresses}
+       self.get_mint_decimals(mint for token_data in fetched.values() for mint in held_mints(token_data))
+       return {wallet: self.resolve_token_accounts(token_data, wallet) for wallet, token_data in fetched.items()}
+
+   def get_mint_decimals(self, mints):
+       """Decimals of each mint, fetching only the ones not seen yet"""
+       unknown = [mint for mint in dict.fromkeys(mints) if mint not in self.mint_decimals]
+       if unknown:
+           try:
+               responses = self.client.get_multiple_accounts(
+                   unknown, {"encoding": "base64", "dataSlice": MINT_DECIMALS_SLICE}
+               )
+           except Exception as e:
+               logger.error(f"Error fetching decimals of {len(unknown)} mints: {str(e)}")
+               responses = {}
+           for mint in unknown:
+               response = responses.get(mint)
+               decimals = decode_mint_decimals(response)
+               if decimals is None:
+                   logger.warning(f"No decimals for mint {mint}, leaving its balances out")
+                   if 'result' not in (response or {}):
+                       self.failed_mints.add(mint)
+               else:
+                   self.mint_decimals[mint] = decimals
+                   self.failed_mints.discard(mint)
+       return self.mint_decimals
+
+   def analyze_wallet_activity(self, wallet_address, pnl, wallet_info=None, token_data=None, fetch=True):
+       """Comprehensive wallet analysis
+
+       When fetch is True the RPC responses are requested here, otherwise the
+       pre-fetched wallet_info and token_data are analyzed as given.
+       """
+       if fetch:
+           wallet_info = self.get_wallet_info(wallet_address)
+           token_data = self.get_token_accounts(wallet_address)
 
        analysis = {
            'wallet': wallet_address,
@@ -86,19 +158,9 @@ class WalletAnalyzer:
        }
 
        # Analyze token holdings
-       if token_data and 'result' in token_data:
-           token_accounts = token_data['result'].get('value', [])
-           analysis['token_count'] = len(token_accounts)
-           
-           # Extract token information
-           for account in token_accounts:
-               if 'parsed' in account.get('account', {}).get('data', {}):
-                   token_info = account['account']['data']['parsed']['info']
-                   if float(token_info.get('tokenAmount', {}).get('uiAmount', 0)) > 0:
-                       analysis['token_holdings'].append({
-                           'mint': token_info.get('mint'),
-                           'amount': token_info.get('tokenAmount', {}).get('uiAmount', 0)
-                       })
+       if token_data:
+           analysis['token_count'] = token_data['token_count']
+           analysis['token_holdings'] = token_data['holdings']
 
        # Categorize wallet behavior
        analysis['wallet_type'] = self._determine_wallet_type(analysis)
@@ -106,6 +168,107 @@ class WalletAnalyzer:
 
        return analysis
 
+   def analyze_wallets_concurrently(self, wallets):
+       """Fetch and analyze wallets through a bounded thread pool
+
+       Wallet infos are requested in getMultipleAccounts chunks of batch_size
+       and token accounts per wallet, and once a chunk's token accounts are in,
+       the decimals of their new mints in one lookup, all on the same pool with
+       at most max_in_flight requests running at once. Yields (index, wallet,
+       analysis, error) tuples in completion order rather than input order.
+       """
+       chunk_iter = enumerate(chunked(enumerate(wallets), self.batch_size))
+       pending = {}
+       partial = {}
+       chunk_infos = {}
+       chunk_remaining = {}
+       chunk_unfetched = {}
+       chunk_resolved = set()
+
+       def ready(idx):
+           entry = partial[idx]
+           return 'token_data' in entry and entry['chunk'] in chunk_infos and entry['chunk'] in chunk_resolved
+
+       with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+           def submit_next():
+               try:
+                   chunk_id, chunk = next(chunk_iter)
+               except StopIteration:
+                   return False
+               chunk_wallets = []
+               for idx, (wallet, pnl) in chunk:
+                   partial[idx] = {'wallet': wallet, 'pnl': pnl, 'chunk': chunk_id}
+                   pending[pool.submit(self.fetch_token_accounts, wallet)] = ('token_data', idx)
+                   chunk_wallets.append(wallet)
+               pending[pool.submit(self.get_wallet_infos, chunk_wallets)] = ('wallet_infos', chunk_id)
+               chunk_remaining[chunk_id] = chunk_unfetched[chunk_id] = len(chunk_wallets)
+               return True
+
+           # Keep the pool fed without queueing the whole wallet list up front
+           while len(pending) < 2 * self.max_in_flight and submit_next():
+               pass
+
+           while pending:
+               done, _ = wait(pending, return_when=FIRST_COMPLETED)
+               for future in done:
+                   kind, key = pending.pop(future)
+                   # A failed request leaves its wallets Unknown, as in the sequential path,
+                   # instead of ending the generator and dropping the finished ones
+                   try:
+                       result = future.result()
+                   except Exception as e:
+                       target = partial[key]['wallet'] if kind == 'token_data' else f"chunk {key}"
+                       logger.error(f"Error fetching {kind} of {target}: {str(e)}")
+                       result = None
+                   if kind == 'wallet_infos':
+                       if result is None:
+                           self.info_lookup_failures.update(
+                               entry['wallet'] for entry in partial.values() if entry['chunk'] == key
+                           )
+                       chunk_infos[key] = result or {}
+                       candidates = [idx for idx, entry in partial.items() if entry['chunk'] == key]
+                   elif kind == 'decimals':
+                       chunk_resolved.add(key)
+                       candidates = [idx for idx, entry in partial.items() if entry['chunk'] == key]
+                   else:
+                       entry = partial[key]
+                       if result is None:
+                           self.token_lookup_failures.add(entry['wallet'])
+                       entry['token_data'] = result
+                       chunk_unfetched[entry['chunk']] -= 1
+                       if not chunk_unfetched[entry['chunk']]:
+                           mints = [mint for other in partial.values() if other['chunk'] == entry['chunk']
+                                    for mint in held_mints(other['token_data'])]
+                           pending[pool.submit(self.get_mint_decimals, mints)] = ('decimals', entry['chunk'])
+                       candidates = []
+
+                   for idx in candidates:
+                       if not ready(idx):
+                           continue
+                       entry = partial.pop(idx)
+                       infos = chunk_infos[entry['chunk']]
+                       try:
+                           analysis = self.analyze_wallet_activity(
+                               entry['wallet'], entry['pnl'], infos.get(entry['wallet']),
+                               self.resolve_token_accounts(entry['token_data'], entry['wallet']), fetch=False
+                           )
+                           yield idx, entry['wallet'], analysis, None
+                       except Exception as e:
+                           yield idx, entry['wallet'], None, e
+
+                       # Drop chunk results once every wallet in the chunk is done
+                       chunk_remaining[entry['chunk']] -= 1
+                       if not chunk_remaining[entry['chunk']]:
+                           del chunk_remaining[entry['chunk']], chunk_infos[entry['chunk']]
+                           del chunk_unfetched[entry['chunk']]
+                           chunk_resolved.discard(entry['chunk'])
+               while len(pending) < 2 * self.max_in_flight and submit_next():
+                   pass
+
+   def carry_forward(self, record, pnl):
+       """A stored analysis of an unchanged wallet, re-categorized for today's PnL"""
+       return {**record, 'total_pnl': pnl, 'category': self._categorize_wallet(pnl)}
+
    def _categorize_wallet(self, pnl):
        if pnl > 10000000:
            return "Whale"
@@ -128,65 +291,181 @@ class WalletAnalyzer:
            return 'Unknown'
        return 'Active' if wallet_info['result'] else 'Inactive'
 
-def main():
+def fetch_wallet_details(analyzer, wallet_df, journal, output_paths=(), refresh_state=None):
+   """Analyze every wallet of wallet_df that the journal does not hold yet
+
+   Finished wallets go to the journal as they complete, which is then
+   compacted in input order and written to output_paths. With a
+   WalletRefreshState, wallets that have not transacted since their last
+   fetch are journaled from their stored analysis instead of being fetched,
+   and the state is updated and saved afterwards. Returns the compacted
+   DataFrame, the wallets that failed and how many were fetched.
+   """
+   # The daemon reuses one analyzer across runs; only this run's failures count
+   analyzer.token_lookup_failures.clear()
+   analyzer.info_lookup_failures.clear()
+   analyzer.decimals_lookup_failures.clear()
+   keys = [row_key(w, p) for w, p in zip(wallet_df['wallet'], wallet_df['total_pnl'])]
+   pending_df = wallet_df[[key not in journal for key in keys]]
+   pending_df = pending_df.drop_duplicates(subset=['wallet', 'total_pnl']).reset_index(drop=True)
+   if len(journal):
+       logger.info(f"Skipping {len(wallet_df) - len(pending_df)} wallets already journaled")
+   
+   signatures = {}
+   if refresh_state is not None and len(pending_df):
+       with metrics.timer('probe'):
+           changed, unchanged, signatures = refresh_state.probe(
+               analyzer.client, pending_df['wallet'], analyzer.batch_size
+           )
+       unchanged = set(unchanged)
+       for wallet, pnl in zip(pending_df['wallet'], pending_df['total_pnl']):
+           if wallet in unchanged:
+               journal.append(analyzer.carry_forward(refresh_state.record(wallet), pnl), key=row_key(wallet, pnl))
+       pending_df = pending_df[~pending_df['wallet'].isin(unchanged)].reset_index(drop=True)
+       metrics.count('wallets_unchanged_total', len(unchanged))
+       logger.info(refresh_state.summary())
+   
+   failed_wallets = []
+   progress = ProgressLog(logger, len(pending_df), stage='fetch')
+   fetch_timer = metrics.timer('fetch')
+   
+   if analyzer.max_in_flight > 1:
+       logger.info(f"Fetching with up to {analyzer.max_in_flight} requests in flight")
+       wallets = zip(pending_df['wallet'], pending_df['total_pnl'])
+       with fetch_timer:
+           for idx, wallet, analysis, error in analyzer.analyze_wallets_concurrently(wallets):
+               if error is not None:
+                   logger.error(f"Failed to analyze wallet {wallet}: {str(error)}")
+                   failed_wallets.append(wallet)
+               else:
+                   journal.append(analysis, key=row_key(wallet, pending_df['total_pnl'].iat[idx]))
+               progress.update()
+   else:
+       wallet_infos = {}
+       token_accounts = {}
+       with fetch_timer:
+           for idx, row in pending_df.iterrows():
+               wallet = row['wallet']
+               pnl = row['total_pnl']
+               
+               # Look up the next batch of wallet infos in a single request, and the
+               # decimals of the batch's new mints in another
+               if idx % analyzer.batch_size == 0:
+                   batch = pending_df['wallet'].iloc[idx:idx + analyzer.batch_size]
+                   wallet_infos = analyzer.get_wallet_infos(batch)
+                   token_accounts = analyzer.get_token_accounts_many(batch)
+               
+               logger.debug(f"Analyzing wallet {idx+1}/{len(pending_df)}: {wallet}")
+               
+               try:
+                   analysis = analyzer.analyze_wallet_activity(
+                       wallet, pnl, wallet_infos.get(wallet), token_accounts.get(wallet), fetch=False
+                   )
+                   journal.append(analysis, key=row_key(wallet, pnl))
+               except Exception as e:
+                   logger.error(f"Failed to analyze wallet {wallet}: {str(e)}")
+                   failed_wallets.append(wallet)
+               progress.update()
+   
+   metrics.count('wallets_failed_total', len(failed_wallets))
+   metrics.count('token_lookup_failures_total', len(analyzer.token_lookup_failures))
+   metrics.count('info_lookup_failures_total', len(analyzer.info_lookup_failures))
+   metrics.count('decimals_lookup_failures_total', len(analyzer.decimals_lookup_failures))
+   journal.close()
+   
+   if refresh_state is not None:
+       # Wallets with any lookup that failed are probed again next run
+       skipped = (set(failed_wallets) | analyzer.token_lookup_failures | analyzer.info_lookup_failures
+                  | analyzer.decimals_lookup_failures)
+       fetched = [journal.get(row_key(wallet, pnl))
+                  for wallet, pnl in zip(pending_df['wallet'], pending_df['total_pnl']) if wallet not in skipped]
+       refresh_state.update([record for record in fetched if record], signatures)
+       refresh_state.save()
+   
+   # Compact the journal into the final outputs, in input order
+   with metrics.timer('compact'):
+       final_df = journal.compact(order=keys, output_paths=output_paths)
+   return final_df, failed_wallets, len(pending_df)
+
+def parse_args(argv=None):
+   parser = argparse.ArgumentParser(description="Fetch token holdings for profitable wallets")
+   parser.add_argument('--input', default=os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv'),
+                       help="CSV with wallet and total_pnl columns")
+   parser.add_argument('--max-in-flight', type=int, default=1,
+                       help="Concurrent RPC requests (1 keeps the sequential loop)")
+   parser.add_argument('--batch-size', type=int, default=MAX_MULTIPLE_ACCOUNTS,
+                       help="Wallets per getMultipleAccounts lookup (max 100)")
+   parser.add_argument('--resume', action='store_true',
+                       help="Skip wallets already recorded in the journal by an interrupted run")
+   parser.add_argument('--incremental', action='store_true',
+                       help="Probe each wallet's latest signature and only refetch wallets that transacted")
+   parser.add_argument('--refresh-max-age', type=int, default=DEFAULT_MAX_AGE_DAYS, metavar='DAYS',
+                       help="With --incremental, refetch wallets last fetched this many days ago anyway")
+   parser.add_argument('--account-encoding', choices=ENCODINGS, default='base64',
+                       help="Fetch token accounts as sliced base64 (fast) or jsonParsed")
+   add_rpc_arguments(parser, DEFAULT_RPC_URL)
+   add_cache_arguments(parser)
+   add_instrumentation_arguments(parser)
+   return parser.parse_args(argv)
+
+def main(argv=None):
    try:
-       analyzer = WalletAnalyzer()
-       
-       # Load wallet data
-       input_file = os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv')
-       wallet_df = pd.read_csv(input_file)
-       logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
-       
-       analyses = []
-       failed_wallets = []
-       
-       for idx, row in wallet_df.iterrows():
-           wallet = row['wallet']
-           pnl = row['total_pnl']
-           
-           logger.info(f"Analyzing wallet {idx+1}/{len(wallet_df)}: {wallet}")
-           
-           try:
-               analysis = analyzer.analyze_wallet_activity(wallet, pnl)
-               analyses.append(analysis)
-           except Exception as e:
-               logger.error(f"Failed to analyze wallet {wallet}: {str(e)}")
-               failed_wallets.append(wallet)
-           
-           # Save progress every 10 wallets
-           if (idx + 1) % 10 == 0:
-               progress_df = pd.DataFrame(analyses)
-               progress_df.to_csv(os.path.join(DATA_DIR, 'analysis_progress.csv'), index=False)
-               logger.info(f"Progress saved: {idx+1}/{len(wallet_df)} wallets analyzed")
-           
-           # Rate limiting
-           time.sleep(0.1)
-       
-       # Save final results
-       final_df = pd.DataFrame(analyses)
-       final_df.to_csv(os.path.join(DATA_DIR, 'wallet_analysis_final.csv'), index=False)
-       
-       if failed_wallets:
-           with open(os.path.join(DATA_DIR, 'failed_wallets.txt'), 'w') as f:
-               f.write('\n'.join(failed_wallets))
-       
-       # Print summary
-       print("\nAnalysis Summary:")
-       print(f"Total wallets analyzed: {len(final_df)}")
-       print(f"Failed analyses: {len(failed_wallets)}")
-       
-       print("\nWallet Categories:")
-       print(final_df['category'].value_counts())
-       
-       print("\nWallet Types:")
-       print(final_df['wallet_type'].value_counts())
-       
-       print("\nBalance Status:")
-       print(final_df['balance_status'].value_counts())
-       
-       print("\nToken Statistics:")
-       print(f"Average tokens per wallet: {final_df['token_count'].mean():.2f}")
-       print(f"Max tokens in a wallet: {final_df['token_count'].max()}")
+       args = parse_args(argv)
+       with instrumented('wallet_details', args):
+          cache = open_cache(args)
+          analyzer = WalletAnalyzer(rpc_url=args.rpc_url, max_in_flight=args.max_in_flight,
+                                    batch_size=args.batch_size, cache=cache, rate=args.rpc_rate,
+                                    max_retries=args.rpc_retries, encoding=args.account_encoding)
+          
+          # Load wallet data
+          wallet_df = pd.read_csv(args.input)
+          logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
+          
+          # Wallets finished by an earlier, interrupted run are skipped on --resume
+          journal = WalletJournal(JOURNAL_FILE, resume=args.resume)
+          refresh_state = WalletRefreshState(max_age_days=args.refresh_max_age) if args.incremental else None
+          start_time = time.time()
+          final_df, failed_wallets, processed = fetch_wallet_details(
+              analyzer, wallet_df, journal,
+              output_paths=[
+                  os.path.join(DATA_DIR, 'wallet_analysis_final.csv'),
+                  os.path.join(DATA_DIR, 'analysis_progress.csv')
+              ],
+              refresh_state=refresh_state
+          )
+          elapsed = time.time() - start_time
+          with metrics.timer('write_holdings'):
+              write_holdings(holdings_frame(final_df.to_dict('records'), datetime.now().strftime('%Y-%m-%d')))
+          
+          if failed_wallets:
+              with open(os.path.join(DATA_DIR, 'failed_wallets.txt'), 'w') as f:
+                  f.write('\n'.join(failed_wallets))
+          
+          # Print summary
+          print("\nAnalysis Summary:")
+          print(f"Total wallets analyzed: {len(final_df)}")
+          print(f"Failed analyses: {len(failed_wallets)}")
+          print(f"RPC requests sent: {analyzer.client.request_count}")
+          print(analyzer.client.endpoints.summary())
+          if refresh_state is not None:
+              print(refresh_state.summary())
+          if cache is not None:
+              print(cache.summary())
+              cache.close()
+          print(f"Throughput: {processed / elapsed if elapsed else 0:.1f} wallets/sec")
+          
+          print("\nWallet Categories:")
+          print(final_df['category'].value_counts())
+          
+          print("\nWallet Types:")
+          print(final_df['wallet_type'].value_counts())
+          
+          print("\nBalance Status:")
+          print(final_df['balance_status'].value_counts())
+          
+          print("\nToken Statistics:")
+          print(f"Average tokens per wallet: {final_df['token_count'].mean():.2f}")
+          print(f"Max tokens in a wallet: {final_df['token_count'].max()}")
        
    except Exception as e:
        logger.error(f"Analysis failed: {str(e)}")
@@ -1,31 +1,24 @@
 import os
 import pandas as pd
-import requests
 import logging
+import argparse
 from datetime import datetime
+from holdings_store import load_holdings, holdings_by_wallet
+from sharding import run_sharded, DEFAULT_CHUNK_SIZE
+from label_rules import default_rules
+from instrumentation import configure_logging, ProgressLog, instrumented, add_instrumentation_arguments
 
 # Setup
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(DATA_DIR, 'wallet_labeling.log')),
-        logging.StreamHandler()
-    ]
-)
+configure_logging(os.path.join(DATA_DIR, 'wallet_labeling.log'))
 logger = logging.getLogger(__name__)
 
 class WalletLabeler:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json'
-        })
-        self.rpc_url = "https://api.mainnet-beta.solana.com"
+    def __init__(self, rules=None):
+        self.rules = rules or default_rules()
 
     def analyze_token_holdings(self, token_data):
         """Analyze token holdings for patterns"""
@@ -36,17 +29,15 @@ class WalletLabeler:
         tokens = token_data['token_holdings']
         
         # Look for specific patterns in token names
-        pump_tokens = [t for t in tokens if 'pump' in str(t['mint']).lower()]
-        meme_tokens = [t for t in tokens if any(x in str(t['mint']).lower() for x in ['pepe', 'doge', 'shib', 'wojak', 'chad'])]
+        counts = self.rules.match_counts(t['mint'] for t in tokens)
         
-        if pump_tokens:
-            patterns.append(f"Pump Trader ({len(pump_tokens)} tokens)")
-        if meme_tokens:
-            patterns.append(f"Meme Trader ({len(meme_tokens)} tokens)")
-        if len(tokens) > 100:
-            patterns.append("Heavy Diversification")
-        elif len(tokens) > 50:
-            patterns.append("Moderate Diversification")
+        if counts['pump']:
+            patterns.append(f"Pump Trader ({counts['pump']} tokens)")
+        if counts['meme']:
+            patterns.append(f"Meme Trader ({counts['meme']} tokens)")
+        diversification = self.rules.tier('labeler_diversification', len(tokens))
+        if diversification:
+            patterns.append(diversification)
         
         return patterns
 
@@ -56,22 +47,13 @@ class WalletLabeler:
         
         # Category based on PNL
         pnl = float(wallet_data['total_pnl'])
-        if pnl > 10000000:
-            labels.append("Mega Whale")
-        elif pnl > 5000000:
-            labels.append("Whale")
-        else:
-            labels.append("Large Trader")
-
-        # Token count based categorization
+        labels.append(self.rules.tier('pnl_category', pnl))
+
+        # Token count based categorization, none for an empty wallet
         token_count = len(wallet_data.get('token_holdings', []))
-        if token_count > 0:
-            if token_count > 100:
-                labels.append("Portfolio Manager")
-            elif token_count > 50:
-                labels.append("Active Trader")
-            else:
-                labels.append("Focused Trader")
+        style = self.rules.tier('labeler_style', token_count)
+        if style:
+            labels.append(style)
 
         # Check for specific trading patterns
         if 'token_holdings' in wallet_data:
@@ -80,29 +62,22 @@ class WalletLabeler:
 
         return labels
 
-def main():
-    try:
-        # Load original data
-        input_file = os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv')
-        wallet_df = pd.read_csv(input_file)
-        logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
-
-        # Create new labeling structure
+    def label_wallets(self, wallet_df, wallet_holdings):
+        """Label every wallet of wallet_df given its {wallet: holdings} lookup"""
         labeled_wallets = []
-        labeler = WalletLabeler()
-
-        for idx, row in wallet_df.iterrows():
+        progress = ProgressLog(logger, len(wallet_df), stage='label')
+        for idx, row in wallet_df.reset_index(drop=True).iterrows():
             wallet_address = row['wallet']
-            logger.info(f"Analyzing wallet {idx+1}/{len(wallet_df)}: {wallet_address}")
+            logger.debug(f"Analyzing wallet {idx+1}/{len(wallet_df)}: {wallet_address}")
 
             wallet_data = {
                 'wallet': wallet_address,
                 'total_pnl': row['total_pnl'],
-                'token_holdings': eval(row.get('token_holdings', '[]')) if 'token_holdings' in row else []
+                'token_holdings': wallet_holdings.get(wallet_address, [])
             }
 
             # Get detailed labels
-            labels = labeler.get_detailed_labels(wallet_data)
+            labels = self.get_detailed_labels(wallet_data)
 
             labeled_wallet = {
                 'wallet_address': wallet_address,
@@ -114,22 +89,51 @@ def main():
                 'detailed_labels': ' | '.join(labels)
             }
             labeled_wallets.append(labeled_wallet)
+            progress.update()
 
-        # Create and save new labeled dataset
-        labeled_df = pd.DataFrame(labeled_wallets)
-        output_file = os.path.join(DATA_DIR, 'labeled_wallets_detailed.csv')
-        labeled_df.to_csv(output_file, index=False)
-
-        # Print summary statistics
-        print("\nLabeling Summary:")
-        print(f"Total wallets labeled: {len(labeled_df)}")
-        print("\nPrimary Categories:")
-        print(labeled_df['primary_category'].value_counts())
-        print("\nTrading Styles:")
-        print(labeled_df['trading_style'].value_counts())
-        print("\nMost Common Patterns:")
-        pattern_series = labeled_df['patterns'].str.split(', ').explode()
-        print(pattern_series.value_counts().head())
+        return pd.DataFrame(labeled_wallets)
+
+def label_chunk(wallet_df, holdings):
+    """Labels for one shard of wallets, run inside a worker process"""
+    return WalletLabeler().label_wallets(wallet_df, holdings_by_wallet(holdings))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Label profitable wallets by holdings")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes to shard the wallets across (1 runs in this process)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="Wallets per shard")
+    add_instrumentation_arguments(parser)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        with instrumented('wallet_labeler', args):
+            # Load original data
+            input_file = os.path.join(DATA_DIR, 'profitable_wallets_over_1M.csv')
+            wallet_df = pd.read_csv(input_file)
+            logger.info(f"Loaded {len(wallet_df)} wallets for analysis")
+            holdings = load_holdings(wallet_df)
+
+            # Create and save new labeled dataset
+            if args.workers > 1:
+                labeled_df = run_sharded(label_chunk, wallet_df, holdings, args.workers, args.chunk_size)
+            else:
+                labeler = WalletLabeler()
+                labeled_df = labeler.label_wallets(wallet_df, holdings_by_wallet(holdings))
+            output_file = os.path.join(DATA_DIR, 'labeled_wallets_detailed.csv')
+            labeled_df.to_csv(output_file, index=False)
+
+            # Print summary statistics
+            print("\nLabeling Summary:")
+            print(f"Total wallets labeled: {len(labeled_df)}")
+            print("\nPrimary Categories:")
+            print(labeled_df['primary_category'].value_counts())
+            print("\nTrading Styles:")
+            print(labeled_df['trading_style'].value_counts())
+            print("\nMost Common Patterns:")
+            pattern_series = labeled_df['patterns'].str.split(', ').explode()
+            print(pattern_series.value_counts().head())
 
     except Exception as e:
         logger.error(f"Analysis failed: {str(e)}")
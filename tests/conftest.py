@@ -0,0 +1,10 @@
+import os
+import sys
+import logging
+
+# The scripts are flat modules that import each other by name
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts'))
+
+# Scripts set up their log files on import unless the root logger already
+# has a handler; keep test runs out of data/ and traders/
+logging.getLogger().addHandler(logging.NullHandler())
@@ -0,0 +1,36 @@
+import pandas as pd
+from synthetic_data import synthetic_trades
+from get_millionaires import MillionaireTracker
+from snapshot_store import SnapshotStore
+from pnl_stats import StatsRollup
+from daemon import Daemon, parse_args
+from pipeline import load_wallets
+
+
+def test_pipeline_reads_the_track_job(tmp_path):
+    trades_path = tmp_path / 'trades.parquet'
+    synthetic_trades(2000, seed=11).to_parquet(trades_path)
+    daemon = Daemon(parse_args(['--trades', str(trades_path), '--metrics-dir', 'off',
+                                '--input', str(tmp_path / 'missing.csv')]))
+    tracker = MillionaireTracker(snapshots=SnapshotStore(str(tmp_path / 'snapshots')),
+                                 rollup=StatsRollup(str(tmp_path / 'stats_rollup.json')))
+    tracker.history_file = str(tmp_path / 'millionaire_history.csv')
+    tracker.current_file = str(tmp_path / 'current_millionaires.csv')
+    tracker.stats_file = str(tmp_path / 'tracker_statistics.json')
+    tracker.ingest_state_file = str(tmp_path / 'ingest_state.json')
+    daemon.pipeline._tracker = tracker
+    runs = []
+    update_tracking = tracker.update_tracking
+    tracker.update_tracking = lambda: runs.append(1) or update_tracking()
+
+    assert daemon.run_track()['new_data']
+    wallets = load_wallets(daemon.pipeline)['wallets']
+    current = pd.read_csv(tracker.current_file)
+    assert len(runs) == 1
+    assert sorted(wallets['wallet']) == sorted(current['wallet'])
+
+    # A daemon restarted before its next track job picks up the tracker's file
+    daemon.pipeline.tracked = None
+    restarted = load_wallets(daemon.pipeline)['wallets']
+    assert sorted(restarted['wallet']) == sorted(current['wallet'])
+    assert len(runs) == 1
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from get_millionaires import MillionaireTracker
+from mock_dune import LocalDuneClient
+
+
+@pytest.fixture
+def rows():
+    # One row per wallet and token, with each wallet's tokens spread across pages
+    rng = np.random.default_rng(9)
+    wallets = [f"wallet{i:03d}" for i in range(40)]
+    return pd.DataFrame({
+        'wallet': rng.choice(wallets, 500),
+        'token': [f"mint{i}" for i in range(500)],
+        'total_pnl': rng.uniform(-2e5, 6e5, 500).round(2)
+    })
+
+
+def tracker(rows, tmp_path, page_size):
+    tracker = MillionaireTracker(dune=LocalDuneClient(rows), page_size=page_size, force=True)
+    tracker.ingest_state_file = str(tmp_path / 'ingest_state.json')
+    return tracker
+
+
+def test_pages_fold_into_per_wallet_totals(rows, tmp_path):
+    expected = rows.groupby('wallet')['total_pnl'].sum()
+    current = tracker(rows, tmp_path, page_size=37).fetch_current_data()
+    assert current['wallet'].is_unique
+    assert current['total_pnl'].is_monotonic_decreasing
+    pd.testing.assert_series_equal(current.set_index('wallet')['total_pnl'].sort_index(), expected)
+    single_page = tracker(rows, tmp_path, page_size=len(rows)).fetch_current_data()
+    pd.testing.assert_series_equal(single_page.set_index('wallet')['total_pnl'].sort_index(), expected)
+
+
+def test_ingest_state_counts_rows_not_wallets(rows, tmp_path):
+    millionaires = tracker(rows, tmp_path, page_size=64)
+    millionaires.fetch_current_data()
+    assert millionaires.pending_ingest_state['row_count'] == len(rows)
+
+
+def test_merge_history_takes_the_aggregate(rows, tmp_path):
+    millionaires = tracker(rows, tmp_path, page_size=64)
+    current = millionaires.fetch_current_data()
+    history = pd.DataFrame({'wallet': ['wallet000', 'gone'], 'total_pnl': [1.0, 2.0],
+                            'first_seen': ['2024-12-01', '2024-12-01'], 'last_seen': ['2024-12-01', '2024-12-01']})
+    merged = millionaires.merge_history(history, current, '2024-12-05').set_index('wallet')
+    # Raw rows and their per-wallet totals merge to the same history
+    raw = millionaires.merge_history(history, rows, '2024-12-05').set_index('wallet')
+    pd.testing.assert_frame_equal(merged.sort_index(), raw.sort_index())
+    assert merged.loc['wallet000', 'first_seen'] == '2024-12-01'
+    assert merged.loc['gone', 'total_pnl'] == 2.0
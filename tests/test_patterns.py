@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from patterns import WalletPatternAnalyzer
+
+
+def holdings_of(wallet, mints, amounts):
+    return pd.DataFrame({'wallet': wallet, 'mint': mints, 'amount': amounts})
+
+
+@pytest.fixture
+def fixture():
+    """Wallets around every tier edge and pattern threshold"""
+    rows = [
+        ('pump_and_meme', 12000000.0),
+        ('no_holdings', 1000000.0),           # missing from the holdings table
+        ('pnl_at_whale_edge', 5000000.0),
+        ('pnl_above_whale_edge', 5000000.01),
+        ('pnl_at_mega_edge', 10000000.0),
+        ('five_tokens', 7000000.0),
+        ('six_tokens', 7000000.0),
+        ('twenty_tokens', 2000000.0),
+        ('fifty_tokens', 2000000.0),
+        ('hundred_tokens', 2000000.0),
+        ('hundred_one_tokens', 2000000.0),
+        ('whale_amounts', 3000000.0),
+        ('pump_and_meme', 12000000.0),        # the same wallet listed twice
+    ]
+    df = pd.DataFrame(rows, columns=['wallet', 'total_pnl'])
+    frames = [
+        holdings_of('pump_and_meme', ['AbCpump', 'PepeCoin', 'xDOGEx', 'plain', 'SHIBpump'],
+                    [1500.5, 20.0, 1000000.0, 3.0, 2500000.25]),
+        holdings_of('pnl_at_whale_edge', ['m1'], [1.0]),
+        holdings_of('pnl_above_whale_edge', ['m1', 'm2'], [1.0, 2.0]),
+        holdings_of('pnl_at_mega_edge', ['wojakpump'], [999999.99]),
+        # Amounts exactly at the whale threshold are not whale positions
+        holdings_of('whale_amounts', ['w1', 'w2', 'w3pump'], [1000000.0, 1000000.01, 5e8]),
+    ]
+    for wallet, count in [('five_tokens', 5), ('six_tokens', 6), ('twenty_tokens', 20), ('fifty_tokens', 50),
+                          ('hundred_tokens', 100), ('hundred_one_tokens', 101)]:
+        mints = [f'{wallet}_{i}' + ('pump' if i % 3 == 0 else '') for i in range(count)]
+        frames.append(holdings_of(wallet, mints, np.linspace(0.5, 2e6, count)))
+    return df, pd.concat(frames, ignore_index=True)
+
+
+def assert_same_profiles(df, holdings):
+    analyzer = WalletPatternAnalyzer()
+    pd.testing.assert_frame_equal(analyzer.analyze_frame(df, holdings), analyzer.analyze_rows(df, holdings))
+
+
+def test_frame_matches_rows_at_boundaries(fixture):
+    df, holdings = fixture
+    assert_same_profiles(df, holdings)
+
+
+def test_frame_matches_rows_with_categorical_holdings(fixture):
+    df, holdings = fixture
+    holdings = holdings.astype({'wallet': 'category', 'mint': 'category'})
+    assert_same_profiles(df, holdings)
+
+
+def test_frame_matches_rows_without_holdings(fixture):
+    df, holdings = fixture
+    assert_same_profiles(df, holdings.iloc[:0])
+
+
+def test_frame_matches_rows_on_random_wallets():
+    rng = np.random.default_rng(7)
+    df = pd.DataFrame({
+        'wallet': [f'wallet{i}' for i in range(3000)],
+        'total_pnl': np.round(1e6 * (1 + rng.pareto(1.5, 3000)), 2)
+    })
+    counts = np.minimum((rng.pareto(1.5, len(df)) * 8).astype(int), 150)
+    words = rng.choice(['mint', 'pump', 'Pepe', 'DOGE', 'shib', 'wojak', 'chad', 'elon'], 800)
+    mints = np.char.add(words, np.arange(800).astype(str))
+    holdings = pd.DataFrame({
+        'wallet': np.repeat(df['wallet'].to_numpy(), counts),
+        'mint': mints[np.minimum(rng.zipf(1.3, counts.sum()), len(mints)) - 1],
+        'amount': np.round(10 ** rng.uniform(0, 9, counts.sum()), 6)
+    })
+    assert_same_profiles(df, holdings)
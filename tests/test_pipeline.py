@@ -0,0 +1,39 @@
+import argparse
+import pandas as pd
+from holdings_store import holdings_frame
+from pipeline import Pipeline, Stage
+
+
+def details_stages(calls):
+    analyses = [{'wallet': 'w1', 'total_pnl': 2e6, 'token_holdings': [{'mint': 'm1', 'amount': 5.0}]},
+                {'wallet': 'w2', 'total_pnl': 3e6, 'token_holdings': []}]
+
+    def load(pipeline):
+        return {'wallets': pd.DataFrame({'wallet': ['w1', 'w2'], 'total_pnl': [2e6, 3e6]})}
+
+    def details(pipeline, wallets):
+        calls.append(len(wallets))
+        return {'analysis': pd.DataFrame(analyses).drop(columns=['token_holdings']),
+                'holdings': holdings_frame(analyses, '2026-01-01')}
+
+    return [Stage('wallets', load, outputs=['wallets'], volatile=True),
+            Stage('details', details, {'wallets': 'wallets.wallets'}, ['analysis', 'holdings'],
+                  volatile=lambda options: options.incremental)]
+
+
+def test_details_reruns_under_incremental(tmp_path):
+    calls = []
+    for incremental, expected in [(False, 1), (False, 1), (True, 2)]:
+        pipeline = Pipeline(details_stages(calls), options=argparse.Namespace(incremental=incremental),
+                            cache_dir=str(tmp_path / 'pipeline'))
+        pipeline.run()
+        assert len(calls) == expected
+
+
+def test_legacy_analysis_export_keeps_token_holdings(tmp_path):
+    pipeline = Pipeline(details_stages([]), options=argparse.Namespace(incremental=False),
+                        cache_dir=str(tmp_path / 'pipeline'))
+    pipeline.run()
+    pipeline.export(exports={'details.analysis': ['wallet_analysis_final.csv']}, data_dir=str(tmp_path))
+    exported = pd.read_csv(tmp_path / 'wallet_analysis_final.csv')
+    assert list(exported['token_holdings']) == ["[{'mint': 'm1', 'amount': 5.0}]", '[]']
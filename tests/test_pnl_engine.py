@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import pandas as pd
+import pytest
+from synthetic_data import synthetic_trades
+from pnl_engine import profitable_wallets, BASE_DIR
+from pnl_stream import PnlAccumulator
+from get_millionaires import MillionaireTracker
+from mock_dune import LocalDuneClient
+from snapshot_store import SnapshotStore
+from pnl_stats import StatsRollup
+
+QUERY = os.path.join(BASE_DIR, 'queries', 'pumpfun_profitable_wallets.sql')
+# Thresholds from every wallet and token pair down to the query's own $1M
+THRESHOLDS = [-1e12, 0, 1e5, 1e6]
+
+
+@pytest.fixture(scope='module')
+def trades():
+    return synthetic_trades(4000, seed=5)
+
+
+@pytest.fixture(scope='module')
+def trades_path(trades, tmp_path_factory):
+    path = tmp_path_factory.mktemp('trades') / 'trades.parquet'
+    trades.to_parquet(path)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def query(trades):
+    """The Dune query run by SQLite over the same trades, as f(min_pnl)"""
+    with open(QUERY) as f:
+        sql = f.read()
+    # SQLite's LIKE is already case-insensitive for ASCII
+    sql = (sql.replace('dex_solana.trades', 'trades').replace('ILIKE', 'LIKE')
+              .replace('total_pnl > 1000000', 'total_pnl > :min_pnl'))
+    connection = sqlite3.connect(':memory:')
+    trades.assign(block_time=trades['block_time'].dt.strftime('%Y-%m-%d %H:%M:%S')).to_sql(
+        'trades', connection, index=False)
+    yield lambda min_pnl: pd.read_sql_query(sql, connection, params={'min_pnl': min_pnl})
+    connection.close()
+
+
+def by_wallet(df):
+    """Rows in a fixed order, as the query leaves ties in total_pnl unordered"""
+    return df.sort_values(['wallet', 'total_pnl']).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('min_pnl', THRESHOLDS)
+def test_engine_matches_the_query(trades_path, query, min_pnl):
+    expected = query(min_pnl)
+    result = profitable_wallets(trades_path, min_pnl=min_pnl)
+    assert len(expected)
+    assert result['total_pnl'].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(by_wallet(result), by_wallet(expected), check_dtype=False)
+
+
+@pytest.mark.parametrize('min_pnl', THRESHOLDS)
+def test_stream_matches_the_engine(trades, trades_path, min_pnl):
+    accumulator = PnlAccumulator(min_pnl=min_pnl)
+    # Fed in two halves, valued between them
+    records = trades.to_dict('records')
+    accumulator.add_trades(records[:len(records) // 2])
+    accumulator.crossings()
+    accumulator.add_trades(records[len(records) // 2:])
+    pd.testing.assert_frame_equal(by_wallet(accumulator.millionaires()),
+                                  by_wallet(profitable_wallets(trades_path, min_pnl=min_pnl)))
+
+
+def test_tracker_runs_offline_on_the_engine(trades_path, query, tmp_path):
+    tracker = MillionaireTracker(dune=LocalDuneClient(profitable_wallets(trades_path)), page_size=7,
+                                 snapshots=SnapshotStore(str(tmp_path / 'snapshots')),
+                                 rollup=StatsRollup(str(tmp_path / 'stats_rollup.json')))
+    tracker.history_file = str(tmp_path / 'millionaire_history.csv')
+    tracker.current_file = str(tmp_path / 'current_millionaires.csv')
+    tracker.stats_file = str(tmp_path / 'tracker_statistics.json')
+    tracker.ingest_state_file = str(tmp_path / 'ingest_state.json')
+
+    millionaires = tracker.update_tracking()
+    expected = query(1e6).groupby('wallet')['total_pnl'].sum()
+    expected = expected[expected > 1e6]
+    pd.testing.assert_series_equal(millionaires.set_index('wallet')['total_pnl'].sort_index(), expected)
+    saved = pd.read_csv(tracker.current_file)
+    assert sorted(saved['wallet']) == sorted(expected.index)
+    history = pd.read_csv(tracker.history_file)
+    assert sorted(history['wallet']) == sorted(expected.index)
+    # The same execution again is skipped
+    assert tracker.update_tracking() is None
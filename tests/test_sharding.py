@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from sharding import run_sharded
+
+
+def holdings_per_row(df, holdings):
+    counts = holdings['wallet'].astype(str).value_counts()
+    return pd.DataFrame({'wallet': df['wallet'].to_numpy(), 'pnl': df['pnl'].to_numpy(),
+                         'holdings': counts.reindex(df['wallet']).fillna(0).astype(int).to_numpy()})
+
+
+def shipped_rows(df, holdings):
+    return holdings.index.to_numpy()
+
+
+def test_repeated_wallets_stay_in_one_chunk():
+    wallets = ['a', 'b', 'c', 'a', 'd', 'b', 'e', 'a']
+    df = pd.DataFrame({'wallet': wallets, 'pnl': np.arange(len(wallets))})
+    holdings = pd.DataFrame({'wallet': ['a', 'a', 'b', 'c', 'd', 'd', 'd', 'e'],
+                             'mint': [f'm{i}' for i in range(8)], 'amount': 1.0})
+
+    sharded = run_sharded(holdings_per_row, df, holdings, workers=2, chunk_size=2)
+    pd.testing.assert_frame_equal(sharded, holdings_per_row(df, holdings))
+
+    shipped = run_sharded(shipped_rows, df, holdings, workers=2, chunk_size=2, merge=np.concatenate)
+    assert sorted(shipped) == list(range(len(holdings)))
@@ -0,0 +1,37 @@
+from itertools import combinations
+import pandas as pd
+import pytest
+from traders import extract_special_wallets, special_categories
+from synthetic_data import synthetic_wallets, synthetic_holdings
+from patterns import WalletPatternAnalyzer
+
+
+@pytest.fixture
+def profiles():
+    wallets = synthetic_wallets(2000, seed=3)
+    profiles = WalletPatternAnalyzer().analyze_frame(wallets, synthetic_holdings(wallets['wallet'], seed=3))
+    # A wallet listed twice, the second time in another category
+    duplicate = profiles.iloc[[5]].assign(category='Mega Whale', patterns='None Detected')
+    return pd.concat([profiles, duplicate], ignore_index=True)
+
+
+def test_master_list_matches_concat_and_dedupe(profiles, tmp_path):
+    expected = pd.concat(profiles[mask] for mask in special_categories(profiles).values())
+    expected = expected.drop_duplicates(subset=['wallet_address'])
+    master = extract_special_wallets(profiles, output_dir=tmp_path)
+    pd.testing.assert_frame_equal(master, expected)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / 'special_wallets_master.csv'),
+                                  expected.reset_index(drop=True), check_dtype=False)
+
+
+def test_overlaps_match_set_intersections(profiles, tmp_path):
+    extract_special_wallets(profiles, output_dir=tmp_path)
+    matrix = pd.read_csv(tmp_path / 'category_overlap_matrix.csv', index_col=0)
+    members = {category: set(profiles.loc[mask, 'wallet_address'])
+               for category, mask in special_categories(profiles).items()}
+    for first, second in combinations(members, 2):
+        assert matrix.loc[first, second] == len(members[first] & members[second])
+    for category, wallets in members.items():
+        assert matrix.loc[category, category] == len(wallets)
+    pairs = pd.read_csv(tmp_path / 'category_overlaps.csv')
+    assert len(pairs) == len(members) * (len(members) - 1) // 2
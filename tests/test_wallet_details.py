@@ -0,0 +1,59 @@
+import pytest
+from wallet_details import WalletAnalyzer
+from mock_rpc_server import start_server, fake_wallets
+
+
+@pytest.fixture(scope='module')
+def rpc_url():
+    server, url = start_server()
+    yield url
+    server.shutdown()
+
+
+def test_failed_requests_leave_wallets_unknown(rpc_url):
+    analyzer = WalletAnalyzer(rpc_url, max_in_flight=4, batch_size=5, rate=0)
+    wallets = fake_wallets(20)
+    get_wallet_infos, fetch_token_accounts = analyzer.get_wallet_infos, analyzer.fetch_token_accounts
+
+    def failing_infos(chunk):
+        if wallets[0][0] in chunk:
+            raise RuntimeError('database is locked')
+        return get_wallet_infos(chunk)
+
+    def failing_token_accounts(wallet):
+        if wallet == wallets[7][0]:
+            raise AttributeError("'NoneType' object has no attribute 'get'")
+        return fetch_token_accounts(wallet)
+
+    analyzer.get_wallet_infos, analyzer.fetch_token_accounts = failing_infos, failing_token_accounts
+    results = {idx: (analysis, error) for idx, _, analysis, error in analyzer.analyze_wallets_concurrently(wallets)}
+
+    assert sorted(results) == list(range(len(wallets)))
+    assert all(error is None for _, error in results.values())
+    # The first chunk's wallet infos failed, the others came through
+    assert {results[idx][0]['balance_status'] for idx in range(5)} == {'Unknown'}
+    assert results[5][0]['balance_status'] != 'Unknown'
+    assert results[7][0]['token_count'] == 0
+    assert results[5][0]['token_count'] > 0
+    assert wallets[7][0] in analyzer.token_lookup_failures
+    assert analyzer.info_lookup_failures == {wallet for wallet, _ in wallets[:5]}
+
+
+def test_failed_decimals_lookups_are_recorded(rpc_url):
+    analyzer = WalletAnalyzer(rpc_url, rate=0)
+    wallet = fake_wallets(1)[0][0]
+    get_multiple_accounts = analyzer.client.get_multiple_accounts
+
+    def failing_decimals(addresses, config=None):
+        if config and 'dataSlice' in config:
+            raise RuntimeError('connection reset')
+        return get_multiple_accounts(addresses, config)
+
+    analyzer.client.get_multiple_accounts = failing_decimals
+    assert analyzer.get_token_accounts(wallet)['token_count'] > 0
+    assert wallet in analyzer.decimals_lookup_failures
+
+    analyzer.client.get_multiple_accounts = get_multiple_accounts
+    analyzer.decimals_lookup_failures.clear()
+    assert analyzer.get_token_accounts(wallet)['holdings']
+    assert not analyzer.decimals_lookup_failures and not analyzer.failed_mints